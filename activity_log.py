@@ -0,0 +1,134 @@
+# activity_log.py
+import os
+import atexit
+import datetime
+import threading
+from db_pool import db_connection
+
+# Flush once this many events are queued...
+FLUSH_BATCH_SIZE = 50
+# ...or once the oldest queued event is this many seconds old
+FLUSH_INTERVAL = 1.0
+# Upper bound on queued events kept across failed flushes
+MAX_PENDING = 10000
+
+INSERT_ACTIVITY_SQL = """
+    INSERT INTO activity_logs (user_id, activity_type, activity_details, timestamp)
+    VALUES (?, ?, ?, ?)
+"""
+
+
+class ActivityLogWriter:
+    """Write-behind queue for activity_logs.
+
+    Events are buffered in memory and written by a background thread in a
+    single transaction with executemany, so a burst of user actions costs
+    one commit instead of one commit per event. In synchronous mode every
+    event is written immediately, which keeps tests deterministic.
+    """
+
+    def __init__(self, batch_size=FLUSH_BATCH_SIZE, flush_interval=FLUSH_INTERVAL, synchronous=False):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.synchronous = synchronous
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+        self._stopping = False
+
+    def log(self, user_id, activity_type, activity_details=None, timestamp=None):
+        """Queue one activity event (activity_details must already be a string)"""
+        row = (user_id, activity_type, activity_details, timestamp or datetime.datetime.now().isoformat())
+
+        if self.synchronous:
+            self._write([row])
+            return
+
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.notify()
+        self._ensure_started()
+
+    def flush(self):
+        """Write every queued event now; safe to call from any thread"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return 0
+
+            try:
+                self._write(rows)
+            except Exception as e:
+                print(f"Error flushing activity log: {e}")
+                with self._lock:
+                    # Put the batch back in front so ordering is preserved
+                    self._pending = (rows + self._pending)[-MAX_PENDING:]
+                return 0
+            return len(rows)
+
+    def close(self):
+        """Stop the background thread and write anything still queued"""
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 5)
+            self._thread = None
+        self.flush()
+
+    def _write(self, rows):
+        with db_connection() as conn:
+            conn.executemany(INSERT_ACTIVITY_SQL, rows)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None or self._stopping:
+                return
+            self._thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._stopping and len(self._pending) < self.batch_size:
+                    self._wakeup.wait(self.flush_interval)
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_activity_writer():
+    """Return the process-wide activity log writer"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                synchronous = os.getenv("VIDEDU_ACTIVITY_LOG_SYNC") == "1"
+                _writer = ActivityLogWriter(synchronous=synchronous)
+                atexit.register(_writer.close)
+    return _writer
+
+
+def set_synchronous(enabled=True):
+    """Switch between buffered and immediate writes (used by tests)"""
+    writer = get_activity_writer()
+    if enabled:
+        writer.flush()
+    writer.synchronous = enabled
+
+
+def flush_activity_log():
+    """Write queued events so reads of activity_logs see them"""
+    if _writer is not None:
+        _writer.flush()
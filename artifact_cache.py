@@ -0,0 +1,215 @@
+# artifact_cache.py
+import os
+import re
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import tempfile
+import threading
+import contextlib
+
+# Where cached artifacts live (override with VIDEDU_CACHE_DIR)
+CACHE_DIR = os.getenv("VIDEDU_CACHE_DIR", os.path.join("cache", "artifacts"))
+
+# Total size the cache may grow to before least-recently-used entries are evicted
+MAX_CACHE_BYTES = int(os.getenv("VIDEDU_CACHE_MAX_BYTES", 5 * 1024 ** 3))
+
+
+def normalize_topic(topic):
+    """Normalize a topic so trivially different spellings share cache entries"""
+    return re.sub(r'\s+', ' ', (topic or '')).strip().casefold()
+
+
+def make_key(**parts):
+    """Build a content address from the inputs that determine an artifact"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def text_digest(text):
+    """SHA-256 of a text artifact"""
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+
+
+_file_digests = {}
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents, memoized on (path, size, mtime)"""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key in _file_digests:
+        return _file_digests[memo_key]
+
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    _file_digests[memo_key] = digest
+    return digest
+
+
+class ArtifactCache:
+    """On-disk, content-addressed store for generated artifacts.
+
+    Each entry is a file named after its key. A small SQLite index records
+    the stage, size, content digest and last access time of every entry so
+    that the cache can be trimmed back to max_bytes in LRU order.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        with self._index() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS artifacts (
+                    key TEXT PRIMARY KEY,
+                    stage TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    digest TEXT,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_artifacts_access ON artifacts (last_access)')
+
+    @contextlib.contextmanager
+    def _index(self):
+        """Short-lived connection to the index that commits on success"""
+        conn = sqlite3.connect(os.path.join(self.root, 'index.db'), timeout=10)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _path_for(self, filename):
+        return os.path.join(self.root, filename[:2], filename)
+
+    def _lookup(self, key):
+        with self._index() as conn:
+            row = conn.execute(
+                'SELECT filename, digest FROM artifacts WHERE key = ?', (key,)
+            ).fetchone()
+            if not row:
+                return None
+
+            path = self._path_for(row[0])
+            if not os.path.exists(path):
+                # File was removed behind our back; forget the entry
+                conn.execute('DELETE FROM artifacts WHERE key = ?', (key,))
+                return None
+
+            conn.execute('UPDATE artifacts SET last_access = ? WHERE key = ?', (time.time(), key))
+            return path, row[1]
+
+    def _store(self, key, stage, filename, write):
+        path = self._path_for(filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temp file first so readers never see a partial artifact
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        size = os.path.getsize(path)
+        digest = file_digest(path)
+        now = time.time()
+        with self._index() as conn:
+            conn.execute('''
+                INSERT INTO artifacts (key, stage, filename, size, digest, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    filename = excluded.filename,
+                    size = excluded.size,
+                    digest = excluded.digest,
+                    last_access = excluded.last_access
+            ''', (key, stage, filename, size, digest, now, now))
+
+        self.evict()
+        return path
+
+    def get_text(self, key):
+        """Return a cached text artifact, or None"""
+        found = self._lookup(key)
+        if not found:
+            return None
+        with open(found[0], 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def put_text(self, key, stage, text, ext='.txt'):
+        """Store a text artifact under key"""
+        def write(tmp_path):
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        return self._store(key, stage, key + ext, write)
+
+    def get_file(self, key):
+        """Return the path of a cached file artifact, or None"""
+        found = self._lookup(key)
+        return found[0] if found else None
+
+    def get_digest(self, key):
+        """Return the content digest recorded for key, or None"""
+        found = self._lookup(key)
+        return found[1] if found else None
+
+    def put_file(self, key, stage, src_path):
+        """Copy src_path into the cache under key and return the cached path"""
+        ext = os.path.splitext(src_path)[1]
+        return self._store(key, stage, key + ext, lambda tmp_path: shutil.copyfile(src_path, tmp_path))
+
+    def total_size(self):
+        with self._index() as conn:
+            return conn.execute('SELECT COALESCE(SUM(size), 0) FROM artifacts').fetchone()[0]
+
+    def evict(self):
+        """Drop least-recently-used entries until the cache fits max_bytes"""
+        with self._lock, self._index() as conn:
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM artifacts').fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+
+            removed = 0
+            for key, filename, size in conn.execute(
+                'SELECT key, filename, size FROM artifacts ORDER BY last_access'
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(self._path_for(filename))
+                except OSError:
+                    pass
+                conn.execute('DELETE FROM artifacts WHERE key = ?', (key,))
+                total -= size
+                removed += 1
+            return removed
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_artifact_cache():
+    """Return the process-wide artifact cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ArtifactCache()
+    return _cache
@@ -0,0 +1,146 @@
+# bench_student_data.py
+"""Benchmark the per-user learning feature loader against a synthetic database.
+
+Usage:
+    python bench_student_data.py                     # 1k, 10k and 100k users
+    python bench_student_data.py --users 5000 --compare
+
+--compare also times the old one-query-per-user loader (only up to
+COMPARE_LIMIT users, since it grows linearly) and checks both agree.
+"""
+import os
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+import pandas as pd
+from db_pool import DB_PATH, configure_pool, db_connection
+from db_utils import init_db
+from student_features import load_learning_features, MINUTES_PER_WATCH
+
+TOPICS = ["Python Basics", "Functions", "Lists", "Dictionaries", "Classes",
+          "Recursion", "Loops", "Strings", "Decorators", "Generators"]
+
+# The old loader is too slow to time beyond this many users
+COMPARE_LIMIT = 10000
+
+
+def populate(n_users, seed=42):
+    """Fill the configured database with n_users and realistic activity"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+
+    users, quizzes, watches, activities = [], [], [], []
+    for user_id in range(1, n_users + 1):
+        users.append((user_id, f"user{user_id}", f"user{user_id}@example.com", "x", f"User {user_id}"))
+        for topic in rng.sample(TOPICS, rng.randint(0, 4)):
+            for _ in range(rng.randint(1, 3)):
+                quizzes.append((user_id, topic, rng.randint(0, 10), 10))
+        for topic in rng.sample(TOPICS, rng.randint(0, 4)):
+            watches.append((user_id, topic, rng.uniform(0, 100), rng.randint(1, 5)))
+        for _ in range(rng.randint(0, 5)):
+            when = start + timedelta(minutes=rng.randint(0, 500000))
+            activities.append((user_id, "video_watched", None, when.isoformat()))
+
+    with db_connection() as conn:
+        conn.executemany("INSERT INTO users (id, username, email, password_hash, full_name) VALUES (?, ?, ?, ?, ?)", users)
+        conn.executemany("INSERT INTO quiz_attempts (user_id, topic, score, max_score) VALUES (?, ?, ?, ?)", quizzes)
+        conn.executemany("INSERT INTO videos_watched (user_id, topic, completion_percentage, watch_count) VALUES (?, ?, ?, ?)", watches)
+        conn.executemany("INSERT INTO activity_logs (user_id, activity_type, activity_details, timestamp) VALUES (?, ?, ?, ?)", activities)
+    return len(quizzes) + len(watches) + len(activities)
+
+
+def legacy_load(conn):
+    """The previous N+1 loader: three queries per user (reference only).
+
+    Last_Active is None for users without activity; the old loader used
+    the time of the call there, which cannot be compared exactly.
+    """
+    rows = []
+    for user_id, username, full_name in conn.execute("SELECT id, username, full_name FROM users").fetchall():
+        entry = {"Student": full_name or username, "User_ID": user_id}
+        quiz_results = conn.execute(
+            "SELECT topic, AVG(score * 100.0 / max_score) FROM quiz_attempts WHERE user_id = ? GROUP BY topic",
+            (user_id,)).fetchall()
+        for topic, score in quiz_results:
+            entry[f"Quiz_Score_{topic.replace(' ', '_')}"] = score
+        watch_results = conn.execute(
+            "SELECT topic, SUM(watch_count) FROM videos_watched WHERE user_id = ? GROUP BY topic",
+            (user_id,)).fetchall()
+        for topic, count in watch_results:
+            entry[f"Watch_Time_{topic.replace(' ', '_')}"] = count * MINUTES_PER_WATCH if count else 0
+
+        # Most watched topic, else best quiz topic
+        preference = None
+        if watch_results:
+            preference = max(watch_results, key=lambda x: x[1])[0]
+        elif quiz_results:
+            preference = max(quiz_results, key=lambda x: x[1])[0]
+        entry["Preference"] = preference
+
+        last_active = conn.execute("SELECT MAX(timestamp) FROM activity_logs WHERE user_id = ?", (user_id,)).fetchone()[0]
+        entry["Last_Active"] = datetime.fromisoformat(last_active) if last_active else None
+        rows.append(entry)
+    return rows
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def run(n_users, compare=False):
+    work_dir = tempfile.mkdtemp(prefix="bench_students_")
+    try:
+        configure_pool(os.path.join(work_dir, "bench.db"))
+        init_db()
+        events = populate(n_users)
+
+        with db_connection() as conn:
+            frame, elapsed = timed(load_learning_features, conn)
+            line = f"{n_users:>8} users {events:>9} rows   set-based {elapsed:8.3f}s"
+
+            if compare and n_users <= COMPARE_LIMIT:
+                legacy, legacy_elapsed = timed(legacy_load, conn)
+                line += f"   N+1 {legacy_elapsed:8.3f}s   speedup {legacy_elapsed / elapsed:6.1f}x"
+                check_same(frame, legacy)
+
+        print(line)
+    finally:
+        configure_pool(DB_PATH)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def check_same(frame, legacy):
+    """Assert the set-based frame matches the per-user loader in every column"""
+    by_user = frame.set_index("User_ID")
+    assert len(by_user) == len(legacy), "row counts differ"
+    for entry in legacy:
+        row = by_user.loc[entry["User_ID"]]
+        for column in by_user.columns:
+            actual = row[column]
+            value = entry.get(column)
+            if column == "Last_Active" and value is None:
+                # Both loaders default to "now" for users without activity
+                assert isinstance(actual, datetime), (entry["User_ID"], column, actual)
+            elif value is None:
+                # Topics without data are NaN in the frame and absent from the old rows
+                assert pd.isna(actual), (entry["User_ID"], column, actual)
+            elif isinstance(value, float):
+                assert abs(actual - value) < 1e-9, (entry["User_ID"], column, actual, value)
+            else:
+                assert actual == value, (entry["User_ID"], column, actual, value)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="*", default=[1000, 10000, 100000])
+    parser.add_argument("--compare", action="store_true", help="also time the old per-user loader")
+    args = parser.parse_args()
+
+    for n_users in args.users:
+        run(n_users, compare=args.compare)
@@ -0,0 +1,119 @@
+# challenge_cache.py
+"""In-process caches for grading code challenge submissions.
+
+Challenge metadata (function name, decoded test cases, rewards) is parsed
+once per challenge version; code_challenges.version is bumped by a trigger
+whenever a challenge's grading inputs change, so checking it is a single
+primary-key lookup. Grading results are kept per (challenge id, version,
+code hash), so resubmitting code that was already graded returns without
+running it again. Only results that do not depend on machine load are
+cached: submissions that timed out, ran out of memory or crashed are
+always graded afresh. Cached values are shared and must be treated as
+read-only.
+"""
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from db_pool import db_connection
+from grader import (get_grader, challenge_function_name, GRADED, MISSING_FUNCTION, LOAD_ERROR,
+                    PASSED, FAILED, ERROR)
+
+# Challenges whose parsed metadata is kept in memory
+CHALLENGE_CACHE_SIZE = 256
+
+# Grading results kept in memory
+GRADE_CACHE_SIZE = 4096
+
+# Outcomes that are the same every time the same code is graded
+_CACHEABLE_STATUSES = (GRADED, MISSING_FUNCTION, LOAD_ERROR)
+_CACHEABLE_TEST_STATUSES = (PASSED, FAILED, ERROR)
+
+
+class _LRUCache:
+    """Thread-safe mapping that forgets its least recently used entries"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_challenges = _LRUCache(CHALLENGE_CACHE_SIZE)
+_grades = _LRUCache(GRADE_CACHE_SIZE)
+
+
+def get_challenge_metadata(challenge_id):
+    """Grading metadata of a challenge, or None if it does not exist.
+
+    Returns {"id", "version", "title", "function_name", "test_cases",
+    "xp_reward", "badge_id"}; function_name is None when it cannot be
+    determined.
+    """
+    with db_connection() as conn:
+        row = conn.execute("SELECT version FROM code_challenges WHERE id = ?", (challenge_id,)).fetchone()
+        if row is None:
+            return None
+
+        cached = _challenges.get(challenge_id)
+        if cached is not None and cached["version"] == row[0]:
+            return cached
+
+        row = conn.execute('''
+            SELECT version, title, description, initial_code, test_cases, xp_reward, badge_id
+            FROM code_challenges
+            WHERE id = ?
+        ''', (challenge_id,)).fetchone()
+        if row is None:
+            return None
+
+    metadata = {
+        "id": challenge_id,
+        "version": row["version"],
+        "title": row["title"],
+        "function_name": challenge_function_name(row["description"], row["initial_code"]),
+        "test_cases": json.loads(row["test_cases"]) if row["test_cases"] else [],
+        "xp_reward": row["xp_reward"],
+        "badge_id": row["badge_id"]
+    }
+    _challenges.put(challenge_id, metadata)
+    return metadata
+
+
+def code_hash(code):
+    """Hash of submitted code, ignoring line endings and trailing whitespace at the end"""
+    return hashlib.sha256(code.replace("\r\n", "\n").rstrip().encode()).hexdigest()
+
+
+def _cacheable(graded):
+    return (graded["status"] in _CACHEABLE_STATUSES
+            and all(test["status"] in _CACHEABLE_TEST_STATUSES for test in graded["tests"]))
+
+
+def grade_challenge(challenge, code):
+    """Grade code against a challenge from get_challenge_metadata(), reusing earlier results"""
+    key = (challenge["id"], challenge["version"], code_hash(code))
+    graded = _grades.get(key)
+    if graded is None:
+        graded = get_grader().grade(code, challenge["function_name"], challenge["test_cases"])
+        if _cacheable(graded):
+            _grades.put(key, graded)
+    return graded
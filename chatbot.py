@@ -7,12 +7,18 @@ import pandas as pd
 import sqlite3
 import os
 from datetime import datetime
-from db_utils import get_db_connection, log_activity
+from db_utils import log_activity
+from db_pool import db_connection
 import google.generativeai as genai  # Import Google's Gemini API
+from llm_client import get_llm_client
 
 # Hardcoded API key - Replace with your actual Gemini API key
 GEMINI_API_KEY =os.getenv("GEMINI_API_KEY")
 
+# Model for chat answers, and how long an identical question may be answered from the cache
+CHAT_MODEL = 'models/gemini-1.5-pro'
+CHAT_CACHE_TTL = 3600
+
 # Get API key function returns the hardcoded key
 def get_gemini_api_key():
     return GEMINI_API_KEY
@@ -32,20 +38,14 @@ def get_ai_response(prompt, context="", max_tokens=800):
         # Always configure the API with the hardcoded key - do this every time to ensure it's set
         genai.configure(api_key=GEMINI_API_KEY)
         
-        # Create the most basic model instance possible
-        model = genai.GenerativeModel('models/gemini-1.5-pro')
-        
         # Add context to the prompt if available
         if context:
             full_prompt = f"Context: {context}\n\nQuestion: {prompt}"
         else:
             full_prompt = prompt
         
-        # Make the API call with minimal parameters
-        response = model.generate_content(full_prompt)
-        
-        # Return the text directly
-        return response.text
+        # Make the API call through the shared client (cached, coalesced)
+        return get_llm_client().generate(full_prompt, model=CHAT_MODEL, ttl=CHAT_CACHE_TTL)
     except Exception as e:
         # Print error for debugging
         print(f"Gemini API error: {e}")
@@ -97,18 +97,15 @@ def get_fallback_response(query):
 # Save chat history to database
 def save_chat_to_db(user_id, query, response):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        timestamp = datetime.now().isoformat()
+            timestamp = datetime.now().isoformat()
         
-        cursor.execute("""
-            INSERT INTO chatbot_interactions (user_id, query, response, timestamp)
-            VALUES (?, ?, ?, ?)
-        """, (user_id, query, response, timestamp))
-        
-        conn.commit()
-        conn.close()
+            cursor.execute("""
+                INSERT INTO chatbot_interactions (user_id, query, response, timestamp)
+                VALUES (?, ?, ?, ?)
+            """, (user_id, query, response, timestamp))
         
         # Log the activity
         log_activity(user_id, "chatbot_interaction", {"query_length": len(query)})
@@ -121,55 +118,53 @@ def save_chat_to_db(user_id, query, response):
 # Get user's learning context based on recent activity
 def get_user_learning_context(user_id):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        # Check if the table exists
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='quiz_attempts'")
-        quiz_table_exists = cursor.fetchone() is not None
+            # Check if the table exists
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='quiz_attempts'")
+            quiz_table_exists = cursor.fetchone() is not None
         
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='videos_watched'")
-        videos_table_exists = cursor.fetchone() is not None
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='videos_watched'")
+            videos_table_exists = cursor.fetchone() is not None
         
-        recent_quiz_topics = []
-        recent_video_topics = []
+            recent_quiz_topics = []
+            recent_video_topics = []
         
-        # Get recent quiz topics if table exists
-        if quiz_table_exists:
-            cursor.execute("""
-                SELECT topic FROM quiz_attempts
-                WHERE user_id = ?
-                ORDER BY timestamp DESC
-                LIMIT 3
-            """, (user_id,))
-            
-            recent_quiz_topics = [row[0] for row in cursor.fetchall()]
-        
-        # Get recent video topics if table exists
-        if videos_table_exists:
-            cursor.execute("""
-                SELECT topic FROM videos_watched
-                WHERE user_id = ?
-                ORDER BY last_watched DESC
-                LIMIT 3
-            """, (user_id,))
+            # Get recent quiz topics if table exists
+            if quiz_table_exists:
+                cursor.execute("""
+                    SELECT topic FROM quiz_attempts
+                    WHERE user_id = ?
+                    ORDER BY timestamp DESC
+                    LIMIT 3
+                """, (user_id,))
             
-            recent_video_topics = [row[0] for row in cursor.fetchall()]
+                recent_quiz_topics = [row[0] for row in cursor.fetchall()]
         
-        # Alternative: try video_watched table if videos_watched doesn't exist
-        if not videos_table_exists:
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='video_watched'")
-            if cursor.fetchone() is not None:
+            # Get recent video topics if table exists
+            if videos_table_exists:
                 cursor.execute("""
-                    SELECT topic FROM video_watched
+                    SELECT topic FROM videos_watched
                     WHERE user_id = ?
-                    ORDER BY timestamp DESC
+                    ORDER BY last_watched DESC
                     LIMIT 3
                 """, (user_id,))
-                
+            
                 recent_video_topics = [row[0] for row in cursor.fetchall()]
         
-        conn.close()
+            # Alternative: try video_watched table if videos_watched doesn't exist
+            if not videos_table_exists:
+                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='video_watched'")
+                if cursor.fetchone() is not None:
+                    cursor.execute("""
+                        SELECT topic FROM video_watched
+                        WHERE user_id = ?
+                        ORDER BY timestamp DESC
+                        LIMIT 3
+                    """, (user_id,))
+                
+                    recent_video_topics = [row[0] for row in cursor.fetchall()]
         
         # Combine and remove duplicates
         all_topics = recent_quiz_topics + recent_video_topics
@@ -184,18 +179,17 @@ def get_user_learning_context(user_id):
 # Get previous chat history for the user
 def get_chat_history(user_id, limit=10):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        cursor.execute("""
-            SELECT query, response, timestamp FROM chatbot_interactions
-            WHERE user_id = ?
-            ORDER BY timestamp DESC
-            LIMIT ?
-        """, (user_id, limit))
+            cursor.execute("""
+                SELECT query, response, timestamp FROM chatbot_interactions
+                WHERE user_id = ?
+                ORDER BY timestamp DESC
+                LIMIT ?
+            """, (user_id, limit))
         
-        chat_history = [{"query": row[0], "response": row[1], "timestamp": row[2]} for row in cursor.fetchall()]
-        conn.close()
+            chat_history = [{"query": row[0], "response": row[1], "timestamp": row[2]} for row in cursor.fetchall()]
         
         return chat_history
     except Exception as e:
@@ -271,34 +265,32 @@ def chatbot_widget():
 # Get suggestion based on recent topics and student activity
 def get_proactive_suggestions(user_id):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        # Get recent quiz performance
-        cursor.execute("""
-            SELECT topic, AVG(score * 100.0 / max_score) as avg_score
-            FROM quiz_attempts
-            WHERE user_id = ?
-            GROUP BY topic
-            ORDER BY avg_score ASC
-            LIMIT 1
-        """, (user_id,))
-        
-        lowest_score_topic = cursor.fetchone()
+            # Get recent quiz performance
+            cursor.execute("""
+                SELECT topic, AVG(score * 100.0 / max_score) as avg_score
+                FROM quiz_attempts
+                WHERE user_id = ?
+                GROUP BY topic
+                ORDER BY avg_score ASC
+                LIMIT 1
+            """, (user_id,))
         
-        # Get most watched topic
-        cursor.execute("""
-            SELECT topic, SUM(watch_count) as total_watches
-            FROM videos_watched
-            WHERE user_id = ?
-            GROUP BY topic
-            ORDER BY total_watches DESC
-            LIMIT 1
-        """, (user_id,))
+            lowest_score_topic = cursor.fetchone()
         
-        most_watched_topic = cursor.fetchone()
+            # Get most watched topic
+            cursor.execute("""
+                SELECT topic, SUM(watch_count) as total_watches
+                FROM videos_watched
+                WHERE user_id = ?
+                GROUP BY topic
+                ORDER BY total_watches DESC
+                LIMIT 1
+            """, (user_id,))
         
-        conn.close()
+            most_watched_topic = cursor.fetchone()
         
         suggestions = []
         
@@ -325,29 +317,26 @@ def get_proactive_suggestions(user_id):
 # Stand-alone function to initialize DB tables
 def init_chatbot_db():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        # Create tables if they don't exist
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS chatbot_interactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                query TEXT NOT NULL,
-                response TEXT NOT NULL,
-                timestamp TEXT NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        """)
-        
-        # Create index for faster queries
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_chatbot_user_time
-            ON chatbot_interactions (user_id, timestamp)
-        """)
-        
-        conn.commit()
-        conn.close()
+            # Create tables if they don't exist
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS chatbot_interactions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    query TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    FOREIGN KEY (user_id) REFERENCES users(id)
+                )
+            """)
+        
+            # Create index for faster queries
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_chatbot_user_time
+                ON chatbot_interactions (user_id, timestamp)
+            """)
         
         return True
     except Exception as e:
@@ -4,11 +4,15 @@ import time
 import json
 import random
 import datetime
-from db_utils import get_db_connection, log_activity
+from db_utils import log_activity
+from db_pool import db_connection
+from activity_log import INSERT_ACTIVITY_SQL
 import streamlit_ace as ace
 import streamlit.components.v1 as components
-import re
-from db_utils import get_db_connection, init_challenges_tables, migrate_challenges_tables
+from db_utils import init_challenges_tables, migrate_challenges_tables
+from grader import (get_grader, GRADED, MISSING_FUNCTION, LOAD_TIMEOUT, PASSED, FAILED,
+                    TIMEOUT, OUT_OF_MEMORY, SKIPPED, CRASHED)
+from challenge_cache import get_challenge_metadata, grade_challenge
 
 
 
@@ -93,55 +97,62 @@ def add_kid_friendly_styling():
     """, unsafe_allow_html=True)
 
 def run_challenge_test(code, test_cases, function_name):
-    """Run code against test cases with better feedback."""
+    """Run code against test cases with better feedback.
+
+    The code runs in a sandboxed grader process (see grader.py), never in
+    the Streamlit server.
+    """
     try:
-        # Execute the code in a safe environment
-        local_vars = {}
-        exec(code, {}, local_vars)
-        
-        if function_name not in local_vars:
-            return False, f"❌ Oops! You need to define a function called '{function_name}'.", []
+        graded = get_grader().grade(code, function_name, test_cases)
+    except Exception as e:
+        return False, f"❌ Uh-oh! Something went wrong: {str(e)}", []
+    return describe_grade(graded, test_cases, function_name)
+
+def describe_grade(graded, test_cases, function_name):
+    """Turn a grader result into (all_passed, feedback, test_results)"""
+    if graded["status"] == MISSING_FUNCTION:
+        return False, f"❌ Oops! You need to define a function called '{function_name}'.", []
+    if graded["status"] == LOAD_TIMEOUT:
+        return False, "❌ Your code took too long to run - check for infinite loops!", []
+    if graded["status"] != GRADED:
+        return False, f"❌ Uh-oh! Something went wrong: {graded['error'] or 'the grader stopped unexpectedly'}", []
+
+    # Describe each test result
+    test_results = []
+    for test, result in zip(test_cases, graded["tests"]):
+        i = result["test_num"]
+        input_val = test["input"]
+        status = result["status"]
         
-        # Test all the test cases
-        test_results = []
-        all_passed = True
+        if status == PASSED:
+            message = f"Test {i} passed! Input: {input_val}, Output: {result['output']}"
+        elif status == FAILED:
+            message = f"Test {i} failed! Input: {input_val}, Expected: {test['expected']}, Got: {result['output']}"
+        elif status == TIMEOUT:
+            message = f"Test {i} took too long! Input: {input_val} - check for infinite loops."
+        elif status == OUT_OF_MEMORY:
+            message = f"Test {i} used too much memory! Input: {input_val}"
+        elif status == SKIPPED:
+            message = f"Test {i} was not run because an earlier test had to be stopped."
+        elif status == CRASHED:
+            message = f"Test {i} crashed the program! Input: {input_val}"
+        else:
+            message = f"Error in test {i}: {result['error']}"
         
-        for i, test in enumerate(test_cases):
-            input_val = test["input"]
-            expected = test["expected"]
-            
-            try:
-                result = local_vars[function_name](*input_val) if isinstance(input_val, tuple) else local_vars[function_name](input_val)
-                if result == expected:
-                    test_results.append({
-                        "test_num": i+1,
-                        "success": True,
-                        "message": f"Test {i+1} passed! Input: {input_val}, Output: {result}"
-                    })
-                else:
-                    all_passed = False
-                    test_results.append({
-                        "test_num": i+1,
-                        "success": False,
-                        "message": f"Test {i+1} failed! Input: {input_val}, Expected: {expected}, Got: {result}"
-                    })
-            except Exception as e:
-                all_passed = False
-                test_results.append({
-                    "test_num": i+1,
-                    "success": False,
-                    "message": f"Error in test {i+1}: {str(e)}"
-                })
+        test_results.append({
+            "test_num": i,
+            "success": status == PASSED,
+            "status": status,
+            "message": message
+        })
+    
+    all_passed = all(result["success"] for result in test_results)
+    if all_passed:
+        feedback = "🎉 Amazing job! All tests passed. You're a coding star! ⭐"
+    else:
+        feedback = "Almost there! Keep trying - you can do it! 💪"
         
-        if all_passed:
-            feedback = "🎉 Amazing job! All tests passed. You're a coding star! ⭐"
-        else:
-            feedback = "Almost there! Keep trying - you can do it! 💪"
-            
-        return all_passed, feedback, test_results
-            
-    except Exception as e:
-        return False, f"❌ Uh-oh! Something went wrong: {str(e)}", []
+    return all_passed, feedback, test_results
 
 def get_sample_challenges():
     """Return a list of sample code challenges"""
@@ -245,20 +256,19 @@ def get_sample_challenges():
 
 def get_available_challenges(user_id):
     """Get a list of available challenges for the user"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    # Get all challenges with completion status for this user
-    cursor.execute("""
-        SELECT c.id, c.title, c.difficulty, c.category, c.xp_reward, c.badge_id,
-               uc.completed, uc.attempts
-        FROM code_challenges c
-        LEFT JOIN user_challenges uc ON c.id = uc.challenge_id AND uc.user_id = ?
-        ORDER BY c.difficulty, c.id
-    """, (user_id,))
+        # Get all challenges with completion status for this user
+        cursor.execute("""
+            SELECT c.id, c.title, c.difficulty, c.category, c.xp_reward, c.badge_id,
+                   uc.completed, uc.attempts
+            FROM code_challenges c
+            LEFT JOIN user_challenges uc ON c.id = uc.challenge_id AND uc.user_id = ?
+            ORDER BY c.difficulty, c.id
+        """, (user_id,))
     
-    challenges = cursor.fetchall()
-    conn.close()
+        challenges = cursor.fetchall()
     
     # Convert to list of dictionaries
     result = []
@@ -278,18 +288,17 @@ def get_available_challenges(user_id):
 
 def get_challenge_details(challenge_id):
     """Get detailed information about a specific challenge"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute("""
-        SELECT id, title, story, description, difficulty, category, 
-               initial_code, solution_code, test_cases, hints, xp_reward, badge_id
-        FROM code_challenges
-        WHERE id = ?
-    """, (challenge_id,))
+        cursor.execute("""
+            SELECT id, title, story, description, difficulty, category, 
+                   initial_code, solution_code, test_cases, hints, xp_reward, badge_id
+            FROM code_challenges
+            WHERE id = ?
+        """, (challenge_id,))
     
-    challenge = cursor.fetchone()
-    conn.close()
+        challenge = cursor.fetchone()
     
     if not challenge:
         return None
@@ -311,17 +320,16 @@ def get_challenge_details(challenge_id):
 
 def get_user_challenge_progress(user_id, challenge_id):
     """Get the user's progress on a specific challenge"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute("""
-        SELECT completed, attempts, last_code, completed_at
-        FROM user_challenges
-        WHERE user_id = ? AND challenge_id = ?
-    """, (user_id, challenge_id))
+        cursor.execute("""
+            SELECT completed, attempts, last_code, completed_at
+            FROM user_challenges
+            WHERE user_id = ? AND challenge_id = ?
+        """, (user_id, challenge_id))
     
-    progress = cursor.fetchone()
-    conn.close()
+        progress = cursor.fetchone()
     
     if not progress:
         return {
@@ -340,47 +348,29 @@ def get_user_challenge_progress(user_id, challenge_id):
 
 def submit_challenge(user_id, challenge_id, code):
     """Submit and evaluate a code challenge with improved testing"""
-    # Get challenge details
-    challenge = get_challenge_details(challenge_id)
+    # Get challenge grading metadata (parsed once per challenge version)
+    challenge = get_challenge_metadata(challenge_id)
     if not challenge:
         return {"success": False, "message": "Challenge not found"}
     
-    # Get user's progress
-    progress = get_user_challenge_progress(user_id, challenge_id)
-    
-    # Update attempts count
-    attempts = progress["attempts"] + 1
-    
     # Initialize test results
     results = {
         "success": False,
         "message": "",
         "details": [],
-        "attempts": attempts,
+        "attempts": 0,
         "completed": False
     }
     
-    # Extract the function name from the challenge description
-    function_name = None
-    # Look for function definitions in the description
-    func_match = re.search(r'function\s+called\s+`([a-zA-Z0-9_]+)`', challenge["description"])
-    if func_match:
-        function_name = func_match.group(1)
-    else:
-        # Look for function definitions in the initial code
-        func_match = re.search(r'def\s+([a-zA-Z0-9_]+)\(', challenge["initial_code"])
-        if func_match:
-            function_name = func_match.group(1)
+    function_name = challenge["function_name"]
     
     if not function_name:
         return {"success": False, "message": "Could not determine function name from challenge"}
     
-    # Get test cases from challenge
-    test_cases = challenge["test_cases"]
-    
-    # Run the enhanced test function
+    # Run the tests, reusing the result if this exact code was graded before
     try:
-        success, feedback, test_details = run_challenge_test(code, test_cases, function_name)
+        graded = grade_challenge(challenge, code)
+        success, feedback, test_details = describe_grade(graded, challenge["test_cases"], function_name)
         
         # Set results
         results["success"] = success
@@ -393,73 +383,45 @@ def submit_challenge(user_id, challenge_id, code):
         results["success"] = False
         results["message"] = f"Error in testing: {str(e)}"
     
-    # Save progress to database
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Check if record exists
-    cursor.execute("""
-        SELECT id FROM user_challenges
-        WHERE user_id = ? AND challenge_id = ?
-    """, (user_id, challenge_id))
-    
-    existing = cursor.fetchone()
-    
-    if existing:
-        # Update existing record
-        cursor.execute("""
-            UPDATE user_challenges
-            SET attempts = ?, 
-                last_code = ?,
-                completed = ?,
-                completed_at = ?
-            WHERE user_id = ? AND challenge_id = ?
-        """, (
-            attempts,
-            code,
-            1 if results["completed"] else progress["completed"],
-            datetime.datetime.now().isoformat() if results["completed"] and not progress["completed"] else progress["completed_at"],
-            user_id,
-            challenge_id
-        ))
-    else:
-        # Insert new record
-        cursor.execute("""
+    # Save progress and any rewards in one transaction. completed_at only
+    # takes our timestamp when this submission is the first to complete
+    # the challenge, which is what decides the XP and badge awards.
+    now = datetime.datetime.now().isoformat()
+    with db_connection() as conn:
+        attempts, completed_at = conn.execute("""
             INSERT INTO user_challenges
             (user_id, challenge_id, completed, attempts, last_code, completed_at)
-            VALUES (?, ?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, 1, ?, ?)
+            ON CONFLICT(user_id, challenge_id) DO UPDATE SET
+                attempts = user_challenges.attempts + 1,
+                last_code = excluded.last_code,
+                completed = MAX(COALESCE(user_challenges.completed, 0), excluded.completed),
+                completed_at = CASE WHEN user_challenges.completed THEN user_challenges.completed_at
+                                    ELSE excluded.completed_at END
+            RETURNING attempts, completed_at
         """, (
             user_id,
             challenge_id,
             1 if results["completed"] else 0,
-            attempts,
             code,
-            datetime.datetime.now().isoformat() if results["completed"] else None
-        ))
-    
-    # If challenge is completed for the first time, award XP and badge
-    if results["completed"] and not progress["completed"]:
-        try:
-            log_activity(
-                user_id, 
-                "challenge_completed", 
-                json.dumps({
-                    "challenge_id": challenge_id, 
-                    "challenge_title": challenge["title"],
-                    "xp_reward": challenge["xp_reward"]
-                })
-            )
+            now if results["completed"] else None
+        )).fetchone()
+        results["attempts"] = attempts
+        
+        # If challenge is completed for the first time, award XP and badge
+        if results["completed"] and completed_at == now:
+            rewards = [(user_id, "challenge_completed", json.dumps({
+                "challenge_id": challenge_id, 
+                "challenge_title": challenge["title"],
+                "xp_reward": challenge["xp_reward"]
+            }), now)]
             
             # Record badge earned
             if challenge["badge_id"]:
-                log_activity(
-                    user_id, 
-                    "badge_earned", 
-                    json.dumps({
-                        "badge_id": challenge["badge_id"],
-                        "challenge_id": challenge_id
-                    })
-                )
+                rewards.append((user_id, "badge_earned", json.dumps({
+                    "badge_id": challenge["badge_id"],
+                    "challenge_id": challenge_id
+                }), now))
                 
                 # Add badge info to results
                 results["badge"] = {
@@ -467,11 +429,7 @@ def submit_challenge(user_id, challenge_id, code):
                     "title": get_badge_title(challenge["badge_id"]),
                     "description": f"Completed the '{challenge['title']}' challenge"
                 }
-        except Exception as e:
-            print(f"Error processing challenge reward: {e}")
-    
-    conn.commit()
-    conn.close()
+            conn.executemany(INSERT_ACTIVITY_SQL, rewards)
     
     return results
 
@@ -0,0 +1,227 @@
+# db_pool.py
+import os
+import sqlite3
+import threading
+import contextlib
+
+# Location of the main application database (override with VIDEDU_DB_PATH)
+DB_PATH = os.getenv("VIDEDU_DB_PATH", os.path.join("data", "learning_platform.db"))
+
+# Seconds a connection waits on a locked database before giving up
+BUSY_TIMEOUT = 5.0
+
+# Per-connection PRAGMAs, applied once when a connection is opened
+CONNECTION_PRAGMAS = (
+    ("synchronous", "NORMAL"),      # Safe with WAL, avoids an fsync per commit
+    ("cache_size", -16000),         # ~16 MB page cache (negative = KiB)
+    ("mmap_size", 268435456),       # Memory-map up to 256 MB of the file
+    ("busy_timeout", int(BUSY_TIMEOUT * 1000)),
+    ("temp_store", "MEMORY"),
+)
+
+
+class PooledConnection:
+    """Handle to a thread's shared connection.
+
+    Behaves like a sqlite3.Connection, except that close() hands the
+    connection back to the pool instead of closing it. Used as a context
+    manager it behaves like a connection() block, so it never ends a
+    transaction opened by an enclosing block, and then releases itself;
+    a handle that is dropped without being closed is released when it is
+    garbage collected.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._released = False
+        self._block = None
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        self._block = self._pool.connection()
+        return self._block.__enter__()
+
+    def __exit__(self, exc_type, exc, tb):
+        block, self._block = self._block, None
+        try:
+            return block.__exit__(exc_type, exc, tb)
+        finally:
+            self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool.release(self._conn)
+
+
+class ConnectionPool:
+    """Hands out one reusable SQLite connection per thread.
+
+    Streamlit serves each session from its own script thread, so a
+    per-thread connection gives reuse across calls without sharing a
+    connection between threads. Connections of finished threads are closed
+    lazily the next time a new thread asks for one.
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections = {}  # thread ident -> (thread, connection)
+        self._initialized = False
+
+    def _initialize(self):
+        """One-time setup: create the data directory and enable WAL"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT)
+        try:
+            # journal_mode is persistent in the database file, so it only
+            # needs to be set once rather than on every connection
+            conn.execute("PRAGMA journal_mode=WAL")
+        finally:
+            conn.close()
+        self._initialized = True
+
+    def _connect(self):
+        with self._lock:
+            if not self._initialized:
+                self._initialize()
+
+        # check_same_thread is off only so that connections of dead threads
+        # can be closed from another thread; each is used by one thread only
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for name, value in CONNECTION_PRAGMAS:
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def _prune_dead_threads(self):
+        """Close connections owned by threads that have exited"""
+        with self._lock:
+            dead = [ident for ident, (thread, _) in self._connections.items() if not thread.is_alive()]
+            stale = [self._connections.pop(ident)[1] for ident in dead]
+
+        for conn in stale:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def acquire(self):
+        """Get the current thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self._prune_dead_threads()
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.depth = 0
+            with self._lock:
+                self._connections[threading.get_ident()] = (threading.current_thread(), conn)
+        return PooledConnection(self, conn)
+
+    def release(self, conn):
+        """Return a connection; outside any connection() block, uncommitted work is discarded"""
+        if getattr(self._local, "conn", None) is not conn:
+            return
+        if self._local.depth == 0 and conn.in_transaction:
+            # Mirror the old close() semantics
+            conn.rollback()
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Context manager that commits on success and rolls back on error.
+
+        Only the outermost block on a thread commits or rolls back. Nested
+        blocks share its transaction through a savepoint, so an error in
+        an inner block undoes just that block's work and never ends the
+        caller's transaction early.
+        """
+        handle = self.acquire()
+        conn = handle._conn
+        depth = self._local.depth
+        savepoint = None
+        if depth == 0:
+            if conn.in_transaction:
+                # Left open by a handle that was never closed
+                conn.rollback()
+        else:
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            savepoint = f"db_connection_{depth}"
+            conn.execute(f"SAVEPOINT {savepoint}")
+
+        self._local.depth = depth + 1
+        try:
+            yield handle
+            if savepoint:
+                conn.execute(f"RELEASE {savepoint}")
+            elif conn.in_transaction:
+                conn.commit()
+        except Exception:
+            if savepoint and conn.in_transaction:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+            elif not savepoint and conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self._local.depth = depth
+            handle.close()
+
+    def close_all(self):
+        """Close every pooled connection (used on shutdown and in tests)"""
+        with self._lock:
+            connections = [conn for _, conn in self._connections.values()]
+            self._connections.clear()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide connection pool"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def configure_pool(path):
+    """Point the process-wide pool at a different database file"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        _pool = ConnectionPool(path)
+    return _pool
+
+
+def db_connection():
+    """Context manager for a pooled connection.
+
+    Usage:
+        with db_connection() as conn:
+            conn.execute(...)
+    """
+    return get_pool().connection()
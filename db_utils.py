@@ -2,109 +2,180 @@
 import sqlite3
 import hashlib
 import datetime
-import os
 import json
+from db_pool import get_pool, db_connection
+from activity_log import get_activity_writer, flush_activity_log
+from user_stats import init_user_stats, read_user_stats
+
+# Tables whose changes are counted in data_versions, so derived data
+# (peer features, the video library, ...) can be cached until they change
+VERSIONED_TABLES = ("users", "quiz_attempts", "videos_watched", "study_groups", "study_group_members")
 
 def get_db_connection():
-    """Create a connection to the SQLite database"""
-    # Ensure the data directory exists
-    os.makedirs('data', exist_ok=True)
-    conn = sqlite3.connect('data/learning_platform.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Get this thread's pooled connection to the SQLite database.
+
+    The returned handle is reused across calls; calling close() returns it
+    to the pool. New code should prefer the db_connection() context manager.
+    """
+    return get_pool().acquire()
 
 def init_db():
     """Initialize the database with required tables"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Create users table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        email TEXT UNIQUE NOT NULL,
-        password_hash TEXT NOT NULL,
-        full_name TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        last_login TIMESTAMP
-    )
-    ''')
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Create users table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            full_name TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP
+        )
+        ''')
     
-    # Create activity_logs table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS activity_logs (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        activity_type TEXT NOT NULL,
-        activity_details TEXT,
-        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )
-    ''')
+        # Create activity_logs table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            activity_type TEXT NOT NULL,
+            activity_details TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''')
     
-    # Create videos_watched table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS videos_watched (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        topic TEXT NOT NULL,
-        completion_percentage REAL DEFAULT 0,
-        last_watched TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        watch_count INTEGER DEFAULT 1,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )
-    ''')
+        # Create videos_watched table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS videos_watched (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            topic TEXT NOT NULL,
+            completion_percentage REAL DEFAULT 0,
+            last_watched TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            watch_count INTEGER DEFAULT 1,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''')
     
-    # Create quiz_attempts table - Fix comment format
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS quiz_attempts (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        topic TEXT NOT NULL,
-        score INTEGER NOT NULL,
-        max_score INTEGER NOT NULL,
-        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        question_data TEXT,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )
-    ''')
+        # Create quiz_attempts table - Fix comment format
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS quiz_attempts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            topic TEXT NOT NULL,
+            score INTEGER NOT NULL,
+            max_score INTEGER NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            question_data TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''')
 
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS code_challenges (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        title TEXT NOT NULL,
-        story TEXT NOT NULL,
-        description TEXT NOT NULL,
-        difficulty TEXT NOT NULL,
-        category TEXT NOT NULL,
-        initial_code TEXT,
-        solution_code TEXT,
-        test_cases TEXT,
-        hints TEXT,
-        xp_reward INTEGER NOT NULL,
-        badge_id TEXT
-    )
-    ''')
+        # Per-user aggregates (learning path, peer matching) group on these
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_quiz_attempts_user_topic ON quiz_attempts (user_id, topic)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_videos_watched_user_topic ON videos_watched (user_id, topic)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_activity_logs_user_time ON activity_logs (user_id, timestamp)')
+
+        # Study groups created from the peer collaboration page
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS study_groups (
+            group_id TEXT PRIMARY KEY,
+            creator_id INTEGER NOT NULL,
+            topic TEXT NOT NULL,
+            description TEXT,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (creator_id) REFERENCES users (id)
+        )
+        ''')
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS study_group_members (
+            group_id TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            joined_at TEXT NOT NULL,
+            PRIMARY KEY (group_id, user_id),
+            FOREIGN KEY (group_id) REFERENCES study_groups (group_id),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_study_group_members_user ON study_group_members (user_id)')
+
+        init_data_versions(cursor)
+        init_user_stats(cursor)
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS code_challenges (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            story TEXT NOT NULL,
+            description TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            category TEXT NOT NULL,
+            initial_code TEXT,
+            solution_code TEXT,
+            test_cases TEXT,
+            hints TEXT,
+            xp_reward INTEGER NOT NULL,
+            badge_id TEXT
+        )
+        ''')
     
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_challenges (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            challenge_id INTEGER NOT NULL,
+            completed BOOLEAN DEFAULT 0,
+            attempts INTEGER DEFAULT 0,
+            last_code TEXT,
+            completed_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (challenge_id) REFERENCES code_challenges (id),
+            UNIQUE(user_id, challenge_id)
+        )
+        ''')
+
+def init_data_versions(cursor, tables=VERSIONED_TABLES):
+    """Create the data_versions counters and the triggers that bump them.
+
+    Every insert, update or delete on a versioned table increments its
+    counter in the same transaction, whichever code path made the change.
+    """
     cursor.execute('''
-    CREATE TABLE IF NOT EXISTS user_challenges (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        challenge_id INTEGER NOT NULL,
-        completed BOOLEAN DEFAULT 0,
-        attempts INTEGER DEFAULT 0,
-        last_code TEXT,
-        completed_at TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users (id),
-        FOREIGN KEY (challenge_id) REFERENCES code_challenges (id),
-        UNIQUE(user_id, challenge_id)
+    CREATE TABLE IF NOT EXISTS data_versions (
+        table_name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
     )
     ''')
-    
-    # Commit the changes
-    conn.commit()
-    conn.close()
+    for table in tables:
+        cursor.execute('INSERT OR IGNORE INTO data_versions (table_name) VALUES (?)', (table,))
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_version
+            AFTER {event} ON {table}
+            BEGIN
+                UPDATE data_versions SET version = version + 1 WHERE table_name = '{table}';
+            END
+            ''')
+
+def get_data_versions(*tables):
+    """Current change counters for tables, as a tuple usable as a cache key"""
+    unversioned = [table for table in tables if table not in VERSIONED_TABLES]
+    if unversioned:
+        # Their counter would never change, so a cache keyed on it would never refresh
+        raise ValueError(f"Tables are not in VERSIONED_TABLES: {', '.join(unversioned)}")
+    with db_connection() as conn:
+        rows = conn.execute(
+            f"SELECT table_name, version FROM data_versions WHERE table_name IN ({', '.join('?' * len(tables))})",
+            tables
+        ).fetchall()
+    versions = {row[0]: row[1] for row in rows}
+    return tuple(versions.get(table, 0) for table in tables)
 
 def hash_password(password):
     """Hash a password for storing"""
@@ -112,58 +183,49 @@ def hash_password(password):
 
 def register_user(username, email, password, full_name=""):
     """Register a new user"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
     password_hash = hash_password(password)
     
     try:
-        cursor.execute(
-            "INSERT INTO users (username, email, password_hash, full_name) VALUES (?, ?, ?, ?)",
-            (username, email, password_hash, full_name)
-    
-    )
-        conn.commit()
+        with db_connection() as conn:
+            conn.execute(
+                "INSERT INTO users (username, email, password_hash, full_name) VALUES (?, ?, ?, ?)",
+                (username, email, password_hash, full_name)
+            )
         success = True
     except sqlite3.IntegrityError:
         # Username or email already exists
         success = False
-    finally:
-        conn.close()
     
     return success
 
 def authenticate_user(username, password):
     """Check if username and password match"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
     password_hash = hash_password(password)
     
-    cursor.execute(
-        "SELECT id, username, email, full_name FROM users WHERE username = ? AND password_hash = ?",
-        (username, password_hash)
-    )
-    user = cursor.fetchone()
-    
-    if user:
-        # Update last login time
+    with db_connection() as conn:
+        cursor = conn.cursor()
         cursor.execute(
-            "UPDATE users SET last_login = ? WHERE id = ?",
-            (datetime.datetime.now(), user['id'])
+            "SELECT id, username, email, full_name FROM users WHERE username = ? AND password_hash = ?",
+            (username, password_hash)
         )
-        conn.commit()
+        user = cursor.fetchone()
         
+        if user:
+            # Update last login time
+            cursor.execute(
+                "UPDATE users SET last_login = ? WHERE id = ?",
+                (datetime.datetime.now(), user['id'])
+            )
+    
+    if user:
         # Log login activity
         log_activity(user['id'], "login")
     
-    conn.close()
     return dict(user) if user else None
 
 def log_activity(user_id, activity_type, activity_details=None):
-    """Log user activity in the database with error handling"""
+    """Queue a user activity for the buffered activity log writer"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Convert activity_details to string if it's not already
         if activity_details is not None and not isinstance(activity_details, str):
             try:
@@ -173,55 +235,39 @@ def log_activity(user_id, activity_type, activity_details=None):
                 # If that fails, convert to string representation
                 activity_details = str(activity_details)
         
-        # Insert activity log
-        cursor.execute(
-            """
-            INSERT INTO activity_logs (user_id, activity_type, activity_details, timestamp)
-            VALUES (?, ?, ?, ?)
-            """,
-            (user_id, activity_type, activity_details, datetime.datetime.now().isoformat())
-        )
-        
-        conn.commit()
-        conn.close()
+        # Rows are written in batches by the background flusher
+        get_activity_writer().log(user_id, activity_type, activity_details)
         return True
     except Exception as e:
         print(f"Error logging activity: {e}")
-        try:
-            conn.close()
-        except:
-            pass
         return False
 
 def log_video_watched(user_id, topic, completion_percentage=100):
     """Log when a user watches a video"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Check if this video was watched before
-    cursor.execute(
-        "SELECT id, watch_count FROM videos_watched WHERE user_id = ? AND topic = ?",
-        (user_id, topic)
-    )
-    existing = cursor.fetchone()
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    if existing:
-        # Update existing record
-        cursor.execute(
-            """UPDATE videos_watched 
-               SET completion_percentage = ?, last_watched = ?, watch_count = ? 
-               WHERE id = ?""",
-            (completion_percentage, datetime.datetime.now(), existing['watch_count'] + 1, existing['id'])
-        )
-    else:
-        # Create new record
+        # Check if this video was watched before
         cursor.execute(
-            "INSERT INTO videos_watched (user_id, topic, completion_percentage) VALUES (?, ?, ?)",
-            (user_id, topic, completion_percentage)
+            "SELECT id, watch_count FROM videos_watched WHERE user_id = ? AND topic = ?",
+            (user_id, topic)
         )
-    
-    conn.commit()
-    conn.close()
+        existing = cursor.fetchone()
+    
+        if existing:
+            # Update existing record
+            cursor.execute(
+                """UPDATE videos_watched 
+                   SET completion_percentage = ?, last_watched = ?, watch_count = ? 
+                   WHERE id = ?""",
+                (completion_percentage, datetime.datetime.now(), existing['watch_count'] + 1, existing['id'])
+            )
+        else:
+            # Create new record
+            cursor.execute(
+                "INSERT INTO videos_watched (user_id, topic, completion_percentage) VALUES (?, ?, ?)",
+                (user_id, topic, completion_percentage)
+            )
     
     # Log the activity
     details = {
@@ -232,21 +278,18 @@ def log_video_watched(user_id, topic, completion_percentage=100):
 
 def log_quiz_attempt(user_id, topic, score, max_score, question_data):
     """Log quiz attempt details"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    if isinstance(question_data, dict) or isinstance(question_data, list):
-        question_data = json.dumps(question_data)
+        if isinstance(question_data, dict) or isinstance(question_data, list):
+            question_data = json.dumps(question_data)
     
-    cursor.execute(
-        """INSERT INTO quiz_attempts 
-           (user_id, topic, score, max_score, question_data) 
-           VALUES (?, ?, ?, ?, ?)""",
-        (user_id, topic, score, max_score, question_data)
-    )
-    
-    conn.commit()
-    conn.close()
+        cursor.execute(
+            """INSERT INTO quiz_attempts 
+               (user_id, topic, score, max_score, question_data) 
+               VALUES (?, ?, ?, ?, ?)""",
+            (user_id, topic, score, max_score, question_data)
+        )
     
     # Log the activity
     details = {
@@ -258,38 +301,37 @@ def log_quiz_attempt(user_id, topic, score, max_score, question_data):
 
 def get_user_progress(user_id):
     """Get a summary of the user's learning progress"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get videos watched
-    cursor.execute(
-        "SELECT topic, completion_percentage, watch_count FROM videos_watched WHERE user_id = ?",
-        (user_id,)
-    )
-    videos_watched = [dict(row) for row in cursor.fetchall()]
+    flush_activity_log()
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    # Get quiz performance
-    cursor.execute(
-        """SELECT topic, AVG(score * 100.0 / max_score) as avg_percentage, 
-           COUNT(*) as attempt_count, MAX(score) as high_score
-           FROM quiz_attempts 
-           WHERE user_id = ? 
-           GROUP BY topic""",
-        (user_id,)
-    )
-    quiz_performance = [dict(row) for row in cursor.fetchall()]
+        # Get videos watched
+        cursor.execute(
+            "SELECT topic, completion_percentage, watch_count FROM videos_watched WHERE user_id = ?",
+            (user_id,)
+        )
+        videos_watched = [dict(row) for row in cursor.fetchall()]
     
-    # Get recent activities
-    cursor.execute(
-        """SELECT activity_type, activity_details, timestamp 
-           FROM activity_logs 
-           WHERE user_id = ? 
-           ORDER BY timestamp DESC LIMIT 10""",
-        (user_id,)
-    )
-    recent_activities = [dict(row) for row in cursor.fetchall()]
+        # Get quiz performance
+        cursor.execute(
+            """SELECT topic, AVG(score * 100.0 / max_score) as avg_percentage, 
+               COUNT(*) as attempt_count, MAX(score) as high_score
+               FROM quiz_attempts 
+               WHERE user_id = ? 
+               GROUP BY topic""",
+            (user_id,)
+        )
+        quiz_performance = [dict(row) for row in cursor.fetchall()]
     
-    conn.close()
+        # Get recent activities
+        cursor.execute(
+            """SELECT activity_type, activity_details, timestamp 
+               FROM activity_logs 
+               WHERE user_id = ? 
+               ORDER BY timestamp DESC LIMIT 10""",
+            (user_id,)
+        )
+        recent_activities = [dict(row) for row in cursor.fetchall()]
     
     return {
         "videos_watched": videos_watched,
@@ -299,29 +341,26 @@ def get_user_progress(user_id):
 def init_chatbot_db():
     """Initialize database tables for the chatbot"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        # Create tables if they don't exist
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS chatbot_interactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                query TEXT NOT NULL,
-                response TEXT NOT NULL,
-                timestamp TEXT NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        """)
-        
-        # Create index for faster queries
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_chatbot_user_time
-            ON chatbot_interactions (user_id, timestamp)
-        """)
+            # Create tables if they don't exist
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS chatbot_interactions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    query TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    FOREIGN KEY (user_id) REFERENCES users(id)
+                )
+            """)
         
-        conn.commit()
-        conn.close()
+            # Create index for faster queries
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_chatbot_user_time
+                ON chatbot_interactions (user_id, timestamp)
+            """)
         
         return True
     except Exception as e:
@@ -332,180 +371,162 @@ def init_chatbot_db():
 
 def get_user_stats(user_id):
     """Get comprehensive user statistics including XP and level"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Calculate total XP from activities
-    cursor.execute("""
-        SELECT 
-            COUNT(*) as total_activities,
-            SUM(CASE 
-                WHEN activity_type = 'challenge_completed' THEN json_extract(activity_details, '$.xp_reward')
-                WHEN activity_type = 'daily_challenge_completed' THEN json_extract(activity_details, '$.xp_reward')
-                ELSE 0 
-            END) as total_xp
-        FROM activity_logs
-        WHERE user_id = ?
-    """, (user_id,))
-    
-    stats = cursor.fetchone()
-    
-    if not stats:
-        return {
-            "level": 1,
-            "xp": 0,
-            "total_activities": 0,
-            "badges": []
-        }
-    
-    # Calculate level (1 level per 100 XP)
-    level = 1 + (stats['total_xp'] or 0) // 100
-    
-    # Get earned badges
-    cursor.execute("""
-        SELECT json_extract(activity_details, '$.badge_id') as badge_id
-        FROM activity_logs
-        WHERE user_id = ? AND activity_type = 'badge_earned'
-    """, (user_id,))
-    
-    badges = [row['badge_id'] for row in cursor.fetchall() if row['badge_id']]
-    
-    conn.close()
-    
+    flush_activity_log()
+
+    # XP and badges are kept up to date in user_stats as activities are logged
+    stats = read_user_stats(user_id)
+    xp = stats["challenge_xp"]
+
     return {
-        "level": level,
-        "xp": stats['total_xp'] or 0,
-        "total_activities": stats['total_activities'] or 0,
-        "badges": badges
+        # Calculate level (1 level per 100 XP)
+        "level": 1 + xp // 100,
+        "xp": xp,
+        "total_activities": stats["total_activities"],
+        "badges": stats["badge_ids"]
     }
 
 def get_user_challenges_progress(user_id):
     """Get all challenges progress for a user"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute("""
-        SELECT 
-            c.id, c.title, c.difficulty, c.category, c.xp_reward, c.badge_id,
-            uc.completed, uc.attempts, uc.completed_at
-        FROM code_challenges c
-        LEFT JOIN user_challenges uc ON c.id = uc.challenge_id AND uc.user_id = ?
-        ORDER BY c.difficulty, c.id
-    """, (user_id,))
+        cursor.execute("""
+            SELECT 
+                c.id, c.title, c.difficulty, c.category, c.xp_reward, c.badge_id,
+                uc.completed, uc.attempts, uc.completed_at
+            FROM code_challenges c
+            LEFT JOIN user_challenges uc ON c.id = uc.challenge_id AND uc.user_id = ?
+            ORDER BY c.difficulty, c.id
+        """, (user_id,))
     
-    challenges = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+        challenges = [dict(row) for row in cursor.fetchall()]
     
     return challenges
 
 def update_user_challenge(user_id, challenge_id, completed=False, code=None):
     """Update or create a user challenge record"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Check if record exists
-    cursor.execute("""
-        SELECT id FROM user_challenges
-        WHERE user_id = ? AND challenge_id = ?
-    """, (user_id, challenge_id))
-    
-    existing = cursor.fetchone()
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    if existing:
-        # Update existing record
-        cursor.execute("""
-            UPDATE user_challenges
-            SET attempts = attempts + 1,
-                completed = ?,
-                last_code = ?,
-                completed_at = CASE WHEN ? THEN CURRENT_TIMESTAMP ELSE completed_at END
-            WHERE id = ?
-        """, (completed, code, completed, existing['id']))
-    else:
-        # Create new record
+        # Check if record exists
         cursor.execute("""
-            INSERT INTO user_challenges
-            (user_id, challenge_id, completed, attempts, last_code, completed_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            user_id,
-            challenge_id,
-            completed,
-            1,  # first attempt
-            code,
-            datetime.datetime.now().isoformat() if completed else None
-        ))
+            SELECT id FROM user_challenges
+            WHERE user_id = ? AND challenge_id = ?
+        """, (user_id, challenge_id))
+    
+        existing = cursor.fetchone()
+    
+        if existing:
+            # Update existing record
+            cursor.execute("""
+                UPDATE user_challenges
+                SET attempts = attempts + 1,
+                    completed = ?,
+                    last_code = ?,
+                    completed_at = CASE WHEN ? THEN CURRENT_TIMESTAMP ELSE completed_at END
+                WHERE id = ?
+            """, (completed, code, completed, existing['id']))
+        else:
+            # Create new record
+            cursor.execute("""
+                INSERT INTO user_challenges
+                (user_id, challenge_id, completed, attempts, last_code, completed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (
+                user_id,
+                challenge_id,
+                completed,
+                1,  # first attempt
+                code,
+                datetime.datetime.now().isoformat() if completed else None
+            ))
     
-    conn.commit()
-    conn.close()
     return True
 
 def init_challenges_tables():
     """Initialize the challenge-specific tables"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        # Create code_challenges table if not exists
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS code_challenges (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                story TEXT NOT NULL,
-                description TEXT NOT NULL,
-                difficulty TEXT NOT NULL,
-                category TEXT NOT NULL,
-                initial_code TEXT,
-                solution_code TEXT,
-                test_cases TEXT,
-                hints TEXT,
-                xp_reward INTEGER NOT NULL,
-                badge_id TEXT
-            )
-        ''')
-        
-        # Create user_challenges table if not exists
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_challenges (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                challenge_id INTEGER NOT NULL,
-                completed BOOLEAN DEFAULT 0,
-                attempts INTEGER DEFAULT 0,
-                last_code TEXT,
-                completed_at TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (challenge_id) REFERENCES code_challenges (id),
-                UNIQUE(user_id, challenge_id)
-            )
-        ''')
-        
-        conn.commit()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Create code_challenges table if not exists
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS code_challenges (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    title TEXT NOT NULL,
+                    story TEXT NOT NULL,
+                    description TEXT NOT NULL,
+                    difficulty TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    initial_code TEXT,
+                    solution_code TEXT,
+                    test_cases TEXT,
+                    hints TEXT,
+                    xp_reward INTEGER NOT NULL,
+                    badge_id TEXT,
+                    version INTEGER NOT NULL DEFAULT 1
+                )
+            ''')
+            
+            # Create user_challenges table if not exists
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS user_challenges (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    challenge_id INTEGER NOT NULL,
+                    completed BOOLEAN DEFAULT 0,
+                    attempts INTEGER DEFAULT 0,
+                    last_code TEXT,
+                    completed_at TIMESTAMP,
+                    FOREIGN KEY (user_id) REFERENCES users (id),
+                    FOREIGN KEY (challenge_id) REFERENCES code_challenges (id),
+                    UNIQUE(user_id, challenge_id)
+                )
+            ''')
         return True
     except sqlite3.Error as e:
         print(f"Database initialization error: {e}")
         return False
-    finally:
-        conn.close()
 
 def migrate_challenges_tables():
     """Migrate existing tables if needed"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        # Check if test_cases column exists
-        cursor.execute("PRAGMA table_info(code_challenges)")
-        columns = [col[1] for col in cursor.fetchall()]
-        
-        if 'test_cases' not in columns:
-            print("Adding missing test_cases column...")
-            cursor.execute("ALTER TABLE code_challenges ADD COLUMN test_cases TEXT")
-            conn.commit()
-            print("Migration complete!")
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Check if test_cases column exists
+            cursor.execute("PRAGMA table_info(code_challenges)")
+            columns = [col[1] for col in cursor.fetchall()]
+            
+            if 'test_cases' not in columns:
+                print("Adding missing test_cases column...")
+                cursor.execute("ALTER TABLE code_challenges ADD COLUMN test_cases TEXT")
+                print("Migration complete!")
+            
+            # Results of the last bulk re-grade (see regrade.py)
+            cursor.execute("PRAGMA table_info(user_challenges)")
+            columns = [col[1] for col in cursor.fetchall()]
+            
+            if 'graded_at' not in columns:
+                cursor.execute("ALTER TABLE user_challenges ADD COLUMN tests_passed INTEGER")
+                cursor.execute("ALTER TABLE user_challenges ADD COLUMN tests_total INTEGER")
+                cursor.execute("ALTER TABLE user_challenges ADD COLUMN graded_at TIMESTAMP")
+            
+            # Challenge version, bumped whenever its grading inputs change
+            # (cache key for challenge_cache.py)
+            cursor.execute("PRAGMA table_info(code_challenges)")
+            columns = [col[1] for col in cursor.fetchall()]
+            
+            if 'version' not in columns:
+                cursor.execute("ALTER TABLE code_challenges ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_code_challenges_version
+                AFTER UPDATE OF description, initial_code, solution_code, test_cases ON code_challenges
+                BEGIN
+                    UPDATE code_challenges SET version = version + 1 WHERE id = NEW.id;
+                END
+            ''')
         return True
     except sqlite3.Error as e:
         print(f"Migration error: {e}")
         return False
-    finally:
-        conn.close()
\ No newline at end of file
@@ -1,110 +1,360 @@
 # forum.py
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
 import streamlit as st
 import datetime
-from db_utils import get_db_connection, log_activity
+from db_utils import log_activity
+from db_pool import db_connection
+from forum_hot import init_hot_scores, start_hot_score_refresher
 
-def init_forum_db():
-    """Initialize the database tables for the forum"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Create forum_topics table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS forum_topics (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        title TEXT NOT NULL,
-        description TEXT NOT NULL,
-        created_by INTEGER NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        category TEXT NOT NULL,
-        tags TEXT,
-        FOREIGN KEY (created_by) REFERENCES users (id)
-    )
-    ''')
-    
-    # Create forum_posts table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS forum_posts (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        topic_id INTEGER NOT NULL,
-        content TEXT NOT NULL,
-        created_by INTEGER NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        parent_id INTEGER,
-        is_solution BOOLEAN DEFAULT 0,
-        FOREIGN KEY (topic_id) REFERENCES forum_topics (id),
-        FOREIGN KEY (created_by) REFERENCES users (id),
-        FOREIGN KEY (parent_id) REFERENCES forum_posts (id)
+# Search results shown per page
+SEARCH_PAGE_SIZE = 20
+
+# Topics and top-level thread posts loaded per "Load more" click
+TOPIC_PAGE_SIZE = 20
+THREAD_PAGE_SIZE = 20
+
+# Reply levels loaded with a thread page; deeper replies are fetched on
+# demand with get_reply_subtree()
+THREAD_MAX_DEPTH = 4
+
+# Best-ranked topic and post matches considered per search; pages past
+# this many results are not reachable, which keeps very common terms fast
+SEARCH_CANDIDATES = 1000
+
+# BM25 column weights for topic title, description and tags; post bodies
+# get weight 1, so a match in a title outranks the same match in a reply
+TOPIC_SEARCH_WEIGHTS = (10.0, 4.0, 6.0)
+
+# Markers wrapped around matched terms in search snippets (Markdown bold)
+SNIPPET_OPEN, SNIPPET_CLOSE = "**", "**"
+SNIPPET_TOKENS = 16
+
+# External-content FTS5 indexes over topics and posts; the prefix indexes
+# keep "term*" queries as fast as whole-word ones
+FORUM_FTS_SCHEMA = (
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS forum_topics_fts USING fts5(
+        title, description, tags,
+        content='forum_topics', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
     )
-    ''')
-    
-    # Create forum_likes table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS forum_likes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        post_id INTEGER NOT NULL,
-        user_id INTEGER NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (post_id) REFERENCES forum_posts (id),
-        FOREIGN KEY (user_id) REFERENCES users (id),
-        UNIQUE(post_id, user_id)
+    ''',
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS forum_posts_fts USING fts5(
+        content,
+        content='forum_posts', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
     )
-    ''')
-    
-    # Create indexes for faster queries
-    cursor.execute('''
-    CREATE INDEX IF NOT EXISTS idx_forum_topics
-    ON forum_topics (category, created_at)
-    ''')
+    '''
+)
+
+# Keep the indexes in step with every write to the source tables
+FORUM_FTS_TRIGGERS = (
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_forum_topics_fts_insert AFTER INSERT ON forum_topics BEGIN
+        INSERT INTO forum_topics_fts (rowid, title, description, tags)
+        VALUES (NEW.id, NEW.title, NEW.description, NEW.tags);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_forum_topics_fts_delete AFTER DELETE ON forum_topics BEGIN
+        INSERT INTO forum_topics_fts (forum_topics_fts, rowid, title, description, tags)
+        VALUES ('delete', OLD.id, OLD.title, OLD.description, OLD.tags);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_forum_topics_fts_update
+    AFTER UPDATE OF title, description, tags ON forum_topics BEGIN
+        INSERT INTO forum_topics_fts (forum_topics_fts, rowid, title, description, tags)
+        VALUES ('delete', OLD.id, OLD.title, OLD.description, OLD.tags);
+        INSERT INTO forum_topics_fts (rowid, title, description, tags)
+        VALUES (NEW.id, NEW.title, NEW.description, NEW.tags);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_forum_posts_fts_insert AFTER INSERT ON forum_posts BEGIN
+        INSERT INTO forum_posts_fts (rowid, content) VALUES (NEW.id, NEW.content);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_forum_posts_fts_delete AFTER DELETE ON forum_posts BEGIN
+        INSERT INTO forum_posts_fts (forum_posts_fts, rowid, content) VALUES ('delete', OLD.id, OLD.content);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_forum_posts_fts_update AFTER UPDATE OF content ON forum_posts BEGIN
+        INSERT INTO forum_posts_fts (forum_posts_fts, rowid, content) VALUES ('delete', OLD.id, OLD.content);
+        INSERT INTO forum_posts_fts (rowid, content) VALUES (NEW.id, NEW.content);
+    END
+    '''
+)
+
+# Denormalized counters: forum_topics.reply_count and last_activity_at,
+# forum_posts.like_count, updated in the same transaction as each write
+FORUM_COUNTER_TRIGGERS = (
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_forum_topics_activity_init AFTER INSERT ON forum_topics
+    WHEN NEW.last_activity_at IS NULL BEGIN
+        UPDATE forum_topics SET last_activity_at = NEW.created_at WHERE id = NEW.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_forum_posts_count_insert AFTER INSERT ON forum_posts BEGIN
+        UPDATE forum_topics SET
+            reply_count = reply_count + 1,
+            last_activity_at = CASE
+                WHEN last_activity_at IS NULL OR NEW.created_at > last_activity_at THEN NEW.created_at
+                ELSE last_activity_at END
+        WHERE id = NEW.topic_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_forum_posts_count_delete AFTER DELETE ON forum_posts BEGIN
+        UPDATE forum_topics SET reply_count = reply_count - 1 WHERE id = OLD.topic_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_forum_likes_count_insert AFTER INSERT ON forum_likes BEGIN
+        UPDATE forum_posts SET like_count = like_count + 1 WHERE id = NEW.post_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_forum_likes_count_delete AFTER DELETE ON forum_likes BEGIN
+        UPDATE forum_posts SET like_count = like_count - 1 WHERE id = OLD.post_id;
+    END
+    '''
+)
+
+# Topics whose details and thread pages are kept in memory
+THREAD_CACHE_TOPICS = 200
+
+class ThreadCache:
+    """In-process read-through cache of per-topic reads.
+
+    Entries are grouped by topic; invalidate(topic_id) drops that topic's
+    entries and bumps its version, so a load that was already running when
+    the topic changed is returned but not stored. Least recently used
+    topics are evicted past max_topics. Cached values are shared between
+    callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_topics=THREAD_CACHE_TOPICS):
+        self.max_topics = max_topics
+        self._lock = threading.Lock()
+        self._topics = OrderedDict()  # topic_id -> {key: value}
+        self._versions = {}
+
+    def get(self, topic_id, key, load):
+        with self._lock:
+            entries = self._topics.get(topic_id)
+            if entries is not None and key in entries:
+                self._topics.move_to_end(topic_id)
+                return entries[key]
+            version = self._versions.get(topic_id, 0)
+
+        value = load()
+
+        with self._lock:
+            if self._versions.get(topic_id, 0) == version:
+                self._topics.setdefault(topic_id, {})[key] = value
+                self._topics.move_to_end(topic_id)
+                while len(self._topics) > self.max_topics:
+                    self._topics.popitem(last=False)
+        return value
+
+    def invalidate(self, topic_id):
+        with self._lock:
+            self._versions[topic_id] = self._versions.get(topic_id, 0) + 1
+            self._topics.pop(topic_id, None)
+
+    def clear(self):
+        with self._lock:
+            for topic_id in self._topics:
+                self._versions[topic_id] = self._versions.get(topic_id, 0) + 1
+            self._topics.clear()
+
+_thread_cache = ThreadCache()
+
+# Set by init_forum_db; without FTS5 search falls back to LIKE scans
+_fts_enabled = False
+
+def init_forum_db():
+    """Initialize the database tables for the forum"""
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute('''
-    CREATE INDEX IF NOT EXISTS idx_forum_posts
-    ON forum_posts (topic_id, created_at)
-    ''')
+        # Create forum_topics table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS forum_topics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            created_by INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            category TEXT NOT NULL,
+            tags TEXT,
+            reply_count INTEGER NOT NULL DEFAULT 0,
+            last_activity_at TIMESTAMP,
+            FOREIGN KEY (created_by) REFERENCES users (id)
+        )
+        ''')
+    
+        # Create forum_posts table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS forum_posts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            topic_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            created_by INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            parent_id INTEGER,
+            is_solution BOOLEAN DEFAULT 0,
+            like_count INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (topic_id) REFERENCES forum_topics (id),
+            FOREIGN KEY (created_by) REFERENCES users (id),
+            FOREIGN KEY (parent_id) REFERENCES forum_posts (id)
+        )
+        ''')
+    
+        # Create forum_likes table
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS forum_likes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            post_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (post_id) REFERENCES forum_posts (id),
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            UNIQUE(post_id, user_id)
+        )
+        ''')
+    
+        # Create indexes for faster queries
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_forum_topics
+        ON forum_topics (category, created_at)
+        ''')
     
-    cursor.execute('''
-    CREATE INDEX IF NOT EXISTS idx_forum_replies
-    ON forum_posts (parent_id)
-    ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_forum_posts
+        ON forum_posts (topic_id, created_at)
+        ''')
     
-    conn.commit()
-    conn.close()
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_forum_replies
+        ON forum_posts (parent_id)
+        ''')
+
+        migrate_forum_counters(cursor)
+        for statement in FORUM_COUNTER_TRIGGERS:
+            cursor.execute(statement)
+
+        # Listings read the counters straight from these indexes
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_forum_topics_recent ON forum_topics (created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_forum_topics_user ON forum_topics (created_by, created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_forum_topics_activity ON forum_topics (last_activity_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_forum_likes_user ON forum_likes (user_id, post_id)')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_forum_posts_roots
+        ON forum_posts (topic_id, created_at) WHERE parent_id IS NULL
+        ''')
+
+        init_forum_search(cursor)
+        init_hot_scores(cursor)
+
+    start_hot_score_refresher()
     
     return True
 
-def get_all_topics(category=None, limit=50):
-    """Get all forum topics, optionally filtered by category"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    if category and category != "All Categories":
+def migrate_forum_counters(cursor):
+    """Add the counter columns to tables created before they existed, and fill them"""
+    topic_columns = [col[1] for col in cursor.execute("PRAGMA table_info(forum_topics)").fetchall()]
+    if 'reply_count' not in topic_columns:
+        cursor.execute("ALTER TABLE forum_topics ADD COLUMN reply_count INTEGER NOT NULL DEFAULT 0")
+        cursor.execute("ALTER TABLE forum_topics ADD COLUMN last_activity_at TIMESTAMP")
         cursor.execute('''
-        SELECT t.id, t.title, t.description, t.created_at, t.category, t.tags,
-               u.username as created_by, 
-               COUNT(DISTINCT p.id) as reply_count
-        FROM forum_topics t
-        JOIN users u ON t.created_by = u.id
-        LEFT JOIN forum_posts p ON t.id = p.topic_id
-        WHERE t.category = ?
-        GROUP BY t.id
-        ORDER BY t.created_at DESC
-        LIMIT ?
-        ''', (category, limit))
-    else:
+        UPDATE forum_topics SET
+            reply_count = (SELECT COUNT(*) FROM forum_posts p WHERE p.topic_id = forum_topics.id),
+            last_activity_at = COALESCE(
+                (SELECT MAX(p.created_at) FROM forum_posts p WHERE p.topic_id = forum_topics.id),
+                created_at)
+        ''')
+
+    post_columns = [col[1] for col in cursor.execute("PRAGMA table_info(forum_posts)").fetchall()]
+    if 'like_count' not in post_columns:
+        cursor.execute("ALTER TABLE forum_posts ADD COLUMN like_count INTEGER NOT NULL DEFAULT 0")
         cursor.execute('''
+        UPDATE forum_posts SET
+            like_count = (SELECT COUNT(*) FROM forum_likes l WHERE l.post_id = forum_posts.id)
+        ''')
+
+def init_forum_search(cursor):
+    """Create the full-text indexes and triggers, filling them when new"""
+    global _fts_enabled
+    existing = {row[0] for row in cursor.execute(
+        "SELECT name FROM sqlite_master WHERE name IN ('forum_topics_fts', 'forum_posts_fts')"
+    )}
+    try:
+        for statement in FORUM_FTS_SCHEMA + FORUM_FTS_TRIGGERS:
+            cursor.execute(statement)
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5
+        print(f"Forum full-text search unavailable: {e}")
+        _fts_enabled = False
+        return False
+
+    # Index rows written before the FTS tables existed
+    for table in ("forum_topics_fts", "forum_posts_fts"):
+        if table not in existing:
+            cursor.execute(f"INSERT INTO {table} ({table}) VALUES ('rebuild')")
+    _fts_enabled = True
+    return True
+
+def build_match_query(text):
+    """Turn free text into an FTS5 query: every word must match, as a prefix.
+
+    Words are quoted so FTS5 operators and punctuation in the input are
+    treated as plain text.
+    """
+    terms = re.findall(r"\w+", text.lower())
+    return " ".join(f'"{term}"*' for term in terms)
+
+def page_cursor(rows):
+    """Keyset cursor (created_at, id) of the last row of a page"""
+    last = rows[-1]
+    return (last["created_at"], last["id"])
+
+def get_all_topics(category=None, limit=50, before=None):
+    """Get forum topics, newest first, optionally filtered by category.
+
+    Pass before=page_cursor(previous_page) to get the next page.
+    """
+    conditions, params = [], []
+    if category and category != "All Categories":
+        conditions.append("t.category = ?")
+        params.append(category)
+    if before:
+        conditions.append("(t.created_at, t.id) < (?, ?)")
+        params.extend(before)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    with db_connection() as conn:
+        cursor = conn.cursor()
+    
+        cursor.execute(f'''
         SELECT t.id, t.title, t.description, t.created_at, t.category, t.tags,
-               u.username as created_by, 
-               COUNT(DISTINCT p.id) as reply_count
+               u.username as created_by, t.reply_count
         FROM forum_topics t
         JOIN users u ON t.created_by = u.id
-        LEFT JOIN forum_posts p ON t.id = p.topic_id
-        GROUP BY t.id
-        ORDER BY t.created_at DESC
+        {where}
+        ORDER BY t.created_at DESC, t.id DESC
         LIMIT ?
-        ''', (limit,))
+        ''', (*params, limit))
     
-    topics = cursor.fetchall()
-    conn.close()
+        topics = cursor.fetchall()
     
     # Convert to list of dictionaries
     result = []
@@ -124,19 +374,18 @@ def get_all_topics(category=None, limit=50):
 
 def get_topic_details(topic_id):
     """Get details of a specific topic"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute('''
-    SELECT t.id, t.title, t.description, t.created_at, t.category, t.tags,
-           u.username as created_by, u.id as user_id
-    FROM forum_topics t
-    JOIN users u ON t.created_by = u.id
-    WHERE t.id = ?
-    ''', (topic_id,))
+        cursor.execute('''
+        SELECT t.id, t.title, t.description, t.created_at, t.category, t.tags,
+               u.username as created_by, u.id as user_id, t.reply_count
+        FROM forum_topics t
+        JOIN users u ON t.created_by = u.id
+        WHERE t.id = ?
+        ''', (topic_id,))
     
-    topic = cursor.fetchone()
-    conn.close()
+        topic = cursor.fetchone()
     
     if not topic:
         return None
@@ -149,44 +398,49 @@ def get_topic_details(topic_id):
         "category": topic[4],
         "tags": topic[5].split(",") if topic[5] else [],
         "created_by": topic[6],
-        "user_id": topic[7]
+        "user_id": topic[7],
+        "reply_count": topic[8]
     }
 
-def get_posts_for_topic(topic_id):
-    """Get all posts for a specific topic"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    SELECT p.id, p.content, p.created_at, p.parent_id, p.is_solution,
-           u.username as created_by, u.id as user_id,
-           (SELECT COUNT(*) FROM forum_likes WHERE post_id = p.id) as like_count
-    FROM forum_posts p
-    JOIN users u ON p.created_by = u.id
-    WHERE p.topic_id = ? AND p.parent_id IS NULL
-    ORDER BY p.created_at
-    ''', (topic_id,))
-    
-    posts = cursor.fetchall()
-    
-    # Get all replies
-    cursor.execute('''
-    SELECT p.id, p.content, p.created_at, p.parent_id, p.is_solution,
-           u.username as created_by, u.id as user_id,
-           (SELECT COUNT(*) FROM forum_likes WHERE post_id = p.id) as like_count
-    FROM forum_posts p
-    JOIN users u ON p.created_by = u.id
-    WHERE p.topic_id = ? AND p.parent_id IS NOT NULL
-    ORDER BY p.created_at
-    ''', (topic_id,))
-    
-    replies = cursor.fetchall()
-    conn.close()
-    
-    # Convert to dictionaries and build reply hierarchy
+def _load_post_tree(seed_sql, params, max_depth):
+    """Load seed posts and their replies up to max_depth in one query.
+
+    seed_sql selects (id, rank) for the top of the tree, rank giving the
+    order of the seeds. Returns the seeds as dicts, each with a nested
+    "replies" list; a post at the depth limit that has unloaded replies
+    gets has_more_replies=True.
+    """
+    with db_connection() as conn:
+        cursor = conn.cursor()
+
+        # path orders the rows depth-first: seed rank, then reply ids
+        # (ids follow posting order) down the branch
+        cursor.execute(f'''
+        WITH RECURSIVE seed AS ({seed_sql}),
+        tree(id, depth, path) AS (
+            SELECT id, 0, printf('%08d', rank) FROM seed
+            UNION ALL
+            SELECT c.id, tree.depth + 1, tree.path || '/' || printf('%012d', c.id)
+            FROM forum_posts c
+            JOIN tree ON c.parent_id = tree.id
+            WHERE tree.depth < ?
+        )
+        SELECT p.id, p.content, p.created_at, p.parent_id, p.is_solution,
+               u.username as created_by, u.id as user_id, p.like_count, tree.depth,
+               tree.depth = ? AND EXISTS (SELECT 1 FROM forum_posts c WHERE c.parent_id = p.id) as has_more
+        FROM tree
+        JOIN forum_posts p ON p.id = tree.id
+        JOIN users u ON p.created_by = u.id
+        ORDER BY tree.path
+        ''', (*params, max_depth, max_depth))
+
+        rows = cursor.fetchall()
+
+    # Rows arrive parents first, so one pass links every post to its parent
     posts_dict = {}
-    for p in posts:
-        posts_dict[p[0]] = {
+    seeds = []
+    for p in rows:
+        post = {
             "id": p[0],
             "content": p[1],
             "created_at": p[2],
@@ -195,41 +449,62 @@ def get_posts_for_topic(topic_id):
             "created_by": p[5],
             "user_id": p[6],
             "like_count": p[7],
+            "depth": p[8],
+            "has_more_replies": bool(p[9]),
             "replies": []
         }
-    
-    # Add replies to parent posts
-    for r in replies:
-        parent_id = r[3]
-        if parent_id in posts_dict:
-            posts_dict[parent_id]["replies"].append({
-                "id": r[0],
-                "content": r[1],
-                "created_at": r[2],
-                "parent_id": r[3],
-                "is_solution": r[4] == 1,
-                "created_by": r[5],
-                "user_id": r[6],
-                "like_count": r[7]
-            })
-    
-    return list(posts_dict.values())
+        posts_dict[post["id"]] = post
+        if post["depth"] == 0:
+            seeds.append(post)
+        else:
+            posts_dict[post["parent_id"]]["replies"].append(post)
+
+    return seeds
+
+def get_posts_for_topic(topic_id, limit=None, after=None, max_depth=THREAD_MAX_DEPTH):
+    """Get top-level posts of a topic, oldest first, with their reply trees.
+
+    limit caps the number of top-level posts; pass
+    after=page_cursor(previous_page) to get the next page. Replies are
+    nested under "replies" down to max_depth levels.
+    """
+    seed_sql = f'''
+        SELECT id, ROW_NUMBER() OVER (ORDER BY created_at, id) AS rank
+        FROM (
+            SELECT id, created_at
+            FROM forum_posts
+            WHERE topic_id = ? AND parent_id IS NULL
+                  {"AND (created_at, id) > (?, ?)" if after else ""}
+            ORDER BY created_at, id
+            LIMIT ?
+        )
+    '''
+    params = (topic_id, *(after or ()), -1 if limit is None else limit)
+    return _load_post_tree(seed_sql, params, max_depth)
+
+def get_reply_subtree(post_id, max_depth=THREAD_MAX_DEPTH):
+    """Get the replies to one post as a nested list (for threads deeper than a page loads)"""
+    seed_sql = '''
+        SELECT id, ROW_NUMBER() OVER (ORDER BY id) AS rank
+        FROM forum_posts
+        WHERE parent_id = ?
+    '''
+    # Depth here counts from the direct replies, which are the seeds
+    return _load_post_tree(seed_sql, (post_id,), max_depth - 1)
 
 def create_topic(title, description, category, tags, created_by):
     """Create a new topic in the forum"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    tags_str = ",".join(tags) if tags else ""
+        tags_str = ",".join(tags) if tags else ""
     
-    cursor.execute('''
-    INSERT INTO forum_topics (title, description, created_by, created_at, category, tags)
-    VALUES (?, ?, ?, ?, ?, ?)
-    ''', (title, description, created_by, datetime.datetime.now().isoformat(), category, tags_str))
+        cursor.execute('''
+        INSERT INTO forum_topics (title, description, created_by, created_at, category, tags)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', (title, description, created_by, datetime.datetime.now().isoformat(), category, tags_str))
     
-    topic_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+        topic_id = cursor.lastrowid
     
     # Log activity
     log_activity(created_by, "forum_topic_created", {"topic_id": topic_id, "title": title})
@@ -238,17 +513,17 @@ def create_topic(title, description, category, tags, created_by):
 
 def create_post(topic_id, content, created_by, parent_id=None):
     """Create a new post or reply in a topic"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
+    
+        cursor.execute('''
+        INSERT INTO forum_posts (topic_id, content, created_by, created_at, parent_id)
+        VALUES (?, ?, ?, ?, ?)
+        ''', (topic_id, content, created_by, datetime.datetime.now().isoformat(), parent_id))
     
-    cursor.execute('''
-    INSERT INTO forum_posts (topic_id, content, created_by, created_at, parent_id)
-    VALUES (?, ?, ?, ?, ?)
-    ''', (topic_id, content, created_by, datetime.datetime.now().isoformat(), parent_id))
+        post_id = cursor.lastrowid
     
-    post_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    _thread_cache.invalidate(topic_id)
     
     # Log activity
     log_activity(created_by, "forum_post_created", {"topic_id": topic_id, "post_id": post_id})
@@ -257,37 +532,34 @@ def create_post(topic_id, content, created_by, parent_id=None):
 
 def mark_as_solution(post_id, user_id):
     """Mark a post as the solution to a topic"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # First, get the topic id and creator
-    cursor.execute('''
-    SELECT p.topic_id, t.created_by 
-    FROM forum_posts p
-    JOIN forum_topics t ON p.topic_id = t.id
-    WHERE p.id = ?
-    ''', (post_id,))
-    
-    result = cursor.fetchone()
-    if not result:
-        conn.close()
-        return False
-    
-    topic_id, topic_creator = result
-    
-    # Only the topic creator can mark solutions
-    if topic_creator != user_id:
-        conn.close()
-        return False
-    
-    # Update the post to mark it as a solution
-    cursor.execute('''
-    UPDATE forum_posts SET is_solution = 1
-    WHERE id = ?
-    ''', (post_id,))
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        
+        # First, get the topic id and creator
+        cursor.execute('''
+        SELECT p.topic_id, t.created_by 
+        FROM forum_posts p
+        JOIN forum_topics t ON p.topic_id = t.id
+        WHERE p.id = ?
+        ''', (post_id,))
+        
+        result = cursor.fetchone()
+        if not result:
+            return False
+        
+        topic_id, topic_creator = result
+        
+        # Only the topic creator can mark solutions
+        if topic_creator != user_id:
+            return False
+        
+        # Update the post to mark it as a solution
+        cursor.execute('''
+        UPDATE forum_posts SET is_solution = 1
+        WHERE id = ?
+        ''', (post_id,))
     
-    conn.commit()
-    conn.close()
+    _thread_cache.invalidate(topic_id)
     
     # Log activity
     log_activity(user_id, "forum_solution_marked", {"topic_id": topic_id, "post_id": post_id})
@@ -296,17 +568,15 @@ def mark_as_solution(post_id, user_id):
 
 def like_post(post_id, user_id):
     """Add a like to a post"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute('''
-        INSERT INTO forum_likes (post_id, user_id, created_at)
-        VALUES (?, ?, ?)
-        ''', (post_id, user_id, datetime.datetime.now().isoformat()))
+        with db_connection() as conn:
+            conn.execute('''
+            INSERT INTO forum_likes (post_id, user_id, created_at)
+            VALUES (?, ?, ?)
+            ''', (post_id, user_id, datetime.datetime.now().isoformat()))
+            topic_id = _post_topic(conn, post_id)
         
-        conn.commit()
-        conn.close()
+        _thread_cache.invalidate(topic_id)
         
         # Log activity
         log_activity(user_id, "forum_post_liked", {"post_id": post_id})
@@ -314,62 +584,93 @@ def like_post(post_id, user_id):
         return True
     except Exception as e:
         # Likely a duplicate like
-        conn.close()
         return False
 
 def unlike_post(post_id, user_id):
     """Remove a like from a post"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute('''
-    DELETE FROM forum_likes 
-    WHERE post_id = ? AND user_id = ?
-    ''', (post_id, user_id))
+        cursor.execute('''
+        DELETE FROM forum_likes 
+        WHERE post_id = ? AND user_id = ?
+        ''', (post_id, user_id))
     
-    affected = cursor.rowcount
-    conn.commit()
-    conn.close()
+        affected = cursor.rowcount
+        topic_id = _post_topic(conn, post_id) if affected > 0 else None
     
     if affected > 0:
+        _thread_cache.invalidate(topic_id)
+        
         # Log activity
         log_activity(user_id, "forum_post_unliked", {"post_id": post_id})
     
     return affected > 0
 
+def _post_topic(conn, post_id):
+    row = conn.execute("SELECT topic_id FROM forum_posts WHERE id = ?", (post_id,)).fetchone()
+    return row[0] if row else None
+
+def get_liked_post_ids(topic_id, user_id):
+    """Ids of the posts in a topic that the user has liked, in one query"""
+    with db_connection() as conn:
+        rows = conn.execute('''
+        SELECT l.post_id
+        FROM forum_likes l
+        JOIN forum_posts p ON p.id = l.post_id
+        WHERE l.user_id = ? AND p.topic_id = ?
+        ''', (user_id, topic_id)).fetchall()
+    return {row[0] for row in rows}
+
+def cached_topic_details(topic_id):
+    """get_topic_details() served from the thread cache"""
+    return _thread_cache.get(topic_id, ("details",), lambda: get_topic_details(topic_id))
+
+def cached_posts_for_topic(topic_id, limit=None, after=None):
+    """get_posts_for_topic() served from the thread cache"""
+    return _thread_cache.get(topic_id, ("posts", limit, after),
+                             lambda: get_posts_for_topic(topic_id, limit=limit, after=after))
+
+def cached_reply_subtree(topic_id, post_id):
+    """get_reply_subtree() served from the thread cache"""
+    return _thread_cache.get(topic_id, ("subtree", post_id), lambda: get_reply_subtree(post_id))
+
+def cached_liked_post_ids(topic_id, user_id):
+    """get_liked_post_ids() served from the thread cache"""
+    return _thread_cache.get(topic_id, ("liked", user_id), lambda: get_liked_post_ids(topic_id, user_id))
+
 def has_user_liked_post(post_id, user_id):
     """Check if a user has liked a post"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute('''
-    SELECT COUNT(*) FROM forum_likes
-    WHERE post_id = ? AND user_id = ?
-    ''', (post_id, user_id))
+        cursor.execute('''
+        SELECT COUNT(*) FROM forum_likes
+        WHERE post_id = ? AND user_id = ?
+        ''', (post_id, user_id))
     
-    count = cursor.fetchone()[0]
-    conn.close()
+        count = cursor.fetchone()[0]
     
     return count > 0
 
-def get_user_topics(user_id, limit=10):
-    """Get topics created by a specific user"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    SELECT t.id, t.title, t.created_at, t.category, 
-           COUNT(DISTINCT p.id) as reply_count
-    FROM forum_topics t
-    LEFT JOIN forum_posts p ON t.id = p.topic_id
-    WHERE t.created_by = ?
-    GROUP BY t.id
-    ORDER BY t.created_at DESC
-    LIMIT ?
-    ''', (user_id, limit))
-    
-    topics = cursor.fetchall()
-    conn.close()
+def get_user_topics(user_id, limit=10, before=None):
+    """Get topics created by a specific user, newest first.
+
+    Pass before=page_cursor(previous_page) to get the next page.
+    """
+    with db_connection() as conn:
+        cursor = conn.cursor()
+    
+        cursor.execute(f'''
+        SELECT t.id, t.title, t.created_at, t.category, t.reply_count
+        FROM forum_topics t
+        WHERE t.created_by = ?
+              {"AND (t.created_at, t.id) < (?, ?)" if before else ""}
+        ORDER BY t.created_at DESC, t.id DESC
+        LIMIT ?
+        ''', (user_id, *(before or ()), limit))
+    
+        topics = cursor.fetchall()
     
     # Convert to list of dictionaries
     result = []
@@ -385,22 +686,18 @@ def get_user_topics(user_id, limit=10):
     return result
 
 def get_popular_topics(limit=5):
-    """Get the most active topics based on reply count"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    SELECT t.id, t.title, t.category, 
-           COUNT(DISTINCT p.id) as reply_count
-    FROM forum_topics t
-    LEFT JOIN forum_posts p ON t.id = p.topic_id
-    GROUP BY t.id
-    ORDER BY reply_count DESC, t.created_at DESC
-    LIMIT ?
-    ''', (limit,))
-    
-    topics = cursor.fetchall()
-    conn.close()
+    """Get the trending topics: most recent activity, decayed by age (see forum_hot)"""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+    
+        cursor.execute('''
+        SELECT t.id, t.title, t.category, t.reply_count
+        FROM forum_topics t
+        ORDER BY t.hot_score DESC
+        LIMIT ?
+        ''', (limit,))
+    
+        topics = cursor.fetchall()
     
     # Convert to list of dictionaries
     result = []
@@ -414,28 +711,67 @@ def get_popular_topics(limit=5):
     
     return result
 
-def search_topics(query, limit=20):
-    """Search topics based on title, description or tags"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    search_term = f"%{query}%"
-    
-    cursor.execute('''
-    SELECT t.id, t.title, t.description, t.created_at, t.category, t.tags,
-           u.username as created_by, 
-           COUNT(DISTINCT p.id) as reply_count
-    FROM forum_topics t
-    JOIN users u ON t.created_by = u.id
-    LEFT JOIN forum_posts p ON t.id = p.topic_id
-    WHERE t.title LIKE ? OR t.description LIKE ? OR t.tags LIKE ?
-    GROUP BY t.id
-    ORDER BY t.created_at DESC
-    LIMIT ?
-    ''', (search_term, search_term, search_term, limit))
-    
-    topics = cursor.fetchall()
-    conn.close()
+def search_topics(query, limit=SEARCH_PAGE_SIZE, offset=0):
+    """Search topics and their posts, best matches first.
+
+    Each result carries a "snippet" of the best matching text, with the
+    matched terms wrapped in SNIPPET_OPEN/SNIPPET_CLOSE. Use limit and
+    offset to page through the results.
+    """
+    if not _fts_enabled:
+        return _search_topics_like(query, limit, offset)
+
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    with db_connection() as conn:
+        cursor = conn.cursor()
+
+        # bm25() is lower for better matches; a topic's score is its best
+        # hit, whether that was the topic itself or one of its posts
+        cursor.execute(f'''
+        WITH topic_hits AS (
+            SELECT rowid AS hit_id,
+                   bm25(forum_topics_fts, {", ".join(map(str, TOPIC_SEARCH_WEIGHTS))}) AS score
+            FROM forum_topics_fts
+            WHERE forum_topics_fts MATCH ?
+            ORDER BY score
+            LIMIT {SEARCH_CANDIDATES}
+        ),
+        post_hits AS (
+            SELECT rowid AS hit_id, bm25(forum_posts_fts) AS score
+            FROM forum_posts_fts
+            WHERE forum_posts_fts MATCH ?
+            ORDER BY score
+            LIMIT {SEARCH_CANDIDATES}
+        ),
+        hits AS (
+            SELECT hit_id AS topic_id, score, 'topic' AS source, hit_id FROM topic_hits
+            UNION ALL
+            SELECT p.topic_id, post_hits.score, 'post', post_hits.hit_id
+            FROM post_hits
+            JOIN forum_posts p ON p.id = post_hits.hit_id
+        ),
+        best AS (
+            SELECT topic_id, MIN(score) AS score, source, hit_id
+            FROM hits
+            GROUP BY topic_id
+        )
+        SELECT t.id, t.title, t.description, t.created_at, t.category, t.tags,
+               u.username as created_by,
+               t.reply_count, best.score, best.source, best.hit_id
+        FROM best
+        JOIN forum_topics t ON t.id = best.topic_id
+        JOIN users u ON t.created_by = u.id
+        ORDER BY best.score, t.id
+        LIMIT ? OFFSET ?
+        ''', (match, match, limit, offset))
+    
+        topics = cursor.fetchall()
+
+        # Snippets are only built for the page being returned
+        snippets = _search_snippets(cursor, match, topics)
     
     # Convert to list of dictionaries
     result = []
@@ -448,11 +784,83 @@ def search_topics(query, limit=20):
             "category": t[4],
             "tags": t[5].split(",") if t[5] else [],
             "created_by": t[6],
-            "reply_count": t[7]
+            "reply_count": t[7],
+            "score": t[8],
+            "snippet": snippets.get((t[9], t[10]), "")
         })
     
     return result
 
+def _search_snippets(cursor, match, hits):
+    """Highlighted snippets keyed by (source, hit_id) for the given result rows"""
+    snippets = {}
+    for source, table, column in (("topic", "forum_topics_fts", -1), ("post", "forum_posts_fts", 0)):
+        ids = [row[10] for row in hits if row[9] == source]
+        if not ids:
+            continue
+        cursor.execute(f'''
+        SELECT rowid, snippet({table}, {column}, ?, ?, '…', {SNIPPET_TOKENS})
+        FROM {table}
+        WHERE {table} MATCH ? AND rowid IN ({", ".join("?" * len(ids))})
+        ''', (SNIPPET_OPEN, SNIPPET_CLOSE, match, *ids))
+        for hit_id, snippet in cursor.fetchall():
+            snippets[(source, hit_id)] = snippet
+    return snippets
+
+def _search_topics_like(query, limit, offset):
+    """Substring search over title, description and tags (no FTS5)"""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+    
+        search_term = f"%{query}%"
+    
+        cursor.execute('''
+        SELECT t.id, t.title, t.description, t.created_at, t.category, t.tags,
+               u.username as created_by, t.reply_count
+        FROM forum_topics t
+        JOIN users u ON t.created_by = u.id
+        WHERE t.title LIKE ? OR t.description LIKE ? OR t.tags LIKE ?
+        ORDER BY t.created_at DESC
+        LIMIT ? OFFSET ?
+        ''', (search_term, search_term, search_term, limit, offset))
+    
+        topics = cursor.fetchall()
+    
+    # Convert to list of dictionaries
+    result = []
+    for t in topics:
+        result.append({
+            "id": t[0],
+            "title": t[1],
+            "description": t[2],
+            "created_at": t[3],
+            "category": t[4],
+            "tags": t[5].split(",") if t[5] else [],
+            "created_by": t[6],
+            "reply_count": t[7],
+            "snippet": t[2][:100],
+            "score": None
+        })
+    
+    return result
+
+def load_pages(fetch, pages, page_size):
+    """Fetch the first `pages` pages by following keyset cursors.
+
+    fetch(limit, cursor) returns one page; cursor is None for the first.
+    Returns (rows, has_more). Each page is an index range scan, so the
+    cost grows with what is shown, not with the size of the table.
+    """
+    rows, cursor = [], None
+    for _ in range(pages):
+        # One extra row tells whether another page exists
+        page = fetch(page_size + 1, cursor)
+        rows.extend(page[:page_size])
+        if len(page) <= page_size:
+            return rows, False
+        cursor = page_cursor(rows)
+    return rows, True
+
 def forum_page():
     """Main forum page with topic listing and navigation"""
     st.title("🧩 Python Learning Community Forum")
@@ -472,8 +880,18 @@ def forum_page():
         
         selected_category = st.selectbox("Filter by category:", categories)
         
+        # Show one page again whenever the filter changes
+        if st.session_state.get("forum_category") != selected_category:
+            st.session_state.forum_category = selected_category
+            st.session_state.forum_topic_pages = 1
+        
         # Get topics based on filter
-        topics = get_all_topics(selected_category if selected_category != "All Categories" else None)
+        category_filter = selected_category if selected_category != "All Categories" else None
+        topics, more_topics = load_pages(
+            lambda limit, cursor: get_all_topics(category_filter, limit=limit, before=cursor),
+            st.session_state.forum_topic_pages,
+            TOPIC_PAGE_SIZE
+        )
         
         if not topics:
             st.info("No topics found in this category. Be the first to create one!")
@@ -500,6 +918,10 @@ def forum_page():
                             st.rerun()
                     
                     st.markdown("---")
+            
+            if more_topics and st.button("Load more topics", key="more_topics"):
+                st.session_state.forum_topic_pages += 1
+                st.rerun()
         
         # Popular topics sidebar
         st.sidebar.header("Popular Discussions")
@@ -555,20 +977,31 @@ def forum_page():
         
         search_query = st.text_input("Search by keyword, topic, or tag")
         
+        # Start from the first page whenever the query changes
+        if st.session_state.get("forum_search_query") != search_query:
+            st.session_state.forum_search_query = search_query
+            st.session_state.forum_search_page = 0
+        page = st.session_state.forum_search_page
+        
         if search_query:
-            search_results = search_topics(search_query)
+            # Ask for one extra row to know whether there is a next page
+            search_results = search_topics(search_query, limit=SEARCH_PAGE_SIZE + 1, offset=page * SEARCH_PAGE_SIZE)
+            has_more = len(search_results) > SEARCH_PAGE_SIZE
+            search_results = search_results[:SEARCH_PAGE_SIZE]
             
             if not search_results:
                 st.info("No topics found matching your search.")
             else:
-                st.write(f"Found {len(search_results)} topics matching '{search_query}'")
+                first = page * SEARCH_PAGE_SIZE + 1
+                st.write(f"Showing results {first}-{first + len(search_results) - 1} for '{search_query}'")
                 
                 for topic in search_results:
                     with st.container():
                         col1, col2 = st.columns([4, 1])
                         with col1:
                             st.markdown(f"### {topic['title']}")
-                            st.markdown(f"*{topic['description'][:100]}..." if len(topic['description']) > 100 else f"*{topic['description']}*")
+                            if topic['snippet']:
+                                st.markdown(topic['snippet'].replace("\n", " "))
                             st.caption(f"Posted by: {topic['created_by']} | Category: {topic['category']} | {topic['created_at'][:10]}")
                         
                         with col2:
@@ -579,11 +1012,56 @@ def forum_page():
                                 st.rerun()
                         
                         st.markdown("---")
+            
+            # Page navigation
+            prev_col, _, next_col = st.columns([1, 4, 1])
+            with prev_col:
+                if page > 0 and st.button("← Previous", key="search_prev"):
+                    st.session_state.forum_search_page = page - 1
+                    st.rerun()
+            with next_col:
+                if has_more and st.button("Next →", key="search_next"):
+                    st.session_state.forum_search_page = page + 1
+                    st.rerun()
+
+def render_replies(post, topic_id, user_id, liked, level=1):
+    """Render a post's reply tree, fetching branches past the loaded depth on request"""
+    replies = post["replies"]
+    if post["has_more_replies"]:
+        expanded = st.session_state.setdefault("forum_expanded_posts", set())
+        if post["id"] in expanded:
+            replies = cached_reply_subtree(topic_id, post["id"])
+        elif st.button("Show more replies", key=f"expand_{post['id']}"):
+            expanded.add(post["id"])
+            st.rerun()
+
+    for reply in replies:
+        st.markdown("---")
+        st.markdown(f"{'>' * level} {reply['content']}")
+        st.caption(f"Reply by: {reply['created_by']} | {reply['created_at'][:10]}")
+        
+        # Like button for replies
+        rcol1, rcol2, rcol3 = st.columns([1, 1, 8])
+        
+        with rcol1:
+            if reply["id"] in liked:
+                if st.button("❤️", key=f"unlike_reply_{reply['id']}"):
+                    unlike_post(reply["id"], user_id)
+                    st.rerun()
+            else:
+                if st.button("🤍", key=f"like_reply_{reply['id']}"):
+                    like_post(reply["id"], user_id)
+                    st.rerun()
+        
+        with rcol2:
+            st.write(f"{reply['like_count']}")
+
+        render_replies(reply, topic_id, user_id, liked, level + 1)
 
 def topic_view(topic_id):
     """Display a single topic and its discussions"""
     # Get topic details
-    topic = get_topic_details(topic_id)
+    topic = cached_topic_details(topic_id)
     
     if not topic:
         st.error("Topic not found.")
@@ -605,8 +1083,13 @@ def topic_view(topic_id):
     st.markdown(topic["description"])
     st.markdown("---")
     
-    # Get posts for this topic
-    posts = get_posts_for_topic(topic_id)
+    # Get posts for this topic, a page at a time
+    thread_pages = st.session_state.setdefault("forum_thread_pages", {})
+    posts, more_posts = load_pages(
+        lambda limit, cursor: cached_posts_for_topic(topic_id, limit=limit, after=cursor),
+        thread_pages.get(topic_id, 1),
+        THREAD_PAGE_SIZE
+    )
     
     # Add a new post
     with st.expander("Add a Response"):
@@ -624,11 +1107,14 @@ def topic_view(topic_id):
                 st.rerun()
     
     # Display posts and replies
-    st.subheader(f"Responses ({len(posts)})")
+    st.subheader(f"Responses ({topic['reply_count']})")
     
     if not posts:
         st.info("No responses yet. Be the first to respond!")
     else:
+        # Everything this user has liked in the thread, in one query
+        liked = cached_liked_post_ids(topic_id, st.session_state.user["id"])
+        
         for post in posts:
             with st.container():
                 # Check if this post is a solution
@@ -642,11 +1128,8 @@ def topic_view(topic_id):
                 # Like button
                 col1, col2, col3 = st.columns([1, 1, 8])
                 
-                # Check if current user has liked this post
-                user_liked = has_user_liked_post(post["id"], st.session_state.user["id"])
-                
                 with col1:
-                    if user_liked:
+                    if post["id"] in liked:
                         if st.button("❤️", key=f"unlike_{post['id']}"):
                             unlike_post(post["id"], st.session_state.user["id"])
                             st.rerun()
@@ -683,35 +1166,16 @@ def topic_view(topic_id):
                             st.rerun()
                 
                 # Display replies
-                if post["replies"]:
+                if post["replies"] or post["has_more_replies"]:
                     with st.container():
                         st.markdown(f"**{len(post['replies'])} Replies**")
-                        
-                        for reply in post["replies"]:
-                            st.markdown("---")
-                            st.markdown(f"> {reply['content']}")
-                            st.caption(f"Reply by: {reply['created_by']} | {reply['created_at'][:10]}")
-                            
-                            # Like button for replies
-                            rcol1, rcol2, rcol3 = st.columns([1, 1, 8])
-                            
-                            # Check if current user has liked this reply
-                            user_liked_reply = has_user_liked_post(reply["id"], st.session_state.user["id"])
-                            
-                            with rcol1:
-                                if user_liked_reply:
-                                    if st.button("❤️", key=f"unlike_reply_{reply['id']}"):
-                                        unlike_post(reply["id"], st.session_state.user["id"])
-                                        st.rerun()
-                                else:
-                                    if st.button("🤍", key=f"like_reply_{reply['id']}"):
-                                        like_post(reply["id"], st.session_state.user["id"])
-                                        st.rerun()
-                            
-                            with rcol2:
-                                st.write(f"{reply['like_count']}")
+                        render_replies(post, topic_id, st.session_state.user["id"], liked)
                 
                 st.markdown("---")
+        
+        if more_posts and st.button("Load more responses", key=f"more_posts_{topic_id}"):
+            thread_pages[topic_id] = thread_pages.get(topic_id, 1) + 1
+            st.rerun()
     
     # Navigation button to go back to forum
     if st.button("Back to Forum"):
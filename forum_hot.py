@@ -0,0 +1,209 @@
+# forum_hot.py
+"""Hot (trending) scores for forum topics.
+
+A topic's hot score is its activity with every event decayed
+exponentially by age: each new topic, reply, like or solution adds a
+weight that halves every HOT_HALF_LIFE seconds. Instead of decaying every
+score as time passes, each event is stored at its value relative to a
+fixed epoch, log(weight) + (t - epoch) / tau, and scores are summed in
+log space. The ordering this gives is the same as ranking by decayed
+activity "now", at any now, so a score only changes when new activity
+arrives and the forum can read the top topics straight from an index.
+
+Triggers queue activity in forum_hot_events in the same transaction as
+the write; a background thread folds the queue into
+forum_topics.hot_score every HOT_REFRESH_INTERVAL seconds. Unlikes and
+deletions are not subtracted.
+"""
+import math
+import datetime
+import threading
+from collections import defaultdict
+from db_pool import db_connection
+
+# Activity weights
+HOT_WEIGHTS = {"topic": 1.0, "reply": 1.0, "like": 0.5, "solution": 3.0}
+
+# Age at which an event counts half as much as a new one, in seconds
+HOT_HALF_LIFE = 24 * 3600
+
+# Reference time for stored scores (2024-01-01 UTC); any fixed instant works
+HOT_EPOCH = 1704067200.0
+
+# Seconds between background refreshes, and events folded in per transaction
+HOT_REFRESH_INTERVAL = 15.0
+HOT_REFRESH_BATCH = 5000
+
+_TAU = HOT_HALF_LIFE / math.log(2)
+
+# Unix time in SQLite core functions (no math extension needed)
+_NOW_SQL = "((julianday('now') - 2440587.5) * 86400.0)"
+
+HOT_EVENTS_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS forum_hot_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    topic_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    occurred_at REAL NOT NULL
+)
+'''
+
+HOT_EVENT_TRIGGERS = (
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_forum_hot_topic AFTER INSERT ON forum_topics BEGIN
+        INSERT INTO forum_hot_events (topic_id, kind, occurred_at) VALUES (NEW.id, 'topic', {_NOW_SQL});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_forum_hot_reply AFTER INSERT ON forum_posts BEGIN
+        INSERT INTO forum_hot_events (topic_id, kind, occurred_at) VALUES (NEW.topic_id, 'reply', {_NOW_SQL});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_forum_hot_like AFTER INSERT ON forum_likes BEGIN
+        INSERT INTO forum_hot_events (topic_id, kind, occurred_at)
+        SELECT topic_id, 'like', {_NOW_SQL} FROM forum_posts WHERE id = NEW.post_id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_forum_hot_solution AFTER UPDATE OF is_solution ON forum_posts
+    WHEN NEW.is_solution = 1 AND COALESCE(OLD.is_solution, 0) = 0 BEGIN
+        INSERT INTO forum_hot_events (topic_id, kind, occurred_at) VALUES (NEW.topic_id, 'solution', {_NOW_SQL});
+    END
+    '''
+)
+
+
+def event_score(kind, occurred_at):
+    """Log-space contribution of one event that happened at unix time occurred_at"""
+    return math.log(HOT_WEIGHTS[kind]) + (occurred_at - HOT_EPOCH) / _TAU
+
+
+def combine(score, other):
+    """log(exp(score) + exp(other)), where None stands for no activity"""
+    if score is None:
+        return other
+    if other is None:
+        return score
+    high, low = max(score, other), min(score, other)
+    return high + math.log1p(math.exp(low - high))
+
+
+def init_hot_scores(cursor):
+    """Add hot_score to forum_topics (backfilling it) and install the event triggers"""
+    columns = [col[1] for col in cursor.execute("PRAGMA table_info(forum_topics)").fetchall()]
+    cursor.execute(HOT_EVENTS_SCHEMA)
+    for statement in HOT_EVENT_TRIGGERS:
+        cursor.execute(statement)
+    if 'hot_score' not in columns:
+        cursor.execute("ALTER TABLE forum_topics ADD COLUMN hot_score REAL")
+        rebuild_hot_scores(cursor.connection)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_forum_topics_hot ON forum_topics (hot_score)')
+
+
+def _timestamp(value):
+    try:
+        return datetime.datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def rebuild_hot_scores(conn=None):
+    """Recompute every topic's hot score from its posts, likes and solutions"""
+    if conn is None:
+        with db_connection() as pooled:
+            return rebuild_hot_scores(pooled)
+
+    scores = {}
+    for topic_id, kind, created_at in conn.execute('''
+        SELECT id, 'topic', created_at FROM forum_topics
+        UNION ALL
+        SELECT topic_id, 'reply', created_at FROM forum_posts
+        UNION ALL
+        SELECT p.topic_id, 'like', l.created_at FROM forum_likes l JOIN forum_posts p ON p.id = l.post_id
+        UNION ALL
+        SELECT topic_id, 'solution', created_at FROM forum_posts WHERE is_solution = 1
+    '''):
+        occurred_at = _timestamp(created_at)
+        if occurred_at is not None:
+            scores[topic_id] = combine(scores.get(topic_id), event_score(kind, occurred_at))
+
+    conn.execute("DELETE FROM forum_hot_events")
+    conn.execute("UPDATE forum_topics SET hot_score = NULL")
+    conn.executemany("UPDATE forum_topics SET hot_score = ? WHERE id = ?",
+                     [(score, topic_id) for topic_id, score in scores.items()])
+    return len(scores)
+
+
+def refresh_hot_scores(batch_size=HOT_REFRESH_BATCH):
+    """Fold queued activity into hot_score; returns the number of events applied"""
+    with db_connection() as conn:
+        # Deleting with RETURNING claims the events, so concurrent
+        # refreshers never apply the same event twice
+        events = conn.execute('''
+            DELETE FROM forum_hot_events
+            WHERE id IN (SELECT id FROM forum_hot_events ORDER BY id LIMIT ?)
+            RETURNING topic_id, kind, occurred_at
+        ''', (batch_size,)).fetchall()
+        if not events:
+            return 0
+
+        increments = defaultdict(lambda: None)
+        for topic_id, kind, occurred_at in events:
+            if kind in HOT_WEIGHTS:
+                increments[topic_id] = combine(increments[topic_id], event_score(kind, occurred_at))
+
+        topic_ids = list(increments)
+        current = dict(conn.execute(
+            f"SELECT id, hot_score FROM forum_topics WHERE id IN ({', '.join('?' * len(topic_ids))})",
+            topic_ids
+        ).fetchall())
+        conn.executemany("UPDATE forum_topics SET hot_score = ? WHERE id = ?", [
+            (combine(current[topic_id], increment), topic_id)
+            for topic_id, increment in increments.items() if topic_id in current
+        ])
+    return len(events)
+
+
+class HotScoreRefresher:
+    """Daemon thread that calls refresh_hot_scores() every interval seconds"""
+
+    def __init__(self, interval=HOT_REFRESH_INTERVAL):
+        self.interval = interval
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="forum-hot-scores", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+            self._thread = None
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                # Drain the queue, one bounded transaction at a time
+                while refresh_hot_scores() >= HOT_REFRESH_BATCH:
+                    pass
+            except Exception as e:
+                print(f"Error refreshing forum hot scores: {e}")
+
+
+_refresher = None
+_refresher_lock = threading.Lock()
+
+
+def start_hot_score_refresher():
+    """Start the process-wide refresher thread (once)"""
+    global _refresher
+    if _refresher is None:
+        with _refresher_lock:
+            if _refresher is None:
+                _refresher = HotScoreRefresher().start()
+    return _refresher
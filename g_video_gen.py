@@ -1,34 +1,43 @@
 import os
 import google.generativeai as genai
-import subprocess
 import json
 import hashlib
-import glob
 import shutil
 import re
-import sys
-import threading
 import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import streamlit as st
-from gtts import gTTS
-from pydub import AudioSegment
 from moviepy.editor import VideoFileClip, AudioFileClip
 from moviepy.editor import vfx
-import tempfile  # Add this if not already imported
-
-# Set page config
-st.set_page_config(
-    page_title="Python Tutorial Generator",
-    page_icon="🐍",
-    layout="wide"
+from artifact_cache import (
+    get_artifact_cache, make_key, normalize_topic, text_digest, file_digest
 )
-
-# App title and description
-st.title("🐍 Python Tutorial Video Generator")
-st.markdown("""
-This application generates educational Python tutorial videos using AI. 
-It creates a script, Manim animation, and voice narration for any Python topic you choose.
-""")
+from llm_client import get_llm_client
+from narration import get_tts_backend, synthesize_sections, concatenate_mp3
+from media_merge import find_ffmpeg, merge_with_ffmpeg
+from manim_render import RenderError, SPLIT_SCENES, render_scene, render_sections, split_scene_sections
+
+# Model and generation settings shared by the Gemini-backed stages
+GEMINI_MODEL = 'gemini-1.5-pro'
+GENERATION_CONFIG = {
+    "temperature": 0.2,
+    "max_output_tokens": 8192
+}
+
+# Bump these whenever a prompt template changes so stale cache entries are ignored
+SCRIPT_PROMPT_VERSION = 1
+MANIM_PROMPT_VERSION = 1
+
+# Settings that change the rendered, narrated or merged output
+RENDER_QUALITIES = {
+    "preview": {"quality": "low_quality", "frame_rate": 15},      # 480p15, fast first look
+    "standard": {"quality": "medium_quality", "frame_rate": 30},  # 720p30
+    "high": {"quality": "high_quality", "frame_rate": 60}         # 1080p60
+}
+DEFAULT_QUALITY = "standard"
+RENDER_SETTINGS = RENDER_QUALITIES[DEFAULT_QUALITY]
+TTS_SETTINGS = {"lang": "en", "slow": False}
+MERGE_SETTINGS = {"video": "retimed", "audio_codec": "aac", "version": 2}
 
 # Configure Gemini API
 def setup_gemini_api(api_key=None):
@@ -50,14 +59,25 @@ def setup_gemini_api(api_key=None):
         return False
 
 # Generate script using Gemini API
+def script_cache_key(topic):
+    """Cache key for the narration script of a topic"""
+    return make_key(
+        stage="script",
+        topic=normalize_topic(topic),
+        prompt_version=SCRIPT_PROMPT_VERSION,
+        model=GEMINI_MODEL,
+        config=GENERATION_CONFIG
+    )
+
 def generate_script(topic):
+    cache = get_artifact_cache()
+    cache_key = script_cache_key(topic)
+    cached = cache.get_text(cache_key)
+    if cached:
+        return cached
+
     try:
         with st.spinner("Generating script with Gemini..."):
-            model = genai.GenerativeModel('gemini-1.5-pro')
-            generation_config = {
-                "temperature": 0.2,
-                "max_output_tokens": 8192
-            }
 
             prompt = f"""
             Create a comprehensive educational script about {topic} for a Python educational video.
@@ -104,8 +124,9 @@ def generate_script(topic):
             7. Includes encouragement and motivation
             """
 
-            response = model.generate_content(prompt, generation_config=generation_config)
-            return response.text
+            script = get_llm_client().generate(prompt, model=GEMINI_MODEL, generation_config=GENERATION_CONFIG)
+            cache.put_text(cache_key, "script", script)
+            return script
     except Exception as e:
         st.error(f"Failed to generate script: {str(e)}")
         return f"Error generating script for {topic}. Please try again."
@@ -242,15 +263,27 @@ class {safe_topic}(Scene):
         self.play(FadeOut(title), FadeOut(summary))
 """
 
+def manim_cache_key(topic, script):
+    """Cache key for the Manim code generated from a topic's script"""
+    return make_key(
+        stage="manim_code",
+        topic=normalize_topic(topic),
+        script=text_digest(script),
+        prompt_version=MANIM_PROMPT_VERSION,
+        model=GEMINI_MODEL,
+        config=GENERATION_CONFIG
+    )
+
 # Generate Manim code using Gemini API
 def generate_manim_code(topic, script):
+    cache = get_artifact_cache()
+    cache_key = manim_cache_key(topic, script)
+    cached = cache.get_text(cache_key)
+    if cached:
+        return cached
+
     try:
         with st.spinner("Generating Manim animation code with Gemini..."):
-            model = genai.GenerativeModel('gemini-1.5-pro')
-            generation_config = {
-                "temperature": 0.2,
-                "max_output_tokens": 8192
-            }
 
             safe_topic = topic.replace(' ', '').replace('-', '_')
 
@@ -314,8 +347,7 @@ def generate_manim_code(topic, script):
             Make sure your code contains a complete class definition with all methods fully implemented.
             """
 
-            response = model.generate_content(prompt, generation_config=generation_config)
-            manim_code = response.text
+            manim_code = get_llm_client().generate(prompt, model=GEMINI_MODEL, generation_config=GENERATION_CONFIG)
 
             print("ORIGINAL RESPONSE FROM GEMINI:")
             print(manim_code[:200] + "..." if len(manim_code) > 200 else manim_code)
@@ -339,12 +371,45 @@ def generate_manim_code(topic, script):
             print("AFTER CLEANING:")
             print(cleaned_code[:200] + "..." if len(cleaned_code) > 200 else cleaned_code)
 
+            # Only code that passes validation is worth reusing
+            is_valid, _ = validate_manim_code(cleaned_code)
+            if is_valid:
+                cache.put_text(cache_key, "manim_code", cleaned_code, ext='.py')
+
             return cleaned_code
     except Exception as e:
         st.error(f"Failed to generate Manim code: {str(e)}")
         return f"Error generating Manim code for {topic}. Please try again."
 
-def render_manim_animation(manim_code, topic):
+def render_cache_key(manim_code, quality=DEFAULT_QUALITY):
+    """Cache key for the video rendered from a piece of Manim code"""
+    return make_key(stage="render", code=text_digest(manim_code), settings=RENDER_QUALITIES[quality])
+
+def quality_suffix(quality):
+    """File name suffix for a render quality; the default keeps the old names"""
+    return "" if quality == DEFAULT_QUALITY else f"_{quality}"
+
+def find_scene_class(manim_code, topic):
+    """Name of the Scene subclass defined in manim_code, falling back to the topic"""
+    match = re.search(r'class\s+(\w+)\s*\(\s*(?:\w+\.)?\w*Scene\s*\)', manim_code)
+    if match:
+        return match.group(1)
+    return topic.replace(' ', '').replace('-', '_')
+
+def render_manim_animation(manim_code, topic, quality=DEFAULT_QUALITY):
+    settings = RENDER_QUALITIES[quality]
+    safe_topic = topic.replace(' ', '_').replace("'", "").replace('"', '')
+    output_dir = "output"
+    os.makedirs(output_dir, exist_ok=True)
+    final_path = os.path.join(output_dir, f"{safe_topic}{quality_suffix(quality)}.mp4")
+
+    cache = get_artifact_cache()
+    cache_key = render_cache_key(manim_code, quality)
+    cached_path = cache.get_file(cache_key)
+    if cached_path:
+        shutil.copy(cached_path, final_path)
+        return final_path
+
     try:
         with st.spinner("Rendering animation (this may take a few minutes)..."):
             # Create a unique temporary directory for rendering
@@ -376,134 +441,41 @@ def render_manim_animation(manim_code, topic):
                 else:
                     manim_code = result
 
-                # Prepare class and file names
-                safe_topic = topic.replace(' ', '_').replace("'", "").replace('"', '')
-                class_name = topic.replace(' ', '').replace('-', '_')
-
-                # Ensure we use absolute paths for media output
-                media_dir = os.path.join(temp_dir, "media")
-                os.makedirs(media_dir, exist_ok=True)
-                
-                # Create the necessary subdirectories
-                for quality in ["720p30", "1080p60", "480p15"]:
-                    os.makedirs(os.path.join(media_dir, "videos", quality), exist_ok=True)
-                    os.makedirs(os.path.join(media_dir, "videos", quality, "partial_movie_files", class_name), exist_ok=True)
-                
-                # Add rendering code with explicit quality and output path settings
-                render_code = f"""
-# Configure Manim with explicit paths
-import os
-from manim import config
-
-# Set rendering options
-config.quality = "medium_quality"  # 720p30, less resource-intensive
-config.frame_rate = 30
-config.media_dir = r"{media_dir.replace(os.sep, '/')}"
-config.output_file = r"{class_name}"
+                # The class comes from the code itself since cached code may
+                # have been generated for a differently spelled topic
+                class_name = find_scene_class(manim_code, topic)
 
-# Render the scene
-if __name__ == "__main__":
-    scene = {class_name}()
-    scene.render()
-"""
-                manim_code = manim_code.rstrip() + "\n\n" + render_code
+                video_path = None
 
-                # Save the Manim code to a file in the temp directory with UTF-8 encoding
-                script_file = os.path.join(temp_dir, f"{safe_topic}.py")
-                with open(script_file, 'w', encoding='utf-8') as f:
-                    f.write(manim_code)
+                # When enabled, render each independent section as its own
+                # scene, in parallel, reusing clips of unchanged sections
+                sections = split_scene_sections(manim_code, class_name) if SPLIT_SCENES else None
+                ffmpeg = find_ffmpeg()
+                if sections and ffmpeg:
+                    status_placeholder.info(f"Rendering {len(sections)} sections in parallel (check console for progress)...")
+                    try:
+                        video_path = render_sections(
+                            sections, class_name, os.path.join(temp_dir, "sections"), settings,
+                            os.path.join(temp_dir, f"{safe_topic}.mp4"), ffmpeg=ffmpeg
+                        )
+                    except Exception as e:
+                        # Sections may share state after all; render the whole scene
+                        print(f"Section render failed, rendering the full scene instead: {e}")
 
-                # Change to the temp directory for rendering
-                original_cwd = os.getcwd()
-                os.chdir(temp_dir)
-                
-                status_placeholder.info(f"Starting Manim rendering process (check console for progress)...")
-                
-                # Execute the Python script with properly configured environment
-                command = f"{sys.executable} {script_file}"
-                
-                process = subprocess.Popen(
-                    command,
-                    shell=True,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    bufsize=1,
-                    universal_newlines=True
-                )
-
-                # Modified read_output function that doesn't update Streamlit UI
-                stdout_output, stderr_output = [], []
-                def read_output(pipe, store):
-                    for line in iter(pipe.readline, ''):
-                        message = line.strip()
-                        store.append(message)
-                        print(f"Rendering: {message}")  # Only print to console, not to Streamlit
-
-                stdout_thread = threading.Thread(target=read_output, args=(process.stdout, stdout_output))
-                stderr_thread = threading.Thread(target=read_output, args=(process.stderr, stderr_output))
-                stdout_thread.start()
-                stderr_thread.start()
-
-                # Wait for the process to complete
-                process.wait()
-                stdout_thread.join()
-                stderr_thread.join()
-
-                # Change back to original directory
-                os.chdir(original_cwd)
-
-                # Update status after threads are done
-                if process.returncode != 0:
-                    status_placeholder.error(f"Manim render failed with return code {process.returncode}")
-                    for line in stderr_output[-5:]:  # Show last 5 error lines
-                        st.error(line)
-                    return None
-                else:
-                    status_placeholder.success("Manim rendering completed successfully!")
-
-                # Find the generated video file with absolute paths
-                video_path = None
-                
-                # Define potential paths with the absolute temp directory
-                potential_paths = [
-                    os.path.join(media_dir, "videos", "720p30", f"{class_name}.mp4"),
-                    os.path.join(media_dir, "videos", "1080p60", f"{class_name}.mp4"),
-                    os.path.join(media_dir, "videos", "480p15", f"{class_name}.mp4"),
-                ]
-                
-                for path in potential_paths:
-                    if os.path.exists(path):
-                        video_path = path
-                        break
-                
-                # If no direct match, search for partial movie files
                 if not video_path:
-                    for quality in ["720p30", "1080p60", "480p15"]:
-                        partial_dir = os.path.join(media_dir, "videos", quality, "partial_movie_files", class_name)
-                        if os.path.exists(partial_dir):
-                            mp4_files = glob.glob(os.path.join(partial_dir, "*.mp4"))
-                            if mp4_files:
-                                video_path = max(mp4_files, key=os.path.getctime)
-                                break
-                
-                # Last resort: Recursive search for any MP4 in the media directory
-                if not video_path:
-                    mp4_files = glob.glob(os.path.join(media_dir, "**", "*.mp4"), recursive=True)
-                    if mp4_files:
-                        video_path = max(mp4_files, key=os.path.getctime)
-                
-                if not video_path or not os.path.exists(video_path):
-                    status_placeholder.error("Could not find rendered video file")
-                    for line in stdout_output[-10:]:  # Show last 10 lines of output
-                        st.error(f"Output: {line}")
-                    return None
-                
+                    status_placeholder.info("Starting Manim rendering process (check console for progress)...")
+                    try:
+                        video_path = render_scene(manim_code, class_name, os.path.join(temp_dir, "scene"), settings)
+                    except RenderError as e:
+                        message, _, details = str(e).partition("\n")
+                        status_placeholder.error(message)
+                        for line in details.splitlines():
+                            st.error(line)
+                        return None
+
                 # Copy to a more permanent location in the Streamlit app directory
-                output_dir = "output"
-                os.makedirs(output_dir, exist_ok=True)
-                final_path = os.path.join(output_dir, f"{safe_topic}.mp4")
                 shutil.copy(video_path, final_path)
+                cache.put_file(cache_key, "render", final_path)
                 
                 status_placeholder.success(f"Video rendered successfully!")
                 return final_path
@@ -535,44 +507,44 @@ def split_script_into_sections(script):
     paragraphs = [p for p in script.split('\n\n') if p.strip()]
     return {f"part{i+1}": section for i, section in enumerate(paragraphs)}
 
+def audio_cache_key(script):
+    """Cache key for the narration audio of a script"""
+    voice = get_tts_backend(**TTS_SETTINGS).settings()
+    return make_key(stage="audio", script=text_digest(script), settings=voice)
+
 # Function to generate TTS audio from script
 def generate_audio(script, topic):
+    audio_dir = "audio"
+    os.makedirs(audio_dir, exist_ok=True)
+    final_audio_path = f"{audio_dir}/{topic.replace(' ', '_')}_complete.mp3"
+
+    cache = get_artifact_cache()
+    cache_key = audio_cache_key(script)
+    cached_path = cache.get_file(cache_key)
+    if cached_path:
+        shutil.copy(cached_path, final_audio_path)
+        return final_audio_path
+
     try:
         with st.spinner("Generating voice narration..."):
-            audio_dir = "audio"
-            os.makedirs(audio_dir, exist_ok=True)
-
-            # Split the script into sections
+            # Split the script into sections and clean each for TTS
             sections = split_script_into_sections(script)
+            texts = [clean_text_for_tts(text) for text in sections.values()]
+            texts = [text for text in texts if text]
 
-            audio_files = []
+            # Synthesize sections concurrently; unchanged paragraphs come
+            # straight from the section cache
             progress_bar = st.progress(0)
-            total_sections = len(sections)
-
-            for i, (section_name, section_text) in enumerate(sections.items()):
-                section_filename = f"{audio_dir}/{topic.replace(' ', '')}{section_name}.mp3"
-
-                # Clean the text for TTS
-                clean_text = clean_text_for_tts(section_text)
-
-                # Generate the audio
-                tts = gTTS(text=clean_text, lang='en', slow=False)
-                tts.save(section_filename)
-                audio_files.append(section_filename)
-
-                # Update progress
-                progress_bar.progress((i + 1) / total_sections)
-
-            # Combine all audio files
-            combined_audio = AudioSegment.empty()
-            for audio_file in audio_files:
-                sound = AudioSegment.from_mp3(audio_file)
-                combined_audio += sound
+            section_files = synthesize_sections(
+                texts,
+                get_tts_backend(**TTS_SETTINGS),
+                on_section_done=lambda done, total: progress_bar.progress(done / total)
+            )
 
-            # Export the combined audio
-            final_audio_path = f"{audio_dir}/{topic.replace(' ', '_')}_complete.mp3"
-            combined_audio.export(final_audio_path, format="mp3")
+            # Join the sections in a single pass
+            concatenate_mp3(section_files, final_audio_path)
 
+            cache.put_file(cache_key, "audio", final_audio_path)
             return final_audio_path
 
     except Exception as e:
@@ -581,9 +553,55 @@ def generate_audio(script, topic):
         st.error(traceback.format_exc())
         return None
     
-# Combine video and audio using MoviePy
+def merge_cache_key(video_digest, audio_digest):
+    """Cache key for the merged video of a rendered video and narration"""
+    return make_key(stage="merge", video=video_digest, audio=audio_digest, settings=MERGE_SETTINGS)
+
+# Fallback merge when no ffmpeg binary is available
+def merge_with_moviepy(video_path, audio_path, output_path):
+    # Load the video and audio
+    video_clip = VideoFileClip(video_path)
+    audio_clip = AudioFileClip(audio_path)
+
+    # Get durations
+    audio_duration = audio_clip.duration
+    video_duration = video_clip.duration
+
+    # Adjust video speed to match audio duration
+    if video_duration != audio_duration:
+        speed_factor = video_duration / audio_duration
+        adjusted_video = video_clip.fx(vfx.speedx, factor=speed_factor)
+    else:
+        adjusted_video = video_clip
+
+    # Set the audio of the adjusted video
+    final_clip = adjusted_video.set_audio(audio_clip)
 
-def merge_video_audio(video_path, audio_path, topic):
+    # Write the result to a file; the temp audio file is private to this
+    # call so concurrent merges do not overwrite each other's
+    work_dir = tempfile.mkdtemp(prefix="merge_")
+    try:
+        final_clip.write_videofile(
+            output_path,
+            codec='libx264',
+            audio_codec='aac',
+            temp_audiofile=os.path.join(work_dir, 'temp-audio.m4a'),
+            remove_temp=True
+        )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    # Close the clips to free resources
+    video_clip.close()
+    audio_clip.close()
+    adjusted_video.close()
+    final_clip.close()
+
+    return output_path
+
+# Combine video and audio, retiming the video to the narration
+
+def merge_video_audio(video_path, audio_path, topic, quality=DEFAULT_QUALITY):
     try:
         with st.spinner("Merging video and audio..."):
             if not video_path or not audio_path:
@@ -596,41 +614,24 @@ def merge_video_audio(video_path, audio_path, topic):
                 raise ValueError(f"Audio file not found: {audio_path}")
 
             safe_topic = topic.replace(' ', '_').replace("'", "").replace('"', '')
-            output_path = f"{safe_topic}_final.mp4"
-
-            # Load the video and audio
-            video_clip = VideoFileClip(video_path)
-            audio_clip = AudioFileClip(audio_path)
-
-            # Get durations
-            audio_duration = audio_clip.duration
-            video_duration = video_clip.duration
-
-            # Adjust video speed to match audio duration
-            if video_duration != audio_duration:
-                speed_factor = video_duration / audio_duration
-                adjusted_video = video_clip.fx(vfx.speedx, factor=speed_factor)
+            output_path = f"{safe_topic}{quality_suffix(quality)}_final.mp4"
+
+            cache = get_artifact_cache()
+            cache_key = merge_cache_key(file_digest(video_path), file_digest(audio_path))
+            cached_path = cache.get_file(cache_key)
+            if cached_path:
+                shutil.copy(cached_path, output_path)
+                return output_path
+
+            # ffmpeg rescales timestamps and stream-copies the video; MoviePy
+            # (a full decode and re-encode) is only used without ffmpeg
+            ffmpeg = find_ffmpeg()
+            if ffmpeg:
+                merge_with_ffmpeg(video_path, audio_path, output_path, ffmpeg)
             else:
-                adjusted_video = video_clip
-
-            # Set the audio of the adjusted video
-            final_clip = adjusted_video.set_audio(audio_clip)
-
-            # Write the result to a file
-            final_clip.write_videofile(
-                output_path,
-                codec='libx264',
-                audio_codec='aac',
-                temp_audiofile='temp-audio.m4a',
-                remove_temp=True
-            )
-
-            # Close the clips to free resources
-            video_clip.close()
-            audio_clip.close()
-            adjusted_video.close()
-            final_clip.close()
+                merge_with_moviepy(video_path, audio_path, output_path)
 
+            cache.put_file(cache_key, "merge", output_path)
             return output_path
 
     except Exception as e:
@@ -639,137 +640,264 @@ def merge_video_audio(video_path, audio_path, topic):
         st.error(traceback.format_exc())
         return None
 
-# Session state initialization
-if 'script' not in st.session_state:
-    st.session_state.script = None
-if 'manim_code' not in st.session_state:
-    st.session_state.manim_code = None
-if 'video_path' not in st.session_state:
-    st.session_state.video_path = None
-if 'audio_path' not in st.session_state:
-    st.session_state.audio_path = None
-if 'final_video_path' not in st.session_state:
-    st.session_state.final_video_path = None
-if 'api_key_valid' not in st.session_state:
-    st.session_state.api_key_valid = False
-
-# Sidebar for configuration
-with st.sidebar:
-    st.header("Configuration")
-    
-    # API Key input
-    api_key = st.text_input("Gemini API Key", type="password",  help="Get your Gemini API key from Google AI Studio")
-    
-    if st.button("Validate API Key"):
-        if api_key:
-            if setup_gemini_api(api_key):
-                st.session_state.api_key_valid = True
-                st.success("API key is valid!")
+def get_cached_tutorial(topic, quality=DEFAULT_QUALITY):
+    """Return every artifact for topic if the whole pipeline is cached, else None.
+
+    Walks the same keys the generation stages use, so a hit means the
+    tutorial can be shown without calling Gemini, Manim, gTTS or MoviePy.
+    """
+    cache = get_artifact_cache()
+
+    script = cache.get_text(script_cache_key(topic))
+    if not script:
+        return None
+    manim_code = cache.get_text(manim_cache_key(topic, script))
+    if not manim_code:
+        return None
+
+    video_key = render_cache_key(manim_code, quality)
+    audio_key = audio_cache_key(script)
+    video_digest = cache.get_digest(video_key)
+    audio_digest = cache.get_digest(audio_key)
+    if not video_digest or not audio_digest:
+        return None
+
+    final_path = cache.get_file(merge_cache_key(video_digest, audio_digest))
+    if not final_path:
+        return None
+
+    return {
+        "script": script,
+        "manim_code": manim_code,
+        "video_path": cache.get_file(video_key),
+        "audio_path": cache.get_file(audio_key),
+        "final_video_path": final_path
+    }
+
+# Stage dependencies of the pipeline. Narration only needs the script, so
+# it runs alongside Manim code generation and rendering
+PIPELINE_GRAPH = {
+    "script": (),
+    "manim_code": ("script",),
+    "render": ("manim_code",),
+    "audio": ("script",),
+    "merge": ("render", "audio")
+}
+PIPELINE_STAGES = tuple(PIPELINE_GRAPH)
+
+def run_stage_graph(graph, tasks, on_progress=None, max_workers=2):
+    """Run each stage as soon as all of its dependencies have finished.
+
+    tasks[stage](results) receives the results of completed stages.
+    on_progress(running, completed) is called whenever the set of running
+    stages changes. The first failing stage's exception is re-raised after
+    stages already running have finished; stages not yet started are skipped.
+    """
+    results = {}
+    pending = dict(graph)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            for stage, deps in list(pending.items()):
+                if all(dep in results for dep in deps):
+                    del pending[stage]
+                    running[executor.submit(tasks[stage], results)] = stage
+
+            if on_progress:
+                on_progress(sorted(running.values()), len(results))
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                results[stage] = future.result()
+
+    return results
+
+def _require(result, message):
+    """Turn the pipeline functions' None / error-string failures into exceptions"""
+    if not result or (isinstance(result, str) and result.startswith("Error generating")):
+        raise RuntimeError(message)
+    return result
+
+def generate_tutorial(topic, on_progress=None, quality=DEFAULT_QUALITY):
+    """Run every pipeline stage for topic and return the produced artifacts.
+
+    Stages are scheduled from PIPELINE_GRAPH, so narration is synthesized
+    while the animation is generated and rendered. quality picks one of
+    RENDER_QUALITIES; script, code and narration are shared between
+    qualities through the artifact cache. on_progress(running, completed)
+    reports the running stage names and the number of finished stages.
+    Raises RuntimeError naming the stage that failed.
+    """
+    tasks = {
+        "script": lambda r: _require(generate_script(topic), "Failed to generate script."),
+        "manim_code": lambda r: _require(generate_manim_code(topic, r["script"]), "Failed to generate animation code."),
+        "render": lambda r: _require(render_manim_animation(r["manim_code"], topic, quality), "Failed to render animation."),
+        "audio": lambda r: _require(generate_audio(r["script"], topic), "Failed to generate audio narration."),
+        "merge": lambda r: _require(merge_video_audio(r["render"], r["audio"], topic, quality), "Failed to merge video and audio.")
+    }
+    results = run_stage_graph(PIPELINE_GRAPH, tasks, on_progress=on_progress)
+
+    return {
+        "script": results["script"],
+        "manim_code": results["manim_code"],
+        "video_path": results["render"],
+        "audio_path": results["audio"],
+        "final_video_path": results["merge"],
+        "quality": quality
+    }
+
+def main():
+    # Set page config
+    st.set_page_config(
+        page_title="Python Tutorial Generator",
+        page_icon="🐍",
+        layout="wide"
+    )
+
+    # App title and description
+    st.title("🐍 Python Tutorial Video Generator")
+    st.markdown("""
+    This application generates educational Python tutorial videos using AI. 
+    It creates a script, Manim animation, and voice narration for any Python topic you choose.
+    """)
+
+    # Session state initialization
+    if 'script' not in st.session_state:
+        st.session_state.script = None
+    if 'manim_code' not in st.session_state:
+        st.session_state.manim_code = None
+    if 'video_path' not in st.session_state:
+        st.session_state.video_path = None
+    if 'audio_path' not in st.session_state:
+        st.session_state.audio_path = None
+    if 'final_video_path' not in st.session_state:
+        st.session_state.final_video_path = None
+    if 'api_key_valid' not in st.session_state:
+        st.session_state.api_key_valid = False
+
+    # Sidebar for configuration
+    with st.sidebar:
+        st.header("Configuration")
+
+        # API Key input
+        api_key = st.text_input("Gemini API Key", type="password",  help="Get your Gemini API key from Google AI Studio")
+
+        if st.button("Validate API Key"):
+            if api_key:
+                if setup_gemini_api(api_key):
+                    st.session_state.api_key_valid = True
+                    st.success("API key is valid!")
+                else:
+                    st.session_state.api_key_valid = False
+                    st.error("Invalid API key. Please check and try again.")
             else:
-                st.session_state.api_key_valid = False
-                st.error("Invalid API key. Please check and try again.")
-        else:
-            st.warning("Please enter an API key.")
-    
-    # Topic input
-    topic = st.text_input("Python Topic",  help="Enter a Python topic (e.g., 'Python Lists', 'Recursion', 'For Loops')")
-    
-    # Generation button
-    generate_button = st.button("Generate Tutorial", disabled=not (st.session_state.api_key_valid and topic))
-
-# Main content area
-if generate_button and topic:
-    # Reset session state for a new generation
-    st.session_state.script = None
-    st.session_state.manim_code = None
-    st.session_state.video_path = None
-    st.session_state.audio_path = None
-    st.session_state.final_video_path = None
-    
-    # Step 1: Generate script
-    st.header("Step 1: Generate Script")
-    st.session_state.script = generate_script(topic)
-    
-    if st.session_state.script:
-        st.success("Script generated successfully!")
-        st.subheader("Generated Script")
-        st.text_area("Script", st.session_state.script, height=300)
-        
-        # Step 2: Generate Manim code
-        st.header("Step 2: Generate Animation Code")
-        st.session_state.manim_code = generate_manim_code(topic, st.session_state.script)
-        
-        if st.session_state.manim_code:
-            st.success("Animation code generated successfully!")
-            st.subheader("Generated Manim Code")
-            st.code(st.session_state.manim_code, language="python")
-            
-            # Step 3: Render animation
-            st.header("Step 3: Render Animation")
-            st.session_state.video_path = render_manim_animation(st.session_state.manim_code, topic)
-            
-            if st.session_state.video_path:
-                st.success("Animation rendered successfully!")
-                st.subheader("Generated Animation")
-                st.video(st.session_state.video_path)
-                
-                # Step 4: Generate audio
-                st.header("Step 4: Generate Voice Narration")
-                st.session_state.audio_path = generate_audio(st.session_state.script, topic)
-                
-                if st.session_state.audio_path:
-                    st.success("Voice narration generated successfully!")
-                    st.subheader("Generated Audio")
-                    st.audio(st.session_state.audio_path)
-                    
-                    # Step 5: Merge video and audio
-                    st.header("Step 5: Create Final Tutorial")
-                    st.session_state.final_video_path = merge_video_audio(
-                        st.session_state.video_path, 
-                        st.session_state.audio_path, 
-                        topic
-                    )
-                    
-                    if st.session_state.final_video_path:
-                        st.success("🎉 Tutorial video created successfully!")
-                        st.subheader("Final Tutorial Video")
-                        st.video(st.session_state.final_video_path)
-                        
-                        # Download button
-                        with open(st.session_state.final_video_path, "rb") as file:
-                            st.download_button(
-                                label="Download Tutorial Video",
-                                data=file,
-                                file_name=f"{topic.replace(' ', '_')}_tutorial.mp4",
-                                mime="video/mp4"
-                            )
+                st.warning("Please enter an API key.")
+
+        # Topic input
+        topic = st.text_input("Python Topic",  help="Enter a Python topic (e.g., 'Python Lists', 'Recursion', 'For Loops')")
+
+        # Generation button
+        generate_button = st.button("Generate Tutorial", disabled=not (st.session_state.api_key_valid and topic))
+
+    # Main content area
+    if generate_button and topic:
+        # Reset session state for a new generation
+        st.session_state.script = None
+        st.session_state.manim_code = None
+        st.session_state.video_path = None
+        st.session_state.audio_path = None
+        st.session_state.final_video_path = None
+
+        # Step 1: Generate script
+        st.header("Step 1: Generate Script")
+        st.session_state.script = generate_script(topic)
+
+        if st.session_state.script:
+            st.success("Script generated successfully!")
+            st.subheader("Generated Script")
+            st.text_area("Script", st.session_state.script, height=300)
+
+            # Step 2: Generate Manim code
+            st.header("Step 2: Generate Animation Code")
+            st.session_state.manim_code = generate_manim_code(topic, st.session_state.script)
+
+            if st.session_state.manim_code:
+                st.success("Animation code generated successfully!")
+                st.subheader("Generated Manim Code")
+                st.code(st.session_state.manim_code, language="python")
+
+                # Step 3: Render animation
+                st.header("Step 3: Render Animation")
+                st.session_state.video_path = render_manim_animation(st.session_state.manim_code, topic)
+
+                if st.session_state.video_path:
+                    st.success("Animation rendered successfully!")
+                    st.subheader("Generated Animation")
+                    st.video(st.session_state.video_path)
+
+                    # Step 4: Generate audio
+                    st.header("Step 4: Generate Voice Narration")
+                    st.session_state.audio_path = generate_audio(st.session_state.script, topic)
+
+                    if st.session_state.audio_path:
+                        st.success("Voice narration generated successfully!")
+                        st.subheader("Generated Audio")
+                        st.audio(st.session_state.audio_path)
+
+                        # Step 5: Merge video and audio
+                        st.header("Step 5: Create Final Tutorial")
+                        st.session_state.final_video_path = merge_video_audio(
+                            st.session_state.video_path, 
+                            st.session_state.audio_path, 
+                            topic
+                        )
+
+                        if st.session_state.final_video_path:
+                            st.success("🎉 Tutorial video created successfully!")
+                            st.subheader("Final Tutorial Video")
+                            st.video(st.session_state.final_video_path)
+
+                            # Download button
+                            with open(st.session_state.final_video_path, "rb") as file:
+                                st.download_button(
+                                    label="Download Tutorial Video",
+                                    data=file,
+                                    file_name=f"{topic.replace(' ', '_')}_tutorial.mp4",
+                                    mime="video/mp4"
+                                )
+                        else:
+                            st.error("Failed to merge video and audio.")
                     else:
-                        st.error("Failed to merge video and audio.")
+                        st.error("Failed to generate audio narration.")
                 else:
-                    st.error("Failed to generate audio narration.")
+                    st.error("Failed to render animation.")
             else:
-                st.error("Failed to render animation.")
+                st.error("Failed to generate animation code.")
         else:
-            st.error("Failed to generate animation code.")
-    else:
-        st.error("Failed to generate script.")
-
-# If nothing has been generated yet, show instructions
-if not st.session_state.script:
-    st.info("""
-    ### How to use this app:
-    1. Enter your Gemini API key in the sidebar
-    2. Enter a Python topic you want to learn about
-    3. Click 'Generate Tutorial' to create your custom tutorial video
-    4. Wait for the process to complete (it may take a few minutes)
-    5. Download your finished tutorial video
-    
-    This app will create a complete educational video with:
-    - A detailed script explaining the Python topic
-    - Animated visualizations created with Manim
-    - Professional voice narration
-    """)
+            st.error("Failed to generate script.")
 
-# Footer
-st.markdown("---")
-st.markdown("Made with ❤️ using Streamlit, Gemini AI, Manim, and gTTS")
\ No newline at end of file
+    # If nothing has been generated yet, show instructions
+    if not st.session_state.script:
+        st.info("""
+        ### How to use this app:
+        1. Enter your Gemini API key in the sidebar
+        2. Enter a Python topic you want to learn about
+        3. Click 'Generate Tutorial' to create your custom tutorial video
+        4. Wait for the process to complete (it may take a few minutes)
+        5. Download your finished tutorial video
+
+        This app will create a complete educational video with:
+        - A detailed script explaining the Python topic
+        - Animated visualizations created with Manim
+        - Professional voice narration
+        """)
+
+    # Footer
+    st.markdown("---")
+    st.markdown("Made with ❤️ using Streamlit, Gemini AI, Manim, and gTTS")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+# grader.py
+"""Sandboxed grading of code challenge submissions.
+
+Submissions never run in the web process. A pool of worker processes is
+started ahead of time; each worker caps its own address space, file
+writes and core dumps before accepting work. Every test then gets a
+CPU-time budget (RLIMIT_CPU, reported as a timeout through SIGXCPU) and
+a wall-clock budget enforced by the parent, which kills the worker when a
+test overruns while sleeping or stuck in C code. A worker that timed out,
+crashed or ran out of memory is replaced, and every worker is recycled
+after SUBMISSIONS_PER_WORKER submissions.
+
+    result = get_grader().grade(code, "decode_map", test_cases)
+
+returns a dict with the submission status, per-test results and the
+captured output; see grade().
+"""
+import io
+import os
+import re
+import math
+import queue
+import signal
+import threading
+import contextlib
+import multiprocessing
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, only the wall-clock timeout applies
+    resource = None
+
+# Worker processes grading at once (override with VIDEDU_GRADER_WORKERS)
+GRADER_WORKERS = int(os.getenv("VIDEDU_GRADER_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Per-test budgets: CPU seconds in the worker, and wall-clock seconds seen by the parent
+TEST_CPU_SECONDS = 2
+TEST_WALL_SECONDS = 5.0
+
+# Memory a submission may allocate on top of the worker's own footprint, in bytes
+SUBMISSION_MEMORY_LIMIT = 256 * 1024 * 1024
+
+# Submissions a worker grades before it is replaced
+SUBMISSIONS_PER_WORKER = 50
+
+# Seconds to wait for a new worker to finish starting up
+WORKER_START_TIMEOUT = 30.0
+
+# Workers run at lower CPU priority so grading never starves the web process
+WORKER_NICENESS = 5
+
+# Longest output, printed text or error message returned per test
+MAX_OUTPUT_CHARS = 2000
+
+# Submission statuses
+GRADED = "graded"
+MISSING_FUNCTION = "missing_function"
+LOAD_ERROR = "error"
+LOAD_TIMEOUT = "timeout"
+CRASHED = "crashed"
+
+# Test statuses
+PASSED = "passed"
+FAILED = "failed"
+ERROR = "error"
+TIMEOUT = "timeout"
+OUT_OF_MEMORY = "memory"
+SKIPPED = "skipped"
+
+
+class _CpuLimitExceeded(BaseException):
+    """Raised by the SIGXCPU handler; BaseException so `except Exception` in a submission cannot swallow it"""
+
+
+def _truncate(text):
+    return text if len(text) <= MAX_OUTPUT_CHARS else text[:MAX_OUTPUT_CHARS] + "…"
+
+
+def _describe(value):
+    try:
+        return _truncate(str(value))
+    except Exception as e:
+        return f"<unprintable {type(value).__name__}: {e}>"
+
+
+def _address_space():
+    """Current virtual memory size of this process in bytes (0 if unknown)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _apply_worker_limits(memory_limit):
+    if hasattr(os, "nice"):
+        try:
+            os.nice(WORKER_NICENESS)
+        except OSError:
+            pass
+    if resource is None:
+        return
+
+    for limit, value in ((resource.RLIMIT_AS, _address_space() + memory_limit),
+                         (resource.RLIMIT_FSIZE, 0),
+                         (resource.RLIMIT_CORE, 0)):
+        try:
+            hard = resource.getrlimit(limit)[1]
+            if hard != resource.RLIM_INFINITY:
+                value = min(value, hard)
+            resource.setrlimit(limit, (value, hard))
+        except (ValueError, OSError):
+            pass
+
+    def on_cpu_limit(signum, frame):
+        raise _CpuLimitExceeded()
+
+    signal.signal(signal.SIGXCPU, on_cpu_limit)
+
+
+@contextlib.contextmanager
+def _cpu_budget(seconds):
+    """Deliver SIGXCPU once this process has used `seconds` more CPU time"""
+    if resource is None:
+        yield
+        return
+
+    hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = math.ceil(usage.ru_utime + usage.ru_stime + seconds)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    try:
+        yield
+    finally:
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+def _cpu_time():
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _run_test(function, test, cpu_seconds):
+    input_val = test["input"]
+    started = _cpu_time()
+    result = {"status": ERROR, "output": None, "error": None}
+    try:
+        with _cpu_budget(cpu_seconds):
+            output = function(*input_val) if isinstance(input_val, tuple) else function(input_val)
+            result["status"] = PASSED if output == test["expected"] else FAILED
+            result["output"] = _describe(output)
+    except _CpuLimitExceeded:
+        result["status"] = TIMEOUT
+    except MemoryError:
+        result["status"] = OUT_OF_MEMORY
+    except Exception as e:
+        result["error"] = _describe(e)
+    result["cpu_time"] = round(_cpu_time() - started, 4)
+    return result
+
+
+def _worker_main(conn, memory_limit):
+    """Worker process: grade submissions sent over conn until told to stop"""
+    _apply_worker_limits(memory_limit)
+    conn.send(("ready",))
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message[0] == "stop":
+            return
+
+        _, code, function_name, test_cases, cpu_seconds = message
+        printed = io.StringIO()
+        recycle = False
+        with contextlib.redirect_stdout(printed), contextlib.redirect_stderr(printed):
+            namespace = {"__name__": "__submission__"}
+            try:
+                with _cpu_budget(cpu_seconds):
+                    exec(code, namespace)
+                function = namespace.get(function_name)
+                loaded = (GRADED, None) if callable(function) else (MISSING_FUNCTION, None)
+            except _CpuLimitExceeded:
+                loaded, recycle = (LOAD_TIMEOUT, None), True
+            except MemoryError:
+                loaded, recycle = (LOAD_ERROR, "MemoryError"), True
+            except BaseException as e:
+                # SyntaxError, SystemExit and the like end the submission, not the worker
+                loaded = (LOAD_ERROR, _describe(e) or type(e).__name__)
+            conn.send(("loaded",) + loaded)
+
+            if loaded[0] == GRADED:
+                for test in test_cases:
+                    result = _run_test(function, test, cpu_seconds)
+                    recycle = recycle or result["status"] in (TIMEOUT, OUT_OF_MEMORY)
+                    conn.send(("test", result))
+        conn.send(("done", _truncate(printed.getvalue()), recycle))
+
+
+class _Worker:
+    """One grading process and the parent's end of its pipe"""
+
+    def __init__(self, context, memory_limit):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, memory_limit),
+                                       name="grader-worker", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.submissions = 0
+        self.exited = False
+
+    def receive(self, timeout):
+        """Next message from the worker, or None if it timed out or died"""
+        try:
+            if self.conn.poll(timeout):
+                return self.conn.recv()
+        except (EOFError, OSError):
+            self.exited = True
+        return None
+
+    def crashed(self):
+        """Whether the process died, even if it has not been reaped yet"""
+        return self.exited or not self.process.is_alive()
+
+    def stop(self):
+        try:
+            self.conn.send(("stop",))
+        except (OSError, ValueError):
+            pass
+        self.process.join(1)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class GraderPool:
+    """Fixed-size pool of sandboxed grading processes.
+
+    Workers are spawned rather than forked so they do not inherit the
+    threads and open connections of the Streamlit server. grade() blocks
+    while every worker is busy, so at most num_workers submissions run at
+    once.
+    """
+
+    def __init__(self, num_workers=GRADER_WORKERS, submissions_per_worker=SUBMISSIONS_PER_WORKER,
+                 memory_limit=SUBMISSION_MEMORY_LIMIT):
+        self.submissions_per_worker = submissions_per_worker
+        self.memory_limit = memory_limit
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._workers = set()
+        self._lock = threading.Lock()
+        for _ in range(max(1, num_workers)):
+            self._add_worker()
+
+    def _add_worker(self):
+        worker = _Worker(self._context, self.memory_limit)
+        with self._lock:
+            self._workers.add(worker)
+        self._idle.put(worker)
+
+    def _retire(self, worker, kill=False):
+        with self._lock:
+            self._workers.discard(worker)
+        if kill:
+            worker.kill()
+        else:
+            worker.stop()
+
+    def grade(self, code, function_name, test_cases, cpu_seconds=TEST_CPU_SECONDS,
+              wall_seconds=TEST_WALL_SECONDS):
+        """Run a submission against its test cases in a worker process.
+
+        Returns {"status", "error", "tests", "output"}: status is GRADED,
+        MISSING_FUNCTION, LOAD_ERROR, LOAD_TIMEOUT or CRASHED; tests has
+        one {"test_num", "status", "output", "error", "cpu_time"} dict per
+        test case once the function loaded, where status is PASSED,
+        FAILED, ERROR, TIMEOUT, OUT_OF_MEMORY or SKIPPED (not run because
+        the worker had to be stopped); output is what the code printed.
+        """
+        worker = self._idle.get()
+        healthy = False
+        try:
+            result = self._grade_with(worker, code, function_name, test_cases, cpu_seconds, wall_seconds)
+            healthy = result.pop("_healthy")
+            return result
+        finally:
+            worker.submissions += 1
+            if healthy and worker.submissions < self.submissions_per_worker:
+                self._idle.put(worker)
+            else:
+                self._retire(worker, kill=not healthy)
+                self._add_worker()
+
+    def _grade_with(self, worker, code, function_name, test_cases, cpu_seconds, wall_seconds):
+        result = {"status": CRASHED, "error": None, "tests": [], "output": "", "_healthy": False}
+
+        if not worker.ready:
+            if worker.receive(WORKER_START_TIMEOUT) != ("ready",):
+                result["error"] = "grading worker failed to start"
+                return result
+            worker.ready = True
+
+        try:
+            worker.conn.send(("grade", code, function_name, list(test_cases), cpu_seconds))
+        except (OSError, ValueError) as e:
+            result["error"] = f"could not send submission: {e}"
+            return result
+
+        message = worker.receive(wall_seconds)
+        if message is None or message[0] != "loaded":
+            result["status"] = CRASHED if worker.crashed() else LOAD_TIMEOUT
+            return result
+        result["status"], result["error"] = message[1], message[2]
+
+        if result["status"] == GRADED:
+            for i in range(len(test_cases)):
+                message = worker.receive(wall_seconds)
+                if message is None or message[0] != "test":
+                    # Overran its wall-clock budget, or the process died
+                    status = CRASHED if worker.crashed() else TIMEOUT
+                    result["tests"].append({"test_num": i + 1, "status": status, "output": None,
+                                            "error": None, "cpu_time": None})
+                    result["tests"].extend({"test_num": j + 1, "status": SKIPPED, "output": None,
+                                            "error": None, "cpu_time": None}
+                                           for j in range(i + 1, len(test_cases)))
+                    return result
+                result["tests"].append(dict(message[1], test_num=i + 1))
+
+        message = worker.receive(wall_seconds)
+        if message is not None and message[0] == "done":
+            result["output"] = message[1]
+            result["_healthy"] = not message[2]
+        return result
+
+    def close(self):
+        """Stop every worker; grade() must not be called afterwards"""
+        with self._lock:
+            workers, self._workers = list(self._workers), set()
+        for worker in workers:
+            worker.stop()
+
+
+def challenge_function_name(description, initial_code):
+    """Name of the function a challenge asks for, or None.
+
+    Taken from "function called `name`" in the description, else from the
+    first def in the starter code.
+    """
+    match = re.search(r'function\s+called\s+`([a-zA-Z0-9_]+)`', description or "")
+    if not match:
+        match = re.search(r'def\s+([a-zA-Z0-9_]+)\(', initial_code or "")
+    return match.group(1) if match else None
+
+
+_grader = None
+_grader_lock = threading.Lock()
+
+
+def get_grader():
+    """Process-wide grading pool, started on first use"""
+    global _grader
+    if _grader is None:
+        with _grader_lock:
+            if _grader is None:
+                _grader = GraderPool()
+    return _grader
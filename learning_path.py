@@ -15,7 +15,11 @@ import altair as alt
 import random
 import base64
 
-from db_utils import get_db_connection, log_activity
+from db_utils import log_activity, get_data_versions
+from db_pool import db_connection
+from activity_log import flush_activity_log
+from student_features import load_learning_features, load_topic_stats
+from user_stats import read_user_stats
 #from code_ch import handle_daily_challenge_completion
 #from ch_utils import complete_daily_challenge
 
@@ -161,73 +165,43 @@ def get_badge_image(badge_type):
     else:
         return "data:image/svg+xml;base64,PHN2ZyB4bWxucz0iaHR0cDovL3d3dy53My5vcmcvMjAwMC9zdmciIHdpZHRoPSIxMDAiIGhlaWdodD0iMTAwIj48Y2lyY2xlIGN4PSI1MCIgY3k9IjUwIiByPSI0MCIgZmlsbD0iIzY2NiIgLz48dGV4dCB4PSI1MCIgeT0iNTUiIGZvbnQtc2l6ZT0iMjAiIHRleHQtYW5jaG9yPSJtaWRkbGUiIGZpbGw9IndoaXRlIj7wn6SBPC90ZXh0Pjwvc3ZnPg=="
 
+@st.cache_data(max_entries=4, show_spinner=False)
+def _cached_video_library(versions):
+    # versions only keys the cache: logging a watch or an attempt bumps it
+    videos = {}
+    for i, row in enumerate(load_topic_stats().itertuples(index=False)):
+        # Set difficulty based on quiz performance if available
+        difficulty = "Medium"
+        if row.attempts > 0:
+            avg_score = 50 if pd.isna(row.avg_score) else row.avg_score
+            if avg_score < 40:
+                difficulty = "Hard"
+            elif avg_score > 70:
+                difficulty = "Easy"
+
+        # Set views from watch count if available
+        views = 1000
+        if not pd.isna(row.total_watches) and row.total_watches:
+            views = int(row.total_watches) * 500  # Scale for display
+
+        # Generate semi-realistic video metadata
+        videos[f"{row.topic} Tutorial"] = {
+            "topic": row.topic,
+            "difficulty": difficulty,
+            "tags": [row.topic.lower(), difficulty.lower()],
+            "duration": 15 + (i % 3) * 5,  # Varying durations between 15-25 min
+            "views": views,
+            "thumbnail": f"https://picsum.photos/seed/{i+10}/300/200",  # Random thumbnail images
+            "xp_reward": 50 + (10 if difficulty == "Medium" else 20 if difficulty == "Hard" else 0)  # XP rewards
+        }
+    return videos
+
 # Load real video data from SQLite with error handling
 def load_video_library():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Get video data (both quiz data and tutorial videos)
-        cursor.execute("""
-            SELECT DISTINCT topic FROM videos_watched
-            UNION
-            SELECT DISTINCT topic FROM quiz_attempts
-        """)
-        
-        topics = [row[0] for row in cursor.fetchall()]
-        
-        videos = {}
-        
-        # For each topic, create a video entry
-        for i, topic in enumerate(topics):
-            try:
-                # Check if there are any video stats for this topic
-                cursor.execute("""
-                    SELECT AVG(completion_percentage), SUM(watch_count) 
-                    FROM videos_watched 
-                    WHERE topic = ?
-                """, (topic,))
-                
-                video_stats = cursor.fetchone()
-                
-                # Check if there are any quiz stats for this topic
-                cursor.execute("""
-                    SELECT COUNT(*), AVG(score * 100.0 / max_score) 
-                    FROM quiz_attempts 
-                    WHERE topic = ?
-                """, (topic,))
-                
-                quiz_stats = cursor.fetchone()
-                
-                # Set difficulty based on quiz performance if available
-                difficulty = "Medium"
-                if quiz_stats and quiz_stats[0] > 0:
-                    avg_score = quiz_stats[1] or 50  # Default to 50 if NULL
-                    if avg_score < 40:
-                        difficulty = "Hard"
-                    elif avg_score > 70:
-                        difficulty = "Easy"
-                
-                # Set views from watch count if available
-                views = 1000
-                if video_stats and video_stats[1]:
-                    views = int(video_stats[1]) * 500  # Scale for display
-                
-                # Generate semi-realistic video metadata
-                videos[f"{topic} Tutorial"] = {
-                    "topic": topic,
-                    "difficulty": difficulty,
-                    "tags": [topic.lower(), difficulty.lower()],
-                    "duration": 15 + (i % 3) * 5,  # Varying durations between 15-25 min
-                    "views": views,
-                    "thumbnail": f"https://picsum.photos/seed/{i+10}/300/200",  # Random thumbnail images
-                    "xp_reward": 50 + (10 if difficulty == "Medium" else 20 if difficulty == "Hard" else 0)  # XP rewards
-                }
-            except Exception as e:
-                debug_log(f"Error loading data for topic {topic}: {e}")
-                continue
-        
-        conn.close()
+        # Per-topic stats come from one grouped query per table, and the
+        # library is rebuilt only after a watch or quiz attempt is logged
+        videos = _cached_video_library(get_data_versions("videos_watched", "quiz_attempts"))
         
         # If no videos in database yet, provide sample data
         if not videos:
@@ -254,97 +228,22 @@ def load_video_library():
 # Load student data from SQLite with error handling
 def load_student_data():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Get all users
-        cursor.execute("SELECT id, username, full_name FROM users")
-        users = cursor.fetchall()
+        flush_activity_log()
         
-        data = []
-        
-        for user in users:
-            try:
-                user_id = user[0]
-                username = user[1]
-                full_name = user[2] or username
-                
-                # Get quiz performance by topic
-                cursor.execute("""
-                    SELECT topic, AVG(score * 100.0 / max_score) as avg_score
-                    FROM quiz_attempts
-                    WHERE user_id = ?
-                    GROUP BY topic
-                """, (user_id,))
-                
-                quiz_results = cursor.fetchall()
-                quiz_scores = {}
-                for topic, score in quiz_results:
-                    safe_topic = topic.replace(' ', '_')
-                    quiz_scores[f"Quiz_Score_{safe_topic}"] = score
-                
-                # Get video watch time by topic
-                cursor.execute("""
-                    SELECT topic, SUM(watch_count) as total_watches
-                    FROM videos_watched
-                    WHERE user_id = ?
-                    GROUP BY topic
-                """, (user_id,))
-                
-                watch_results = cursor.fetchall()
-                watch_times = {}
-                for topic, count in watch_results:
-                    safe_topic = topic.replace(' ', '_')
-                    # Estimate watch time based on count (10 minutes per watch)
-                    watch_times[f"Watch_Time_{safe_topic}"] = count * 10 if count else 0
-                
-                # Determine preference based on most watched or highest score
-                preference = None
-                if watch_results:
-                    preference = max(watch_results, key=lambda x: x[1])[0]
-                elif quiz_results:
-                    preference = max(quiz_results, key=lambda x: x[1])[0]
-                
-                # Get last active time
-                cursor.execute("""
-                    SELECT MAX(timestamp) FROM activity_logs WHERE user_id = ?
-                """, (user_id,))
-                
-                last_active_result = cursor.fetchone()
-                last_active = datetime.now()
-                if last_active_result and last_active_result[0]:
-                    try:
-                        last_active = datetime.fromisoformat(str(last_active_result[0]).replace('Z', '+00:00'))
-                    except:
-                        pass
-                
-                # Create student entry
-                student_entry = {
-                    "Student": full_name,
-                    "User_ID": user_id,
-                    "Preference": preference,
-                    "Last_Active": last_active
-                }
-                student_entry.update(quiz_scores)
-                student_entry.update(watch_times)
-                
-                data.append(student_entry)
-            except Exception as e:
-                debug_log(f"Error processing user {user[1]}: {e}")
-                continue
-        
-        conn.close()
+        # All per-user aggregates come from a few grouped queries
+        # instead of three queries per user
+        data = load_learning_features()
         
         # If no user data yet, provide sample data
-        if not data:
+        if data.empty:
             debug_log("No user data found, using sample data")
-            data = [
+            data = pd.DataFrame([
                 {"Student": "Alice", "User_ID": 999, "Quiz_Score_Python": 85, "Quiz_Score_Functions": 70, "Watch_Time_Python": 120, "Watch_Time_Functions": 90, "Preference": "Python", "Last_Active": datetime.now() - timedelta(days=1)},
                 {"Student": "Bob", "User_ID": 998, "Quiz_Score_Python": 65, "Quiz_Score_Lists": 80, "Watch_Time_Python": 60, "Watch_Time_Lists": 150, "Preference": "Lists", "Last_Active": datetime.now() - timedelta(days=2)},
                 {"Student": "Charlie", "User_ID": 997, "Quiz_Score_Functions": 90, "Quiz_Score_Classes": 85, "Watch_Time_Functions": 180, "Watch_Time_Classes": 100, "Preference": "Functions", "Last_Active": datetime.now() - timedelta(days=0)}
-            ]
+            ])
         
-        return pd.DataFrame(data)
+        return data
     except Exception as e:
         debug_log(f"Error in load_student_data: {e}")
         debug_log(traceback.format_exc())
@@ -357,60 +256,15 @@ def load_student_data():
 # Get user's learning stats and achievements
 def get_user_stats(user_id):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Get total quiz attempts
-        cursor.execute("SELECT COUNT(*) FROM quiz_attempts WHERE user_id = ?", (user_id,))
-        quiz_count = cursor.fetchone()[0] or 0
-        
-        # Get total video watches
-        cursor.execute("SELECT SUM(watch_count) FROM videos_watched WHERE user_id = ?", (user_id,))
-        video_count = cursor.fetchone()[0] or 0
-        
-        # Get average quiz score
-        cursor.execute("""
-            SELECT AVG(score * 100.0 / max_score) 
-            FROM quiz_attempts 
-            WHERE user_id = ?
-        """, (user_id,))
-        avg_score = cursor.fetchone()[0] or 0
-        
-        # Get streak data
-        cursor.execute("""
-            SELECT date(timestamp) as activity_date
-            FROM activity_logs
-            WHERE user_id = ? AND timestamp >= date('now', '-30 days')
-            GROUP BY activity_date
-            ORDER BY activity_date DESC
-        """, (user_id,))
-        
-        activity_dates = [row[0] for row in cursor.fetchall()]
-        
-        # Calculate current streak
-        streak = 0
-        today = datetime.now().date()
-        
-        for i in range(30):  # Check up to 30 days back
-            check_date = (today - timedelta(days=i)).strftime('%Y-%m-%d')
-            if check_date in activity_dates:
-                if i == 0 or streak > 0:  # Today or continuing streak
-                    streak += 1
-            else:
-                if i == 0:  # Today has no activity but might have been active yesterday
-                    continue
-                else:
-                    break  # Streak broken
-                    
-        # Get completed topics (topics with quiz score above 70%)
-        cursor.execute("""
-            SELECT topic
-            FROM quiz_attempts
-            WHERE user_id = ? AND (score * 100.0 / max_score) >= 70
-            GROUP BY topic
-        """, (user_id,))
-        
-        mastered_topics = [row[0] for row in cursor.fetchall()]
+        flush_activity_log()
+        # Counts, averages and the current streak are maintained in the
+        # user_stats rollup as quizzes, videos and activities are logged
+        stats = read_user_stats(user_id)
+        quiz_count = stats["quiz_count"]
+        video_count = stats["video_count"]
+        avg_score = stats["avg_score"]
+        streak = stats["streak"]
+        mastered_topics = stats["mastered_topics"]
         
         # Calculate XP (experience points)
         # Formula: (quiz_count * 10) + (video_count * 5) + (streak * 20) + (len(mastered_topics) * 50)
@@ -439,17 +293,9 @@ def get_user_stats(user_id):
             badges.append({"name": "Quiz Master", "type": "quiz_master", "description": "Completed 10+ quizzes with 80%+ average!"})
             
         # Check if user has set goals
-        cursor.execute("""
-            SELECT COUNT(*) FROM activity_logs 
-            WHERE user_id = ? AND activity_type = 'goal_set'
-        """, (user_id,))
-        
-        goals_count = cursor.fetchone()[0] or 0
-        if goals_count > 0:
+        if stats["goals_set"] > 0:
             badges.append({"name": "Goal Setter", "type": "first_goal", "description": "Set your first learning goal!"})
         
-        conn.close()
-        
         return {
             "quiz_count": quiz_count,
             "video_count": video_count,
@@ -936,18 +782,18 @@ def learning_path_page():
             st.subheader("Recent Activity")
             
             try:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT activity_type, activity_details, timestamp
-                    FROM activity_logs
-                    WHERE user_id = ?
-                    ORDER BY timestamp DESC
-                    LIMIT 5
-                """, (user_id,))
-                
-                activities = cursor.fetchall()
-                conn.close()
+                flush_activity_log()
+                with db_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("""
+                        SELECT activity_type, activity_details, timestamp
+                        FROM activity_logs
+                        WHERE user_id = ?
+                        ORDER BY timestamp DESC
+                        LIMIT 5
+                    """, (user_id,))
+                    
+                    activities = cursor.fetchall()
                 
                 if activities:
                     activity_container = st.container()
@@ -1021,11 +867,10 @@ def learning_path_page():
             
             # Get watched videos for current user
             try:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute("SELECT topic FROM videos_watched WHERE user_id = ?", (user_id,))
-                watched_topics = [row[0] for row in cursor.fetchall()]
-                conn.close()
+                with db_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("SELECT topic FROM videos_watched WHERE user_id = ?", (user_id,))
+                    watched_topics = [row[0] for row in cursor.fetchall()]
                 
                 watched_videos = [v for v in video_library.keys() if any(t in v for t in watched_topics)]
             except Exception as e:
@@ -1304,30 +1149,28 @@ def learning_path_page():
             
             try:
                 # Load user's quiz attempts
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                
-                # Get quiz attempts over time
-                cursor.execute("""
-                    SELECT topic, score, max_score, timestamp
-                    FROM quiz_attempts
-                    WHERE user_id = ?
-                    ORDER BY timestamp
-                """, (user_id,))
+                with db_connection() as conn:
+                    cursor = conn.cursor()
                 
-                quiz_attempts = cursor.fetchall()
+                    # Get quiz attempts over time
+                    cursor.execute("""
+                        SELECT topic, score, max_score, timestamp
+                        FROM quiz_attempts
+                        WHERE user_id = ?
+                        ORDER BY timestamp
+                    """, (user_id,))
                 
-                # Get video watch patterns
-                cursor.execute("""
-                    SELECT topic, last_watched, watch_count
-                    FROM videos_watched
-                    WHERE user_id = ?
-                    ORDER BY last_watched
-                """, (user_id,))
+                    quiz_attempts = cursor.fetchall()
                 
-                video_watches = cursor.fetchall()
+                    # Get video watch patterns
+                    cursor.execute("""
+                        SELECT topic, last_watched, watch_count
+                        FROM videos_watched
+                        WHERE user_id = ?
+                        ORDER BY last_watched
+                    """, (user_id,))
                 
-                conn.close()
+                    video_watches = cursor.fetchall()
             except Exception as e:
                 debug_log(f"Error fetching analytics data: {e}")
                 quiz_attempts = []
@@ -0,0 +1,244 @@
+# llm_client.py
+import os
+import time
+import sqlite3
+import threading
+import contextlib
+from artifact_cache import make_key
+
+# Where cached responses live (override with VIDEDU_LLM_CACHE_DIR)
+CACHE_DIR = os.getenv("VIDEDU_LLM_CACHE_DIR", os.path.join("cache", "llm"))
+
+# How long a response may be served from the cache, in seconds
+DEFAULT_TTL = 7 * 24 * 3600
+
+# Upper bound on the total size of cached responses, in bytes
+MAX_CACHE_BYTES = int(os.getenv("VIDEDU_LLM_CACHE_MAX_BYTES", 256 * 1024 ** 2))
+
+# Backend used when none is given (override with VIDEDU_LLM_BACKEND=gemini|stub)
+DEFAULT_BACKEND = os.getenv("VIDEDU_LLM_BACKEND", "gemini")
+
+
+class GeminiBackend:
+    """Google Gemini via google.generativeai (genai.configure must have run)"""
+
+    name = "gemini"
+
+    def generate(self, model, prompt, generation_config=None):
+        import google.generativeai as genai
+        client = genai.GenerativeModel(model)
+        if generation_config:
+            response = client.generate_content(prompt, generation_config=generation_config)
+        else:
+            response = client.generate_content(prompt)
+        return response.text
+
+
+class StubBackend:
+    """Offline stand-in for tests and local development.
+
+    responses may map a prompt substring to canned text, or be a callable
+    taking (model, prompt, generation_config); anything unmatched gets a
+    deterministic placeholder.
+    """
+
+    name = "stub"
+
+    def __init__(self, responses=None):
+        self.responses = responses or {}
+        self.calls = []
+
+    def generate(self, model, prompt, generation_config=None):
+        self.calls.append((model, prompt, generation_config))
+        if callable(self.responses):
+            return self.responses(model, prompt, generation_config)
+        for fragment, text in self.responses.items():
+            if fragment in prompt:
+                return text
+        return f"[{model}] {prompt.strip()[:200]}"
+
+
+LLM_BACKENDS = {
+    GeminiBackend.name: GeminiBackend,
+    StubBackend.name: StubBackend
+}
+
+
+class ResponseCache:
+    """Persistent response store with per-entry TTL and LRU size eviction"""
+
+    def __init__(self, root=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+        with self._db() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_access ON responses (last_access)')
+
+    @contextlib.contextmanager
+    def _db(self):
+        """Short-lived connection that commits on success"""
+        conn = sqlite3.connect(os.path.join(self.root, 'responses.db'), timeout=10)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def get(self, key):
+        now = time.time()
+        with self._db() as conn:
+            row = conn.execute(
+                'SELECT response, expires_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if not row:
+                return None
+            if row[1] <= now:
+                conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                return None
+            conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+            return row[0]
+
+    def put(self, key, model, response, ttl):
+        now = time.time()
+        with self._db() as conn:
+            conn.execute('''
+                INSERT INTO responses (key, model, response, size, expires_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    response = excluded.response,
+                    size = excluded.size,
+                    expires_at = excluded.expires_at,
+                    last_access = excluded.last_access
+            ''', (key, model, response, len(response.encode('utf-8')), now + ttl, now))
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least-recently-used ones until under max_bytes"""
+        with self._db() as conn:
+            conn.execute('DELETE FROM responses WHERE expires_at <= ?', (time.time(),))
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for key, size in conn.execute('SELECT key, size FROM responses ORDER BY last_access').fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                total -= size
+
+    def clear(self):
+        with self._db() as conn:
+            conn.execute('DELETE FROM responses')
+
+
+class _Flight:
+    """One in-flight request that identical concurrent callers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class LLMClient:
+    """Shared entry point for every LLM call in the app.
+
+    Responses are cached on (backend, model, prompt, generation config).
+    Identical requests that arrive while one is already in flight wait for
+    it instead of calling the backend again. Failed calls are never cached.
+    """
+
+    def __init__(self, backend=None, cache=None, ttl=DEFAULT_TTL):
+        self.backend = backend or LLM_BACKENDS[DEFAULT_BACKEND]()
+        self.cache = cache if cache is not None else ResponseCache()
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0, "backend_seconds": 0.0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def generate(self, prompt, model, generation_config=None, ttl=None, use_cache=True):
+        """Return the model's text response for prompt"""
+        key = make_key(backend=self.backend.name, model=model, prompt=prompt, config=generation_config)
+
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._count("hits")
+                return cached
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        self._count("misses")
+        started = time.time()
+        try:
+            flight.result = self.backend.generate(model, prompt, generation_config)
+            if use_cache and flight.result:
+                self.cache.put(key, model, flight.result, self.ttl if ttl is None else ttl)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            self._count("errors")
+            raise
+        finally:
+            self._count("backend_seconds", time.time() - started)
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+
+    def stats(self):
+        """Hit/miss counters since start-up, plus the derived hit rate"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = (stats["hits"] + stats["coalesced"]) / lookups if lookups else 0.0
+        return stats
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client():
+    """Return the process-wide LLM client"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient()
+    return _client
+
+
+def set_llm_backend(backend):
+    """Swap the backend of the process-wide client (e.g. StubBackend() in tests)"""
+    client = get_llm_client()
+    client.backend = backend
+    return client
@@ -3,14 +3,14 @@ import streamlit as st
 import sys
 import os
 import datetime
+import time
 import json
 import builtins
 import re
 from db_utils import log_activity, log_video_watched, log_quiz_attempt
-from chatbot import get_ai_response, get_fallback_response, get_user_learning_context, init_chatbot_db, save_chat_to_db
-from forum import community_forum_page, init_forum_db
+from forum import init_forum_db
 from db_utils import init_challenges_tables, migrate_challenges_tables
-from learning_path import learning_path_page, inject_custom_css, load_nltk_resources
+from page_registry import lazy_import, get_page, render_page
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -19,19 +19,12 @@ load_dotenv()
 # Ensure the current directory is in the path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# Import the functions from your existing files
-from g_video_gen import (
-    setup_gemini_api, generate_script, generate_manim_code, 
-    render_manim_animation, generate_audio, merge_video_audio
-)
-from s_quiz import (
-    generate_mcqs, start_assessment, submit_answer, restart,
-    analyze_performance, display_performance_charts, get_feedback_and_resources
-)
+# Import the functions from your existing files. Feature pages and their
+# heavy dependencies (moviepy, matplotlib, sklearn, the Gemini client) are
+# imported on first use through page_registry, so the login page renders
+# without them.
+from video_jobs import init_video_jobs_db, enqueue_tutorial, get_video_job, start_worker_pool
 from auth import login_page
-from dashboard import dashboard_page
-from db_utils import log_activity, log_video_watched, log_quiz_attempt
-from chatbot import init_chatbot_db
 
 # Store original print and markdown functions
 original_print = builtins.print
@@ -158,6 +151,8 @@ def create_corner_chat():
         
         # Chat input 
         if prompt := st.chat_input("Ask me anything about Python..."):
+            chatbot = lazy_import("chatbot")
+            
             # Add user message to chat history
             st.session_state.messages.append({"role": "user", "content": prompt})
             
@@ -169,14 +164,14 @@ def create_corner_chat():
             with st.chat_message("assistant"):
                 # Get user's learning context if available
                 user_id = st.session_state.user["id"] if "user" in st.session_state else None
-                context = get_user_learning_context(user_id) if user_id else ""
+                context = chatbot.get_user_learning_context(user_id) if user_id else ""
                 
                 # Generate response
                 try:
                     with st.spinner("Thinking..."):
-                        response = get_ai_response(prompt, context)
+                        response = chatbot.get_ai_response(prompt, context)
                 except Exception as e:
-                    response = get_fallback_response(prompt)
+                    response = chatbot.get_fallback_response(prompt)
                 
                 st.write(response)
             
@@ -185,10 +180,10 @@ def create_corner_chat():
             
             # Save to database if user is logged in
             if user_id:
-                save_chat_to_db(user_id, prompt, response)
+                chatbot.save_chat_to_db(user_id, prompt, response)
 
 def handle_coding_challenges():
-    from code_ch import coding_challenge_page
+    coding_challenge_page = get_page("coding_challenges")
     
     # Initialize database
     if not init_challenges_tables():
@@ -255,12 +250,37 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize chatbot database tables
-init_chatbot_db()
-
 # Initialize forum database tables
 init_forum_db()
 
+# Initialize the video job queue and start its workers once per server
+init_video_jobs_db()
+
+@st.cache_resource
+def start_video_workers():
+    # Set VIDEDU_EXTERNAL_WORKERS=1 when workers run as `python video_jobs.py`
+    if os.getenv("VIDEDU_EXTERNAL_WORKERS") == "1":
+        return None
+    return start_worker_pool()
+
+start_video_workers()
+
+# Seconds between progress refreshes while a video job is running
+JOB_POLL_INTERVAL = 2
+
+VIDEO_STAGE_LABELS = {
+    "script": "Step 1: Generating script",
+    "manim_code": "Step 2: Generating animation code",
+    "render": "Step 3: Rendering animation",
+    "audio": "Step 4: Generating voice narration",
+    "merge": "Step 5: Creating final tutorial"
+}
+
+VIDEO_QUALITY_LABELS = {
+    "standard": "Standard (720p)",
+    "high": "High (1080p)"
+}
+
 # Initialize session state for navigation
 if 'page' not in st.session_state:
     st.session_state.page = "dashboard"  # Default to dashboard
@@ -286,6 +306,12 @@ if 'api_key_valid' not in st.session_state:
     st.session_state.api_key_valid = False
 if 'api_key_validated' not in st.session_state:
     st.session_state.api_key_validated = False
+if 'video_job_id' not in st.session_state:
+    st.session_state.video_job_id = None
+if 'video_preview_job_id' not in st.session_state:
+    st.session_state.video_preview_job_id = None
+if 'video_job_logged' not in st.session_state:
+    st.session_state.video_job_logged = False
 
 # Session state initialization for quiz generator
 if 'questions' not in st.session_state:
@@ -328,15 +354,17 @@ def navigate_to_peer_collaboration():
 def navigate_to_learning_path():
     st.session_state.page = "learning_path"
 
-# Auto-load and validate the API key (silently)
-api_key = os.getenv("GEMINI_API_KEY")
-if api_key and not st.session_state.api_key_validated:
-    if setup_gemini_api(api_key):
-        st.session_state.api_key_valid = True
-        st.session_state.api_key_validated = True
-    else:
-        # We don't show errors here, will handle elsewhere if needed
-        st.session_state.api_key_valid = False
+# Auto-load and validate the API key (silently); only the video generator
+# needs it, so this runs when that page is first opened
+def validate_api_key():
+    api_key = os.getenv("GEMINI_API_KEY")
+    if api_key and not st.session_state.api_key_validated:
+        if lazy_import("g_video_gen").setup_gemini_api(api_key):
+            st.session_state.api_key_valid = True
+            st.session_state.api_key_validated = True
+        else:
+            # We don't show errors here, will handle elsewhere if needed
+            st.session_state.api_key_valid = False
 
 # Authentication check and main content
 if not st.session_state.auth_status or st.session_state.user is None:
@@ -352,6 +380,9 @@ if not st.session_state.auth_status or st.session_state.user is None:
         st.session_state.auth_status = True
         st.rerun()
 else:
+    # Initialize chatbot database tables
+    lazy_import("chatbot").init_chatbot_db()
+    
     # Add the corner chat widget instead of setup_chatbot
     create_corner_chat()
     
@@ -428,9 +459,12 @@ else:
 
     # Main content area - conditional rendering based on current page
     if st.session_state.page == "dashboard":
-        dashboard_page()
+        render_page("dashboard")
         
     elif st.session_state.page == "video_generator":
+        get_cached_tutorial = lazy_import("g_video_gen").get_cached_tutorial
+        validate_api_key()
+        
         # Video Generator Interface
         st.title("🐍 Python Tutorial Video Generator")
         st.markdown("""
@@ -446,6 +480,11 @@ else:
         topic = st.text_input("Python Topic", 
                               help="Enter a Python topic (e.g., 'Python Lists', 'Recursion', 'For Loops')")
         
+        # A quick low-quality preview is always shown first
+        quality = st.selectbox("Video Quality", list(VIDEO_QUALITY_LABELS),
+                               format_func=lambda q: VIDEO_QUALITY_LABELS[q],
+                               help="A fast preview is shown first while this version renders")
+        
         # Generate button in the main area
         generate_button = st.button("Generate Tutorial", 
                                  disabled=not (st.session_state.api_key_valid and topic))
@@ -466,88 +505,111 @@ else:
             st.session_state.audio_path = None
             st.session_state.final_video_path = None
             
-            # Step 1: Generate script
-            st.header("Step 1: Generate Script")
-            st.session_state.script = generate_script(topic)
+            # Every stage reads through the artifact cache, so a topic that
+            # was fully generated before completes without any API, render
+            # or TTS work
+            cached = get_cached_tutorial(topic, quality)
+            if cached:
+                st.info("This tutorial was generated before - loading it from the cache.")
             
-            if st.session_state.script:
-                st.success("Script generated successfully!")
-                st.subheader("Generated Script")
-                st.text_area("Script", st.session_state.script, height=300)
+            # Generation runs in the background worker pool; identical
+            # topics already in progress share one job. A preview is only
+            # worth rendering when the requested quality is not cached
+            st.session_state.video_preview_job_id, st.session_state.video_job_id = enqueue_tutorial(
+                topic, st.session_state.user['id'], quality=quality, preview=not cached
+            )
+            st.session_state.video_job_logged = False
+        
+        # Show progress or results of the current generation job
+        if st.session_state.video_job_id:
+            job = get_video_job(st.session_state.video_job_id)
+            preview_job = None
+            if st.session_state.video_preview_job_id:
+                preview_job = get_video_job(st.session_state.video_preview_job_id)
+            preview_ready = preview_job is not None and preview_job['status'] == "succeeded"
+            
+            if job is not None and job['status'] == "failed" and preview_ready:
+                # Keep the preview rather than showing nothing
+                st.warning(f"The full-quality render failed ({job['error']}); showing the preview instead.")
+                job = preview_job
+            
+            if job is None:
+                st.session_state.video_job_id = None
+            elif job['status'] in ("queued", "running"):
+                if preview_ready:
+                    st.success("Preview ready! A higher quality version is rendering and will replace it automatically.")
+                    st.video(preview_job['result']['final_video_path'])
                 
-                # Step 2: Generate Manim code
-                st.header("Step 2: Generate Animation Code")
-                st.session_state.manim_code = generate_manim_code(topic, st.session_state.script)
+                # Report on the preview while it is still in progress
+                active = job
+                if preview_job is not None and preview_job['status'] in ("queued", "running"):
+                    active = preview_job
+                label = "preview" if active is preview_job else "tutorial"
                 
-                if st.session_state.manim_code:
-                    st.success("Animation code generated successfully!")
-                    st.subheader("Generated Manim Code")
-                    st.code(st.session_state.manim_code, language="python")
-                    
-                    # Step 3: Render animation
-                    st.header("Step 3: Render Animation")
-                    st.session_state.video_path = render_manim_animation(st.session_state.manim_code, topic)
-                    
-                    if st.session_state.video_path:
-                        st.success("Animation rendered successfully!")
-                        st.subheader("Generated Animation")
-                        st.video(st.session_state.video_path)
-                        
-                        # Step 4: Generate audio
-                        st.header("Step 4: Generate Voice Narration")
-                        st.session_state.audio_path = generate_audio(st.session_state.script, topic)
-                        
-                        if st.session_state.audio_path:
-                            st.success("Voice narration generated successfully!")
-                            st.subheader("Generated Audio")
-                            st.audio(st.session_state.audio_path)
-                            
-                            # Step 5: Merge video and audio
-                            st.header("Step 5: Create Final Tutorial")
-                            st.session_state.final_video_path = merge_video_audio(
-                                st.session_state.video_path, 
-                                st.session_state.audio_path, 
-                                topic
-                            )
-                            
-                            if st.session_state.final_video_path:
-                                st.success("🎉 Tutorial video created successfully!")
-                                st.subheader("Final Tutorial Video")
-                                st.video(st.session_state.final_video_path)
-                                
-                                # Log video completion in database
-                                log_video_watched(
-                                    st.session_state.user['id'],
-                                    topic,
-                                    100
-                                )
-                                
-                                # Download button
-                                with open(st.session_state.final_video_path, "rb") as file:
-                                    st.download_button(
-                                        label="Download Tutorial Video",
-                                        data=file,
-                                        file_name=f"{topic.replace(' ', '_')}_tutorial.mp4",
-                                        mime="video/mp4"
-                                    )
-                                
-                                # Quiz suggestion
-                                st.info("Want to test your knowledge on this topic? Try our quiz generator!")
-                                if st.button("Generate Quiz on This Topic"):
-                                    st.session_state.topic = topic
-                                    navigate_to_quiz_generator()
-                                    start_assessment()
-                                    st.rerun()
-                            else:
-                                st.error("Failed to merge video and audio.")
-                        else:
-                            st.error("Failed to generate audio narration.")
-                    else:
-                        st.error("Failed to render animation.")
+                if active['status'] == "queued":
+                    st.info(f"The {label} for '{active['topic']}' is queued and will start shortly...")
                 else:
-                    st.error("Failed to generate animation code.")
+                    # Rendering and narration run at the same time, so several
+                    # stages can be in progress
+                    stages = [stage for stage in (active['stage'] or "").split(",") if stage]
+                    stage_label = " / ".join(VIDEO_STAGE_LABELS.get(stage, stage) for stage in stages) or "Starting"
+                    st.info(f"Generating the {label} for '{active['topic']}': {stage_label}...")
+                st.progress(active['progress'] or 0.0)
+                if active['error']:
+                    st.warning(f"Previous attempt failed ({active['error']}); retrying.")
+                
+                # Poll the job until it finishes
+                time.sleep(JOB_POLL_INTERVAL)
+                st.rerun()
+            elif job['status'] == "failed":
+                st.error(job['error'] or "Failed to generate tutorial.")
+                st.session_state.video_job_id = None
             else:
-                st.error("Failed to generate script.")
+                result = job['result']
+                st.session_state.script = result['script']
+                st.session_state.manim_code = result['manim_code']
+                st.session_state.video_path = result['video_path']
+                st.session_state.audio_path = result['audio_path']
+                st.session_state.final_video_path = result['final_video_path']
+                
+                st.subheader("Generated Script")
+                st.text_area("Script", st.session_state.script, height=300)
+                st.subheader("Generated Manim Code")
+                st.code(st.session_state.manim_code, language="python")
+                st.subheader("Generated Animation")
+                st.video(st.session_state.video_path)
+                st.subheader("Generated Audio")
+                st.audio(st.session_state.audio_path)
+                
+                st.success("🎉 Tutorial video created successfully!")
+                st.subheader("Final Tutorial Video")
+                st.video(st.session_state.final_video_path)
+                
+                # Log video completion in database once per job
+                if not st.session_state.video_job_logged:
+                    log_video_watched(
+                        st.session_state.user['id'],
+                        job['topic'],
+                        100
+                    )
+                    st.session_state.video_job_logged = True
+                
+                # Download button
+                with open(st.session_state.final_video_path, "rb") as file:
+                    st.download_button(
+                        label="Download Tutorial Video",
+                        data=file,
+                        file_name=f"{job['topic'].replace(' ', '_')}_tutorial.mp4",
+                        mime="video/mp4"
+                    )
+                
+                # Quiz suggestion
+                st.info("Want to test your knowledge on this topic? Try our quiz generator!")
+                if st.button("Generate Quiz on This Topic"):
+                    st.session_state.topic = job['topic']
+                    navigate_to_quiz_generator()
+                    lazy_import("s_quiz").start_assessment()
+                    st.rerun()
 
         # If nothing has been generated yet, show instructions
         if not st.session_state.script:
@@ -565,6 +627,8 @@ else:
             """)
 
     elif st.session_state.page == "quiz_generator":
+        s_quiz = lazy_import("s_quiz")
+        
         # Quiz Generator Interface
         st.title(f"📚 Adaptive Python Quiz Generator")
         
@@ -584,7 +648,7 @@ else:
             
             if st.button("Start Assessment", disabled=not topic):
                 st.session_state.topic = topic
-                start_assessment()
+                s_quiz.start_assessment()
                 # Log the quiz start
                 log_activity(
                     st.session_state.user['id'], 
@@ -640,7 +704,7 @@ else:
                     # Reset timer for next question
                     st.session_state.question_start_time = datetime.datetime.now()
                     
-                    submit_answer(q_idx)
+                    s_quiz.submit_answer(q_idx)
                     
                     # Check if this was the last question
                     if q_idx == len(st.session_state.questions) - 1:
@@ -680,14 +744,14 @@ else:
                     st.warning("📚 You might need more practice on this topic.")
                     
                 # Analyze performance by category
-                performance, strengths, weaknesses = analyze_performance()
+                performance, strengths, weaknesses = s_quiz.analyze_performance()
                 
                 # Display performance charts
                 st.subheader("📊 Performance Analysis")
-                display_performance_charts(performance)
+                s_quiz.display_performance_charts(performance)
                 
                 # Generate personalized feedback
-                feedback = get_feedback_and_resources(strengths, weaknesses, st.session_state.topic)
+                feedback = s_quiz.get_feedback_and_resources(strengths, weaknesses, st.session_state.topic)
                 st.markdown(feedback)
                 
                 # Review answers
@@ -707,7 +771,7 @@ else:
                 col1, col2 = st.columns(2)
                 with col1:
                     if st.button("Start New Assessment", key="main_new_assessment"):
-                        restart()
+                        s_quiz.restart()
                         st.rerun()
                 with col2:
                     if st.button("Create Tutorial Video on This Topic"):
@@ -715,17 +779,15 @@ else:
                         st.rerun()
 
     elif st.session_state.page == "peer_collaboration":
-        # Import the peer collaboration module
-        from peer_collaboration import peer_collaboration_page
         # Display the peer collaboration page
-        peer_collaboration_page()
+        render_page("peer_collaboration")
 
     elif st.session_state.page == "community_forum":
         # Initialize forum database
         init_forum_db()
         
         # Display the community forum
-        community_forum_page()
+        render_page("community_forum")
 
     elif st.session_state.page == "coding_challenges":
         # Handle challenges through the separate function
@@ -734,7 +796,7 @@ else:
     # Add this with your other conditional page renders
     elif st.session_state.page == "learning_path":
         # Call the learning path page function
-        learning_path_page()
+        render_page("learning_path")
 
     # Footer
     st.markdown("---")
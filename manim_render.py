@@ -0,0 +1,249 @@
+# manim_render.py
+import os
+import ast
+import sys
+import glob
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from artifact_cache import get_artifact_cache, make_key, text_digest
+from media_merge import concat_videos
+
+# Section scenes rendered at once, each in its own Manim process
+SECTION_RENDER_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+# Rendering a scene section by section is opt-in (VIDEDU_SPLIT_SCENES=1):
+# mobjects a section leaves on screen are not carried into the next
+# section's clip, which no static check can rule out
+SPLIT_SCENES = os.getenv("VIDEDU_SPLIT_SCENES") == "1"
+
+
+class RenderError(RuntimeError):
+    """A Manim render failed; the message carries the tail of its output"""
+
+
+def render_scene(manim_code, class_name, work_dir, settings):
+    """Render one Scene class in a separate Python process.
+
+    Returns the path of the rendered video inside work_dir. Raises
+    RenderError if Manim fails or no video can be found.
+    """
+    media_dir = os.path.join(work_dir, "media")
+    os.makedirs(media_dir, exist_ok=True)
+
+    # Add rendering code with explicit quality and output path settings
+    render_code = f"""
+# Configure Manim with explicit paths
+import os
+from manim import config
+
+# Set rendering options
+config.quality = "{settings['quality']}"
+config.frame_rate = {settings['frame_rate']}
+config.media_dir = r"{media_dir.replace(os.sep, '/')}"
+config.output_file = r"{class_name}"
+
+# Render the scene
+if __name__ == "__main__":
+    scene = {class_name}()
+    scene.render()
+"""
+    script_file = os.path.join(work_dir, "scene.py")
+    with open(script_file, 'w', encoding='utf-8') as f:
+        f.write(manim_code.rstrip() + "\n\n" + render_code)
+
+    # The child gets its own cwd rather than os.chdir(), which would move
+    # the whole process and break stages running alongside the render
+    process = subprocess.Popen(
+        [sys.executable, script_file],
+        cwd=work_dir,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        bufsize=1,
+        universal_newlines=True
+    )
+
+    # Only print progress to the console, not to Streamlit
+    stdout_output, stderr_output = [], []
+    def read_output(pipe, store):
+        for line in iter(pipe.readline, ''):
+            message = line.strip()
+            store.append(message)
+            print(f"Rendering: {message}")
+
+    stdout_thread = threading.Thread(target=read_output, args=(process.stdout, stdout_output))
+    stderr_thread = threading.Thread(target=read_output, args=(process.stderr, stderr_output))
+    stdout_thread.start()
+    stderr_thread.start()
+    process.wait()
+    stdout_thread.join()
+    stderr_thread.join()
+
+    if process.returncode != 0:
+        tail = "\n".join(stderr_output[-5:])
+        raise RenderError(f"Manim render failed with return code {process.returncode}\n{tail}")
+
+    # Manim names the quality folder after resolution and frame rate (720p30, ...)
+    videos_dir = os.path.join(media_dir, "videos")
+    matches = glob.glob(os.path.join(videos_dir, "*", f"{class_name}.mp4"))
+    if matches:
+        return matches[0]
+
+    # If no direct match, fall back to the newest partial movie file
+    mp4_files = glob.glob(os.path.join(videos_dir, "**", "*.mp4"), recursive=True)
+    if mp4_files:
+        return max(mp4_files, key=os.path.getctime)
+
+    tail = "\n".join(stdout_output[-10:])
+    raise RenderError(f"Could not find rendered video file\n{tail}")
+
+
+def _is_self_call(stmt):
+    """Return (method_name, call) if stmt is a bare `self.method(...)` statement"""
+    if not (isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call)):
+        return None, None
+    func = stmt.value.func
+    if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == "self":
+        return func.attr, stmt.value
+    return None, None
+
+
+def _self_attributes(node):
+    """(assigned, used) names of self.<attr> attributes inside a function"""
+    assigned, used = set(), set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Attribute) and isinstance(child.value, ast.Name) and child.value.id == "self":
+            (assigned if isinstance(child.ctx, (ast.Store, ast.Del)) else used).add(child.attr)
+    return assigned, used
+
+
+def _sections_independent(section_methods, helper_methods):
+    """Whether no section can see state another section created.
+
+    Sections are independent when no self attribute assigned in one is
+    touched by another, no helper method assigns self attributes, and no
+    section declares globals.
+    """
+    if any(_self_attributes(helper)[0] for helper in helper_methods):
+        return False
+
+    touched = []
+    for method in section_methods:
+        if any(isinstance(child, (ast.Global, ast.Nonlocal)) for child in ast.walk(method)):
+            return False
+        assigned, used = _self_attributes(method)
+        touched.append((assigned, assigned | used))
+
+    for i, (assigned, _) in enumerate(touched):
+        for j, (_, names) in enumerate(touched):
+            if i != j and assigned & names:
+                return False
+    return True
+
+
+def split_scene_sections(manim_code, class_name):
+    """Split a scene whose construct() only calls section methods.
+
+    Returns a list of (section_name, program) pairs, where each program is
+    a standalone module defining class_name with a construct() that plays
+    just that section (plus the waits that followed it). Shared helper
+    methods and module-level code are kept in every program; the other
+    section methods are left out, so a program's text changes only when
+    its own section or something it shares changes. Returns None when the
+    scene does not follow that structure, or when its sections share state
+    through self attributes or globals.
+    """
+    try:
+        tree = ast.parse(manim_code)
+    except SyntaxError:
+        return None
+
+    scene = next((node for node in tree.body if isinstance(node, ast.ClassDef) and node.name == class_name), None)
+    if scene is None:
+        return None
+
+    methods = {node.name: node for node in scene.body if isinstance(node, ast.FunctionDef)}
+    construct = methods.get("construct")
+    if construct is None:
+        return None
+
+    sections = []  # [method name, trailing wait statements]
+    for stmt in construct.body:
+        name, call = _is_self_call(stmt)
+        if name in methods and name != "construct" and not call.args and not call.keywords:
+            sections.append((name, []))
+        elif name == "wait" and sections:
+            sections[-1][1].append(ast.get_source_segment(manim_code, stmt))
+        else:
+            # Anything else in construct() may carry state between sections
+            return None
+    if len(sections) < 2:
+        return None
+
+    section_names = {name for name, _ in sections}
+    helpers = [node for name, node in methods.items() if name != "construct" and name not in section_names]
+    if not _sections_independent([methods[name] for name in section_names], helpers):
+        return None
+
+    lines = manim_code.splitlines()
+
+    def segment(node):
+        start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+        return "\n".join(lines[start - 1:node.end_lineno])
+
+    scene_start = min([scene.lineno] + [d.lineno for d in scene.decorator_list])
+    preamble = "\n".join(lines[:scene_start - 1] + lines[scene.end_lineno:]).strip()
+    bases = ", ".join(ast.get_source_segment(manim_code, base) for base in scene.bases)
+    header = f"class {class_name}({bases}):"
+
+    shared = [
+        segment(node) for node in scene.body
+        if not (isinstance(node, ast.FunctionDef) and (node.name == "construct" or node.name in section_names))
+    ]
+
+    indent = " " * construct.col_offset
+    body_indent = indent + (indent or "    ")
+
+    programs = []
+    for index, (name, waits) in enumerate(sections):
+        construct_src = "\n".join(
+            [f"{indent}def construct(self):", f"{body_indent}self.{name}()"] +
+            [f"{body_indent}{wait}" for wait in waits]
+        )
+        class_src = "\n\n".join([header] + shared + [segment(methods[name]), construct_src])
+        programs.append((f"{index + 1:02d}_{name}", f"{preamble}\n\n{class_src}\n"))
+    return programs
+
+
+def section_cache_key(program, settings):
+    """Cache key for the clip rendered from one section program"""
+    return make_key(stage="render_section", program=text_digest(program), settings=settings)
+
+
+def render_sections(sections, class_name, work_root, settings, output_path,
+                    max_workers=SECTION_RENDER_WORKERS, ffmpeg=None):
+    """Render section programs in parallel and join them into output_path.
+
+    Clips are kept in the artifact cache under their program's key, so
+    after a small script edit only the sections whose code changed are
+    rendered again.
+    """
+    cache = get_artifact_cache()
+
+    def render_one(index):
+        name, program = sections[index]
+        key = section_cache_key(program, settings)
+        cached = cache.get_file(key)
+        if cached:
+            return cached
+
+        work_dir = os.path.join(work_root, name)
+        os.makedirs(work_dir, exist_ok=True)
+        clip = render_scene(program, class_name, work_dir, settings)
+        return cache.put_file(key, "render_section", clip)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        clips = list(executor.map(render_one, range(len(sections))))
+
+    return concat_videos(clips, output_path, ffmpeg)
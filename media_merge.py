@@ -0,0 +1,154 @@
+# media_merge.py
+import os
+import re
+import shutil
+import tempfile
+import subprocess
+
+# Durations closer than this (in seconds) are muxed without any retiming
+DURATION_TOLERANCE = 0.05
+
+# Encoder settings for the slow path, when timestamps cannot just be rescaled
+REENCODE_PRESET = "veryfast"
+REENCODE_CRF = 23
+AUDIO_CODEC = "aac"
+AUDIO_BITRATE = "128k"
+
+
+def find_ffmpeg():
+    """Path of an ffmpeg binary: the one on PATH, else the copy bundled with moviepy"""
+    path = shutil.which("ffmpeg")
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+
+def _run_ffmpeg(ffmpeg, args):
+    result = subprocess.run(
+        [ffmpeg, "-hide_banner", "-nostdin", "-y"] + args,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    if result.returncode != 0:
+        tail = "\n".join(result.stderr.strip().splitlines()[-5:])
+        raise RuntimeError(f"ffmpeg failed ({result.returncode}): {tail}")
+    return result
+
+
+def probe_duration(path, ffmpeg=None):
+    """Duration of a media file in seconds, read from ffmpeg's input summary"""
+    ffmpeg = ffmpeg or find_ffmpeg()
+    # ffmpeg exits non-zero without an output file, but still prints the summary
+    result = subprocess.run(
+        [ffmpeg, "-hide_banner", "-nostdin", "-i", path],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    match = re.search(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)", result.stderr)
+    if not match:
+        raise RuntimeError(f"Could not read duration of {path}")
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def _stream_copy_args(video_path, audio_path, output_path, scale):
+    """Rescale the video's timestamps on input and copy its packets as-is"""
+    args = []
+    if scale is not None:
+        args += ["-itsscale", f"{scale:.6f}"]
+    return args + [
+        "-i", video_path,
+        "-i", audio_path,
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c:v", "copy",
+        "-c:a", AUDIO_CODEC, "-b:a", AUDIO_BITRATE,
+        "-movflags", "+faststart",
+        "-shortest",
+        output_path
+    ]
+
+
+def _reencode_args(video_path, audio_path, output_path, scale):
+    """Retime with a setpts filter; needs a video encode, so only a fallback"""
+    args = ["-i", video_path, "-i", audio_path, "-map", "0:v:0", "-map", "1:a:0"]
+    if scale is not None:
+        args += ["-filter:v", f"setpts={scale:.6f}*PTS"]
+    return args + [
+        "-c:v", "libx264", "-preset", REENCODE_PRESET, "-crf", str(REENCODE_CRF),
+        "-c:a", AUDIO_CODEC, "-b:a", AUDIO_BITRATE,
+        "-movflags", "+faststart",
+        "-shortest",
+        output_path
+    ]
+
+
+def merge_with_ffmpeg(video_path, audio_path, output_path, ffmpeg=None):
+    """Mux narration onto a video, stretching the video to the audio's length.
+
+    The fast path rescales the video's timestamps with -itsscale and
+    stream-copies its packets, so no frame is decoded or encoded. If the
+    container refuses that, the video is retimed with setpts and
+    re-encoded. Work happens in a private temp directory and the result is
+    moved into place, so concurrent jobs never share intermediate files.
+    """
+    ffmpeg = ffmpeg or find_ffmpeg()
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg not found")
+
+    video_duration = probe_duration(video_path, ffmpeg)
+    audio_duration = probe_duration(audio_path, ffmpeg)
+    scale = None
+    if video_duration > 0 and abs(video_duration - audio_duration) > DURATION_TOLERANCE:
+        scale = audio_duration / video_duration
+
+    # Same directory as the output so the final rename is atomic
+    work_dir = tempfile.mkdtemp(prefix="merge_", dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        merged_path = os.path.join(work_dir, "merged.mp4")
+        try:
+            _run_ffmpeg(ffmpeg, _stream_copy_args(video_path, audio_path, merged_path, scale))
+        except RuntimeError as e:
+            print(f"Stream-copy merge failed, re-encoding instead: {e}")
+            _run_ffmpeg(ffmpeg, _reencode_args(video_path, audio_path, merged_path, scale))
+
+        os.replace(merged_path, output_path)
+        return output_path
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def concat_videos(paths, output_path, ffmpeg=None):
+    """Join clips that share encoding settings without re-encoding them.
+
+    Uses ffmpeg's concat demuxer with stream copy, which holds for the
+    section clips of one scene since Manim renders them all alike.
+    """
+    ffmpeg = ffmpeg or find_ffmpeg()
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg not found")
+
+    work_dir = tempfile.mkdtemp(prefix="concat_", dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        list_path = os.path.join(work_dir, "clips.txt")
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for path in paths:
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+
+        joined_path = os.path.join(work_dir, "joined.mp4")
+        _run_ffmpeg(ffmpeg, [
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-c", "copy",
+            "-movflags", "+faststart",
+            joined_path
+        ])
+        os.replace(joined_path, output_path)
+        return output_path
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
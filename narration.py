@@ -0,0 +1,161 @@
+# narration.py
+import os
+import math
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from artifact_cache import get_artifact_cache, make_key, text_digest
+
+# Sections synthesized at once; gTTS rate-limits aggressive clients
+SECTION_WORKERS = 4
+
+# Backend used when none is given (override with VIDEDU_TTS_BACKEND=gtts|silent)
+DEFAULT_BACKEND = os.getenv("VIDEDU_TTS_BACKEND", "gtts")
+
+
+class GTTSBackend:
+    """Google Translate text-to-speech (needs network access)"""
+
+    name = "gtts"
+
+    def __init__(self, lang='en', slow=False):
+        self.lang = lang
+        self.slow = slow
+
+    def settings(self):
+        return {"engine": self.name, "lang": self.lang, "slow": self.slow}
+
+    def synthesize(self, text, path):
+        from gtts import gTTS
+        gTTS(text=text, lang=self.lang, slow=self.slow).save(path)
+
+
+class SilentTTSBackend:
+    """Offline stand-in that writes silent MP3 audio of a plausible length.
+
+    Each section becomes a run of empty MPEG-1 Layer III frames lasting as
+    long as the text would take to read aloud, so the rest of the pipeline
+    (caching, concatenation, merging) can run without network access.
+    """
+
+    name = "silent"
+
+    # 32 kbit/s, 44.1 kHz, mono, no CRC; a zeroed body decodes as silence
+    FRAME_HEADER = b'\xff\xfb\x10\xc0'
+    FRAME_SIZE = 104
+    FRAME_SECONDS = 1152 / 44100
+
+    def __init__(self, lang='en', slow=False, words_per_minute=150):
+        self.lang = lang
+        self.slow = slow
+        self.words_per_minute = words_per_minute
+
+    def settings(self):
+        return {"engine": self.name, "words_per_minute": self.words_per_minute}
+
+    def duration(self, text):
+        words = max(1, len(text.split()))
+        return words * 60.0 / self.words_per_minute
+
+    def synthesize(self, text, path):
+        frame = self.FRAME_HEADER + bytes(self.FRAME_SIZE - len(self.FRAME_HEADER))
+        frames = math.ceil(self.duration(text) / self.FRAME_SECONDS)
+        with open(path, 'wb') as f:
+            f.write(frame * frames)
+
+
+TTS_BACKENDS = {
+    GTTSBackend.name: GTTSBackend,
+    SilentTTSBackend.name: SilentTTSBackend
+}
+
+
+def get_tts_backend(name=None, **options):
+    """Instantiate a TTS backend by name"""
+    name = name or DEFAULT_BACKEND
+    if name not in TTS_BACKENDS:
+        raise ValueError(f"Unknown TTS backend: {name}")
+    return TTS_BACKENDS[name](**options)
+
+
+def section_cache_key(text, backend):
+    """Cache key for one narrated section: its cleaned text plus voice settings"""
+    return make_key(stage="tts_section", text=text_digest(text), voice=backend.settings())
+
+
+def synthesize_sections(texts, backend, max_workers=SECTION_WORKERS, on_section_done=None):
+    """Return an MP3 path for every text, in order.
+
+    Sections already in the artifact cache are reused; the rest are
+    synthesized concurrently on a bounded thread pool, so editing a script
+    only re-synthesizes the paragraphs that changed. on_section_done(done,
+    total) is called from the calling thread as sections become available.
+    """
+    cache = get_artifact_cache()
+    total = len(texts)
+    paths = [None] * total
+    missing = []
+
+    for i, text in enumerate(texts):
+        paths[i] = cache.get_file(section_cache_key(text, backend))
+        if paths[i] is None:
+            missing.append(i)
+
+    done = total - len(missing)
+    if on_section_done and done:
+        on_section_done(done, total)
+    if not missing:
+        return paths
+
+    work_dir = tempfile.mkdtemp(prefix="tts_")
+
+    def synthesize(i):
+        section_path = os.path.join(work_dir, f"section{i}.mp3")
+        backend.synthesize(texts[i], section_path)
+        return cache.put_file(section_cache_key(texts[i], backend), "tts_section", section_path)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(synthesize, i): i for i in missing}
+            for future in as_completed(futures):
+                paths[futures[future]] = future.result()
+                done += 1
+                if on_section_done:
+                    on_section_done(done, total)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return paths
+
+
+def _id3_length(head):
+    """Size of a leading ID3v2 tag, or 0"""
+    if len(head) < 10 or head[:3] != b'ID3':
+        return 0
+    size = 0
+    for byte in head[6:10]:
+        size = (size << 7) | (byte & 0x7f)
+    return 10 + size
+
+
+def concatenate_mp3(paths, output_path):
+    """Join MP3 files into one by appending their frames.
+
+    MP3 is a plain sequence of self-contained frames, so sections from the
+    same backend can be joined byte-for-byte in a single pass instead of
+    decoding and re-encoding every file. Leading ID3 tags are dropped from
+    all but the first file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output_path)), suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for i, path in enumerate(paths):
+                with open(path, 'rb') as f:
+                    if i > 0:
+                        f.seek(_id3_length(f.read(10)))
+                    shutil.copyfileobj(f, out, 1024 * 1024)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return output_path
@@ -0,0 +1,89 @@
+# page_registry.py
+"""On-demand loading of feature pages and their heavy dependencies.
+
+main2.py used to import every feature module (and with them moviepy,
+matplotlib, sklearn, nltk, plotly and the Gemini client) before the login
+page could render. Pages are now looked up here by name and their modules
+imported on first use, so a session only pays for the features it opens.
+The first import of each module is timed; import_report() lists those
+timings, and
+
+    python page_registry.py
+
+measures the cold import time of every page module, each in a fresh
+interpreter, to find what slows a new worker down.
+"""
+import sys
+import time
+import argparse
+import importlib
+import threading
+import subprocess
+
+# Page name -> (module, render function)
+PAGES = {
+    "dashboard": ("dashboard", "dashboard_page"),
+    "learning_path": ("learning_path", "learning_path_page"),
+    "community_forum": ("forum", "community_forum_page"),
+    "coding_challenges": ("code_ch", "coding_challenge_page"),
+    "peer_collaboration": ("peer_collaboration", "peer_collaboration_page"),
+}
+
+# Modules used by pages rendered inline in main2.py, and by the corner chat
+FEATURE_MODULES = ("g_video_gen", "s_quiz", "chatbot")
+
+_import_times = {}
+_import_lock = threading.Lock()
+
+
+def lazy_import(module_name):
+    """Import a module on first use, recording how long the first import took"""
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+
+    with _import_lock:
+        if module_name in sys.modules:
+            return sys.modules[module_name]
+        started = time.perf_counter()
+        module = importlib.import_module(module_name)
+        _import_times[module_name] = time.perf_counter() - started
+        print(f"Imported {module_name} in {_import_times[module_name]:.2f}s")
+        return module
+
+
+def get_page(page):
+    """Render function of a registered page, importing its module if needed"""
+    module_name, function_name = PAGES[page]
+    return getattr(lazy_import(module_name), function_name)
+
+
+def render_page(page):
+    get_page(page)()
+
+
+def import_report():
+    """[(module, seconds)] for modules imported through this registry, slowest first"""
+    with _import_lock:
+        return sorted(_import_times.items(), key=lambda item: item[1], reverse=True)
+
+
+def measure_cold_import(module_name):
+    """Seconds to import a module in a fresh interpreter, or None if it fails"""
+    script = ("import time; started = time.perf_counter(); "
+              f"import {module_name}; print(time.perf_counter() - started)")
+    completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    if completed.returncode != 0:
+        return None
+    return float(completed.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report the cold import time of each page module")
+    parser.add_argument("modules", nargs="*", help="modules to measure (default: every page and feature module)")
+    args = parser.parse_args()
+
+    modules = args.modules or sorted({module for module, _ in PAGES.values()} | set(FEATURE_MODULES))
+    timings = [(module, measure_cold_import(module)) for module in modules]
+    for module, seconds in sorted(timings, key=lambda item: -1 if item[1] is None else item[1], reverse=True):
+        print(f"{module:<20} {'import failed' if seconds is None else f'{seconds:6.2f}s'}")
@@ -11,166 +11,79 @@ from datetime import datetime
 import uuid
 import plotly.express as px
 import plotly.graph_objects as go
-from db_utils import get_db_connection, log_activity
+from db_utils import log_activity, get_data_versions, VERSIONED_TABLES
+from db_pool import db_connection
+from student_features import load_peer_features
+
+# Shown when there are no registered students yet
+SAMPLE_STUDENTS = [
+    {"Student": "Amogha", "User_ID": 999, "Quiz_Score_Python": 85, "Watch_Time_Python": 120, "Learning_Style": "Visual", "Group_Count": 2, "Preferred_Topics": "Python Basics"},
+    {"Student": "Kushi Gupta", "User_ID": 998, "Quiz_Score_Python": 65, "Watch_Time_Python": 60, "Learning_Style": "Visual", "Group_Count": 1, "Preferred_Topics": "Python Advanced"},
+    {"Student": "Dev", "User_ID": 997, "Quiz_Score_Python": 90, "Watch_Time_Python": 180, "Learning_Style": "Visual", "Group_Count": 3, "Preferred_Topics": "Data Analysis"},
+    {"Student": "Kabir", "User_ID": 996, "Quiz_Score_Python": 45, "Watch_Time_Python": 50, "Learning_Style": "Visual", "Group_Count": 0, "Preferred_Topics": "Python Basics"},
+    {"Student": "Oviya", "User_ID": 995, "Quiz_Score_Python": 75, "Watch_Time_Python": 100, "Learning_Style": "Visual", "Group_Count": 1, "Preferred_Topics": "Python Advanced"},
+]
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _cached_peer_features(versions):
+    # versions only keys the cache: the features are computed from the
+    # VERSIONED_TABLES, and any write to one of them bumps its counter
+    return load_peer_features()
 
 def load_student_data():
-    """Load student data from SQLite database"""
+    """Load per-student peer features, cached until the source tables change"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Get all users
-        cursor.execute("SELECT id, username, full_name FROM users")
-        users = cursor.fetchall()
-        
-        data = []
-        
-        for user in users:
-            try:
-                user_id = user[0]
-                username = user[1]
-                full_name = user[2] or username
-                
-                # Get quiz performance
-                cursor.execute("""
-                    SELECT topic, AVG(score * 100.0 / max_score) as avg_score
-                    FROM quiz_attempts
-                    WHERE user_id = ?
-                    GROUP BY topic
-                """, (user_id,))
-                
-                quiz_results = cursor.fetchall()
-                
-                # Calculate average Python quiz score
-                python_score = 0
-                python_count = 0
-                
-                for topic, score in quiz_results:
-                    if 'python' in topic.lower():
-                        python_score += score
-                        python_count += 1
-                
-                quiz_score_python = python_score / python_count if python_count > 0 else 50
-                
-                # Get video watch time
-                cursor.execute("""
-                    SELECT topic, SUM(watch_count) as total_watches
-                    FROM videos_watched
-                    WHERE user_id = ?
-                    GROUP BY topic
-                """, (user_id,))
-                
-                watch_results = cursor.fetchall()
-                
-                # Calculate watch time for Python videos
-                python_time = 0
-                
-                for topic, count in watch_results:
-                    if 'python' in topic.lower():
-                        python_time += count * 10  # Assume 10 min per watch
-                
-                # Check if user is already in study groups
-                cursor.execute("""
-                    SELECT COUNT(*) FROM study_group_members
-                    WHERE user_id = ?
-                """, (user_id,))
-                
-                group_count = cursor.fetchone()[0]
-                
-                # Get user's preferred Python topics
-                cursor.execute("""
-                    SELECT sg.topic 
-                    FROM study_groups sg
-                    JOIN study_group_members sgm ON sg.group_id = sgm.group_id
-                    WHERE sgm.user_id = ?
-                """, (user_id,))
-                
-                topics = cursor.fetchall()
-                preferred_topics = [topic[0] for topic in topics] if topics else ["Python Basics"]
-                
-                # Create student entry
-                student_entry = {
-                    "Student": full_name,
-                    "User_ID": user_id,
-                    "Quiz_Score_Python": quiz_score_python,
-                    "Watch_Time_Python": python_time if python_time > 0 else random.randint(50, 150),
-                    "Learning_Style": "Visual",
-                    "Group_Count": group_count,
-                    "Preferred_Topics": ", ".join(preferred_topics[:2]) if len(preferred_topics) > 1 else preferred_topics[0]
-                }
-                
-                data.append(student_entry)
-            except Exception as e:
-                print(f"Error processing user {user[1]}: {e}")
-                continue
-        
-        conn.close()
-        
-        # If no user data yet, provide sample data
-        if not data:
-            data = [
-                {"Student": "Amogha", "User_ID": 999, "Quiz_Score_Python": 85, "Watch_Time_Python": 120, "Learning_Style": "Visual", "Group_Count": 2, "Preferred_Topics": "Python Basics"},
-                {"Student": "Kushi Gupta", "User_ID": 998, "Quiz_Score_Python": 65, "Watch_Time_Python": 60, "Learning_Style": "Visual", "Group_Count": 1, "Preferred_Topics": "Python Advanced"},
-                {"Student": "Dev", "User_ID": 997, "Quiz_Score_Python": 90, "Watch_Time_Python": 180, "Learning_Style": "Visual", "Group_Count": 3, "Preferred_Topics": "Data Analysis"},
-                {"Student": "Kabir", "User_ID": 996, "Quiz_Score_Python": 45, "Watch_Time_Python": 50, "Learning_Style": "Visual", "Group_Count": 0, "Preferred_Topics": "Python Basics"},
-                {"Student": "Oviya", "User_ID": 995, "Quiz_Score_Python": 75, "Watch_Time_Python": 100, "Learning_Style": "Visual", "Group_Count": 1, "Preferred_Topics": "Python Advanced"},
-            ]
-        
-        return pd.DataFrame(data)
+        data = _cached_peer_features(get_data_versions(*VERSIONED_TABLES))
+        if data.empty:
+            return pd.DataFrame(SAMPLE_STUDENTS)
+        return data
     except Exception as e:
         print(f"Error in load_student_data: {e}")
         # Return sample data as fallback
-        return pd.DataFrame([
-            {"Student": "Amogha", "User_ID": 999, "Quiz_Score_Python": 85, "Watch_Time_Python": 120, "Learning_Style": "Visual", "Group_Count": 2, "Preferred_Topics": "Python Basics"},
-            {"Student": "Kushi Gupta", "User_ID": 998, "Quiz_Score_Python": 65, "Watch_Time_Python": 60, "Learning_Style": "Visual", "Group_Count": 1, "Preferred_Topics": "Python Advanced"},
-            {"Student": "Dev", "User_ID": 997, "Quiz_Score_Python": 90, "Watch_Time_Python": 180, "Learning_Style": "Visual", "Group_Count": 3, "Preferred_Topics": "Data Analysis"},
-            {"Student": "Kabir", "User_ID": 996, "Quiz_Score_Python": 45, "Watch_Time_Python": 50, "Learning_Style": "Visual", "Group_Count": 0, "Preferred_Topics": "Python Basics"},
-            {"Student": "Oviya", "User_ID": 995, "Quiz_Score_Python": 75, "Watch_Time_Python": 100, "Learning_Style": "Visual", "Group_Count": 1, "Preferred_Topics": "Python Advanced"},
-        ])
+        return pd.DataFrame(SAMPLE_STUDENTS)
 
 def get_user_study_groups(user_id):
     """Get all study groups that a user is a member of"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        cursor.execute("""
-            SELECT sg.group_id, sg.topic, sg.description, sg.created_at, u.username as creator
-            FROM study_groups sg
-            JOIN study_group_members sgm ON sg.group_id = sgm.group_id
-            JOIN users u ON sg.creator_id = u.id
-            WHERE sgm.user_id = ?
-        """, (user_id,))
+            cursor.execute("""
+                SELECT sg.group_id, sg.topic, sg.description, sg.created_at, u.username as creator
+                FROM study_groups sg
+                JOIN study_group_members sgm ON sg.group_id = sgm.group_id
+                JOIN users u ON sg.creator_id = u.id
+                WHERE sgm.user_id = ?
+            """, (user_id,))
         
-        groups = cursor.fetchall()
+            groups = cursor.fetchall()
         
-        # Format the results
-        formatted_groups = []
-        for group in groups:
-            # Get the count of members in this group
-            cursor.execute("""
-                SELECT COUNT(*) FROM study_group_members
-                WHERE group_id = ?
-            """, (group[0],))
+            # Format the results
+            formatted_groups = []
+            for group in groups:
+                # Get the count of members in this group
+                cursor.execute("""
+                    SELECT COUNT(*) FROM study_group_members
+                    WHERE group_id = ?
+                """, (group[0],))
             
-            member_count = cursor.fetchone()[0]
+                member_count = cursor.fetchone()[0]
             
-            # Format creation date
-            try:
-                created_at = datetime.fromisoformat(group[3]).strftime("%d %b %Y")
-            except:
-                created_at = group[3]
+                # Format creation date
+                try:
+                    created_at = datetime.fromisoformat(group[3]).strftime("%d %b %Y")
+                except:
+                    created_at = group[3]
             
-            formatted_groups.append({
-                "group_id": group[0],
-                "topic": group[1],
-                "description": group[2],
-                "created_at": created_at,
-                "creator": group[4],
-                "member_count": member_count
-            })
+                formatted_groups.append({
+                    "group_id": group[0],
+                    "topic": group[1],
+                    "description": group[2],
+                    "created_at": created_at,
+                    "creator": group[4],
+                    "member_count": member_count
+                })
         
-        conn.close()
         return formatted_groups
     except Exception as e:
         print(f"Error getting user study groups: {e}")
@@ -262,29 +175,26 @@ def get_strengths(student_data):
 def create_study_group(creator_id, peer_ids, topic, description):
     """Create a new study group"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        # Generate a unique group ID
-        group_id = str(uuid.uuid4())[:8]
-        creation_time = datetime.now().isoformat()
+            # Generate a unique group ID
+            group_id = str(uuid.uuid4())[:8]
+            creation_time = datetime.now().isoformat()
         
-        # Create the group
-        cursor.execute("""
-            INSERT INTO study_groups (group_id, creator_id, topic, description, created_at)
-            VALUES (?, ?, ?, ?, ?)
-        """, (group_id, creator_id, topic, description, creation_time))
-        
-        # Add members to the group (including creator)
-        all_members = [creator_id] + peer_ids
-        for member_id in all_members:
+            # Create the group
             cursor.execute("""
-                INSERT INTO study_group_members (group_id, user_id, joined_at)
-                VALUES (?, ?, ?)
-            """, (group_id, member_id, creation_time))
+                INSERT INTO study_groups (group_id, creator_id, topic, description, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (group_id, creator_id, topic, description, creation_time))
         
-        conn.commit()
-        conn.close()
+            # Add members to the group (including creator)
+            all_members = [creator_id] + peer_ids
+            for member_id in all_members:
+                cursor.execute("""
+                    INSERT INTO study_group_members (group_id, user_id, joined_at)
+                    VALUES (?, ?, ?)
+                """, (group_id, member_id, creation_time))
         
         # Log activity
         log_activity(creator_id, "create_study_group", {"group_id": group_id, "topic": topic})
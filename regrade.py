@@ -0,0 +1,204 @@
+# regrade.py
+"""Bulk grading of code challenge solutions and stored submissions.
+
+Usage:
+    python regrade.py --solutions               # check every reference solution passes
+    python regrade.py                           # re-grade every stored submission
+    python regrade.py --challenge 3 --dry-run   # one challenge, without writing
+
+Submissions are read from user_challenges in id order, REGRADE_BATCH at a
+time. A grader pool with one worker per core grades them in parallel, and
+each batch's results are written back in a single transaction. Every row
+gets its test counts and grading time. A submission that passes now but
+was not completed before is marked completed, and the completion and badge
+activities that submit_challenge logs are written with it. Completions are
+never revoked: submissions that no longer pass are only counted.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from db_pool import db_connection
+from activity_log import INSERT_ACTIVITY_SQL
+from grader import GraderPool, challenge_function_name, GRADED, PASSED
+
+# Submissions read, graded and written back per transaction
+REGRADE_BATCH = 500
+
+# Grader processes used by default
+REGRADE_WORKERS = os.cpu_count() or 1
+
+
+def load_challenges(conn, challenge_ids=None):
+    """Grading inputs for each gradable challenge, by id"""
+    challenges = {}
+    for row in conn.execute('''
+        SELECT id, title, description, initial_code, solution_code, test_cases, xp_reward, badge_id
+        FROM code_challenges
+        ORDER BY id
+    '''):
+        if challenge_ids and row["id"] not in challenge_ids:
+            continue
+        function_name = challenge_function_name(row["description"], row["initial_code"])
+        if function_name is None:
+            print(f"Skipping challenge {row['id']} ({row['title']}): no function name found")
+            continue
+        challenges[row["id"]] = {
+            "title": row["title"],
+            "function_name": function_name,
+            "solution_code": row["solution_code"],
+            "test_cases": json.loads(row["test_cases"]) if row["test_cases"] else [],
+            "xp_reward": row["xp_reward"],
+            "badge_id": row["badge_id"]
+        }
+    return challenges
+
+
+def stream_submissions(challenge_ids, batch_size=REGRADE_BATCH):
+    """Yield lists of stored submissions for the given challenges, in id order"""
+    placeholders = ", ".join("?" * len(challenge_ids))
+    last_id = 0
+    while True:
+        with db_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT id, user_id, challenge_id, completed, last_code
+                FROM user_challenges
+                WHERE id > ? AND last_code IS NOT NULL AND challenge_id IN ({placeholders})
+                ORDER BY id
+                LIMIT ?
+            ''', (last_id, *challenge_ids, batch_size)).fetchall()
+        if not rows:
+            return
+        yield [dict(row) for row in rows]
+        last_id = rows[-1]["id"]
+
+
+def passed(graded):
+    """Whether a grade() result passes, as run_challenge_test decides it"""
+    return graded["status"] == GRADED and all(test["status"] == PASSED for test in graded["tests"])
+
+
+def grade_batch(pool, executor, jobs):
+    """Grade (code, challenge) pairs in parallel, preserving order"""
+    return list(executor.map(
+        lambda job: pool.grade(job[0], job[1]["function_name"], job[1]["test_cases"]), jobs))
+
+
+def write_results(batch, results, challenges):
+    """Store one batch of grades and new completions in a single transaction"""
+    now = datetime.datetime.now().isoformat()
+    newly_completed = 0
+    with db_connection() as conn:
+        conn.executemany('''
+            UPDATE user_challenges SET tests_passed = ?, tests_total = ?, graded_at = ? WHERE id = ?
+        ''', [
+            (sum(test["status"] == PASSED for test in graded["tests"]),
+             len(challenges[row["challenge_id"]]["test_cases"]), now, row["id"])
+            for row, graded in zip(batch, results)
+        ])
+
+        activities = []
+        for row, graded in zip(batch, results):
+            if row["completed"] or not passed(graded):
+                continue
+            cursor = conn.execute('''
+                UPDATE user_challenges SET completed = 1, completed_at = ? WHERE id = ? AND NOT completed
+            ''', (now, row["id"]))
+            if cursor.rowcount == 0:
+                continue
+            newly_completed += 1
+            challenge = challenges[row["challenge_id"]]
+            activities.append((row["user_id"], "challenge_completed", json.dumps({
+                "challenge_id": row["challenge_id"],
+                "challenge_title": challenge["title"],
+                "xp_reward": challenge["xp_reward"]
+            }), now))
+            if challenge["badge_id"]:
+                activities.append((row["user_id"], "badge_earned", json.dumps({
+                    "badge_id": challenge["badge_id"],
+                    "challenge_id": row["challenge_id"]
+                }), now))
+        conn.executemany(INSERT_ACTIVITY_SQL, activities)
+    return newly_completed
+
+
+def regrade_submissions(pool, challenges, workers, batch_size=REGRADE_BATCH, dry_run=False):
+    """Re-grade every stored submission of the given challenges; returns the counts"""
+    counts = {"graded": 0, "passed": 0, "failed": 0, "newly_completed": 0, "no_longer_passing": 0}
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch in stream_submissions(list(challenges), batch_size):
+            results = grade_batch(pool, executor, [(row["last_code"], challenges[row["challenge_id"]])
+                                                   for row in batch])
+            for row, graded in zip(batch, results):
+                ok = passed(graded)
+                counts["passed" if ok else "failed"] += 1
+                counts["no_longer_passing"] += bool(row["completed"]) and not ok
+            if not dry_run:
+                counts["newly_completed"] += write_results(batch, results, challenges)
+
+            counts["graded"] += len(batch)
+            elapsed = time.perf_counter() - started
+            print(f"  {counts['graded']} graded ({counts['graded'] / elapsed:.1f}/s)")
+
+    counts["elapsed"] = time.perf_counter() - started
+    return counts
+
+
+def verify_solutions(pool, challenges, workers):
+    """Grade every reference solution; returns {challenge_id: failing result}"""
+    with_solution = [(challenge_id, challenge) for challenge_id, challenge in challenges.items()
+                     if challenge["solution_code"]]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = grade_batch(pool, executor, [(challenge["solution_code"], challenge)
+                                               for _, challenge in with_solution])
+    return {challenge_id: graded for (challenge_id, _), graded in zip(with_solution, results)
+            if not passed(graded)}
+
+
+def describe_failure(graded):
+    if graded["status"] != GRADED:
+        return f"{graded['status']}: {graded['error'] or 'no details'}"
+    return ", ".join(f"test {test['test_num']} {test['status']}"
+                     for test in graded["tests"] if test["status"] != PASSED)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--solutions", action="store_true", help="verify reference solutions instead of submissions")
+    parser.add_argument("--challenge", type=int, action="append", help="only this challenge id (repeatable)")
+    parser.add_argument("--workers", type=int, default=REGRADE_WORKERS, help="grader processes")
+    parser.add_argument("--batch-size", type=int, default=REGRADE_BATCH, help="submissions per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="grade and report without writing results")
+    args = parser.parse_args()
+
+    from db_utils import init_db, init_challenges_tables, migrate_challenges_tables
+    init_db()
+    init_challenges_tables()
+    migrate_challenges_tables()
+
+    with db_connection() as conn:
+        challenges = load_challenges(conn, set(args.challenge or ()))
+
+    pool = GraderPool(num_workers=args.workers)
+    try:
+        if args.solutions:
+            failures = verify_solutions(pool, challenges, args.workers)
+            for challenge_id, graded in failures.items():
+                print(f"Challenge {challenge_id} ({challenges[challenge_id]['title']}): {describe_failure(graded)}")
+            print(f"{len(failures)} of {len(challenges)} challenge solution(s) failing")
+            sys.exit(1 if failures else 0)
+
+        counts = regrade_submissions(pool, challenges, args.workers, args.batch_size, args.dry_run)
+        rate = counts["graded"] / counts["elapsed"] if counts["elapsed"] else 0
+        print(f"Graded {counts['graded']} submission(s) in {counts['elapsed']:.1f}s ({rate:.1f}/s): "
+              f"{counts['passed']} passing, {counts['failed']} failing, "
+              f"{counts['newly_completed']} newly completed, "
+              f"{counts['no_longer_passing']} completed but no longer passing"
+              + (" (dry run, nothing written)" if args.dry_run else ""))
+    finally:
+        pool.close()
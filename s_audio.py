@@ -1,9 +1,9 @@
 import os
 import re
 import streamlit as st
-from gtts import gTTS
-from pydub import AudioSegment
 import google.generativeai as genai
+from llm_client import get_llm_client
+from narration import get_tts_backend, synthesize_sections, concatenate_mp3
 from config import API_KEY
 
 # Set page config
@@ -34,7 +34,6 @@ def setup_gemini_api(api_key):
 def generate_script(topic):
     try:
         with st.spinner("Generating script with Gemini..."):
-            model = genai.GenerativeModel('gemini-1.5-pro')
             generation_config = {
                 "temperature": 0.2,
                 "max_output_tokens": 8192
@@ -85,8 +84,7 @@ def generate_script(topic):
             7. Includes encouragement and motivation
             """
 
-            response = model.generate_content(prompt, generation_config=generation_config)
-            return response.text
+            return get_llm_client().generate(prompt, model='gemini-1.5-pro', generation_config=generation_config)
     except Exception as e:
         st.error(f"Failed to generate script: {str(e)}")
         return f"Error generating script for {topic}. Please try again."
@@ -113,36 +111,22 @@ def generate_audio(script, topic):
             audio_dir = "audio"
             os.makedirs(audio_dir, exist_ok=True)
 
-            # Split the script into sections
+            # Split the script into sections and clean each for TTS
             sections = split_script_into_sections(script)
+            texts = [clean_text_for_tts(text) for text in sections.values()]
+            texts = [text for text in texts if text]
 
-            audio_files = []
+            # Synthesize sections concurrently, reusing cached sections
             progress_bar = st.progress(0)
-            total_sections = len(sections)
-
-            for i, (section_name, section_text) in enumerate(sections.items()):
-                section_filename = f"{audio_dir}/{topic.replace(' ', '')}{section_name}.mp3"
-
-                # Clean the text for TTS
-                clean_text = clean_text_for_tts(section_text)
-
-                # Generate the audio
-                tts = gTTS(text=clean_text, lang='en', slow=False)
-                tts.save(section_filename)
-                audio_files.append(section_filename)
-
-                # Update progress
-                progress_bar.progress((i + 1) / total_sections)
-
-            # Combine all audio files
-            combined_audio = AudioSegment.empty()
-            for audio_file in audio_files:
-                sound = AudioSegment.from_mp3(audio_file)
-                combined_audio += sound
+            section_files = synthesize_sections(
+                texts,
+                get_tts_backend(lang='en', slow=False),
+                on_section_done=lambda done, total: progress_bar.progress(done / total)
+            )
 
-            # Export the combined audio
+            # Join the sections in a single pass
             final_audio_path = f"{audio_dir}/{topic.replace(' ', '_')}_complete.mp3"
-            combined_audio.export(final_audio_path, format="mp3")
+            concatenate_mp3(section_files, final_audio_path)
 
             # Display audio player and download button
             st.audio(final_audio_path, format="audio/mp3")
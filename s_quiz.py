@@ -5,6 +5,11 @@ import matplotlib.pyplot as plt
 import numpy as np
 import os
 from config import API_KEY
+from llm_client import get_llm_client
+
+# Model used for quiz questions; a whole class asking for the same topic
+# shares one cached response
+QUIZ_MODEL = "gemini-1.5-flash"
 
 # Configure Gemini API
 genai.configure(api_key=API_KEY)
@@ -34,11 +39,8 @@ def generate_mcqs(topic):
         "Format each question as: 'Q: <question>? Category: <category> | Options: A) <option1> | B) <option2> | C) <option3> | D) <option4>. Answer: <correct_option>'."
     )
 
-    model = genai.GenerativeModel("gemini-1.5-flash")
-
     try:
-        response = model.generate_content(prompt)
-        output_text = response.text
+        output_text = get_llm_client().generate(prompt, model=QUIZ_MODEL)
     except Exception as e:
         st.error(f"Error generating questions: {e}")
         return []
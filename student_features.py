@@ -0,0 +1,205 @@
+# student_features.py
+from datetime import datetime
+import pandas as pd
+from db_pool import db_connection
+
+QUIZ_SCORES_SQL = """
+    SELECT user_id, topic, AVG(score * 100.0 / max_score) AS avg_score
+    FROM quiz_attempts
+    GROUP BY user_id, topic
+"""
+
+WATCH_COUNTS_SQL = """
+    SELECT user_id, topic, SUM(watch_count) AS total_watches
+    FROM videos_watched
+    GROUP BY user_id, topic
+"""
+
+LAST_ACTIVE_SQL = """
+    SELECT user_id, MAX(timestamp) AS last_active
+    FROM activity_logs
+    GROUP BY user_id
+"""
+
+GROUP_COUNTS_SQL = """
+    SELECT user_id, COUNT(*) AS group_count
+    FROM study_group_members
+    GROUP BY user_id
+"""
+
+GROUP_TOPICS_SQL = """
+    SELECT sgm.user_id, sg.topic
+    FROM study_group_members sgm
+    JOIN study_groups sg ON sg.group_id = sgm.group_id
+    ORDER BY sgm.user_id, sgm.joined_at, sg.topic
+"""
+
+TOPIC_WATCHES_SQL = """
+    SELECT topic, SUM(watch_count) AS total_watches
+    FROM videos_watched
+    GROUP BY topic
+"""
+
+TOPIC_QUIZZES_SQL = """
+    SELECT topic, COUNT(*) AS attempts, AVG(score * 100.0 / max_score) AS avg_score
+    FROM quiz_attempts
+    GROUP BY topic
+"""
+
+# Estimated minutes of viewing per recorded watch
+MINUTES_PER_WATCH = 10
+
+# Peer matching looks at topics whose name contains this (case-insensitive)
+PEER_FOCUS_TOPIC = "python"
+
+# Peer feature values for students with no matching activity yet
+PEER_DEFAULT_QUIZ_SCORE = 50
+PEER_DEFAULT_WATCH_TIME = 100
+PEER_DEFAULT_TOPICS = "Python Basics"
+PEER_LEARNING_STYLE = "Visual"
+
+# Study group topics listed per student
+PEER_MAX_TOPICS = 2
+
+
+def _query_frame(conn, sql, columns):
+    # Plain tuples are much cheaper to build than sqlite3.Row for bulk reads
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    return pd.DataFrame(cursor.execute(sql).fetchall(), columns=columns)
+
+
+def _pivot_topics(frame, value, prefix):
+    """Turn (user_id, topic, value) rows into one <prefix><topic> column per topic"""
+    if frame.empty:
+        return pd.DataFrame(index=pd.Index([], name="user_id"))
+    wide = frame.set_index(["user_id", "topic"])[value].unstack("topic").sort_index(axis=1)
+    wide.columns = [prefix + topic.replace(' ', '_') for topic in wide.columns]
+    if wide.columns.duplicated().any():
+        # Topics differing only in spaces vs underscores share a column;
+        # the later topic wins, as it did when rows were built per user
+        wide = wide.T.groupby(level=0, sort=False).last().T
+    return wide
+
+
+def _top_topic(frame, value):
+    """Topic with the highest value per user; ties go to the first topic by name"""
+    if frame.empty:
+        return pd.Series(dtype=object)
+    ranked = frame.assign(_rank=frame[value].fillna(float('-inf')))
+    ranked = ranked.sort_values(["user_id", "_rank", "topic"], ascending=[True, False, True])
+    return ranked.drop_duplicates("user_id").set_index("user_id")["topic"]
+
+
+def _display_names(users):
+    """full_name where set, otherwise the username"""
+    full_name = users["full_name"]
+    return full_name.where(full_name.notna() & (full_name != ""), users["username"])
+
+
+def _parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        return None
+
+
+def load_learning_features(conn=None):
+    """Per-user learning features as one wide DataFrame.
+
+    Columns are Student, User_ID, Preference, Last_Active, then
+    Quiz_Score_<topic> (average percentage) and Watch_Time_<topic>
+    (estimated minutes) for every topic; a user without data for a topic
+    gets NaN there. Every aggregate comes from a single GROUP BY over its
+    table, so the cost is a handful of queries regardless of the number of
+    users.
+    """
+    if conn is None:
+        with db_connection() as pooled:
+            return load_learning_features(pooled)
+
+    users = _query_frame(conn, "SELECT id, username, full_name FROM users ORDER BY id",
+                         ["user_id", "username", "full_name"])
+    quiz = _query_frame(conn, QUIZ_SCORES_SQL, ["user_id", "topic", "avg_score"])
+    watches = _query_frame(conn, WATCH_COUNTS_SQL, ["user_id", "topic", "total_watches"])
+    last_active = _query_frame(conn, LAST_ACTIVE_SQL, ["user_id", "last_active"])
+
+    users = users.set_index("user_id")
+    watches["watch_time"] = watches["total_watches"].fillna(0) * MINUTES_PER_WATCH
+
+    # Prefer the most watched topic, falling back to the best quiz topic
+    preference = _top_topic(watches, "total_watches")
+    preference = preference.combine_first(_top_topic(quiz, "avg_score"))
+
+    now = datetime.now()
+    last_seen = last_active.set_index("user_id")["last_active"].map(_parse_timestamp).reindex(users.index)
+
+    frame = pd.DataFrame({
+        "Student": _display_names(users),
+        "User_ID": users.index,
+        "Preference": preference.reindex(users.index),
+        "Last_Active": last_seen.where(last_seen.notna(), now)
+    }, index=users.index)
+
+    frame = frame.join(_pivot_topics(quiz, "avg_score", "Quiz_Score_"))
+    frame = frame.join(_pivot_topics(watches, "watch_time", "Watch_Time_"))
+    return frame.reset_index(drop=True)
+
+
+def load_peer_features(conn=None):
+    """Per-user features used to cluster and match study peers.
+
+    Columns are Student, User_ID, Quiz_Score_Python (mean of the per-topic
+    averages over matching topics), Watch_Time_Python (estimated minutes),
+    Learning_Style, Group_Count and Preferred_Topics (the first study group
+    topics, comma-joined). Students without matching activity get the fixed
+    PEER_DEFAULT_* values, so the same database always yields the same frame.
+    """
+    if conn is None:
+        with db_connection() as pooled:
+            return load_peer_features(pooled)
+
+    users = _query_frame(conn, "SELECT id, username, full_name FROM users ORDER BY id",
+                         ["user_id", "username", "full_name"]).set_index("user_id")
+    quiz = _query_frame(conn, QUIZ_SCORES_SQL, ["user_id", "topic", "avg_score"])
+    watches = _query_frame(conn, WATCH_COUNTS_SQL, ["user_id", "topic", "total_watches"])
+    group_counts = _query_frame(conn, GROUP_COUNTS_SQL, ["user_id", "group_count"])
+    group_topics = _query_frame(conn, GROUP_TOPICS_SQL, ["user_id", "topic"])
+
+    def focus(frame):
+        return frame[frame["topic"].str.contains(PEER_FOCUS_TOPIC, case=False, regex=False, na=False)]
+
+    quiz_score = focus(quiz).groupby("user_id")["avg_score"].mean().reindex(users.index)
+    watch_time = (focus(watches).groupby("user_id")["total_watches"].sum() * MINUTES_PER_WATCH).reindex(users.index)
+    topics = (group_topics.groupby("user_id").head(PEER_MAX_TOPICS)
+              .groupby("user_id")["topic"].agg(", ".join).reindex(users.index))
+
+    frame = pd.DataFrame({
+        "Student": _display_names(users),
+        "User_ID": users.index,
+        "Quiz_Score_Python": quiz_score.fillna(PEER_DEFAULT_QUIZ_SCORE),
+        "Watch_Time_Python": watch_time.where(watch_time > 0, PEER_DEFAULT_WATCH_TIME),
+        "Learning_Style": PEER_LEARNING_STYLE,
+        "Group_Count": group_counts.set_index("user_id")["group_count"].reindex(users.index, fill_value=0),
+        "Preferred_Topics": topics.fillna(PEER_DEFAULT_TOPICS)
+    }, index=users.index)
+    return frame.reset_index(drop=True)
+
+
+def load_topic_stats(conn=None):
+    """Per-topic watch and quiz totals, one row per topic sorted by name.
+
+    Columns are topic, total_watches, attempts and avg_score; a topic seen
+    only in videos_watched or only in quiz_attempts has 0 attempts or NaN
+    watches respectively.
+    """
+    if conn is None:
+        with db_connection() as pooled:
+            return load_topic_stats(pooled)
+
+    watches = _query_frame(conn, TOPIC_WATCHES_SQL, ["topic", "total_watches"])
+    quizzes = _query_frame(conn, TOPIC_QUIZZES_SQL, ["topic", "attempts", "avg_score"])
+
+    stats = watches.merge(quizzes, on="topic", how="outer").sort_values("topic", ignore_index=True)
+    stats["attempts"] = stats["attempts"].fillna(0).astype(int)
+    return stats
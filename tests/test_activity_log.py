@@ -0,0 +1,67 @@
+# test_activity_log.py
+import pytest
+import db_pool
+from activity_log import ActivityLogWriter
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    pool = db_pool.ConnectionPool(str(tmp_path / "test.db"))
+    monkeypatch.setattr(db_pool, "_pool", pool)
+    with pool.connection() as conn:
+        conn.execute('''
+            CREATE TABLE activity_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                activity_type TEXT,
+                activity_details TEXT,
+                timestamp TEXT
+            )
+        ''')
+    yield pool
+    pool.close_all()
+
+
+def logged(pool):
+    with pool.connection() as conn:
+        return [tuple(row) for row in conn.execute(
+            "SELECT user_id, activity_type, activity_details FROM activity_logs ORDER BY id")]
+
+
+def test_synchronous_writes_immediately(pool):
+    writer = ActivityLogWriter(synchronous=True)
+    writer.log(1, "login")
+    assert logged(pool) == [(1, "login", None)]
+
+
+def test_buffered_events_are_written_on_flush(pool):
+    writer = ActivityLogWriter(batch_size=100, flush_interval=60)
+    for i in range(3):
+        writer.log(i, "quiz_completed", str(i))
+    assert logged(pool) == []
+
+    assert writer.flush() == 3
+    assert logged(pool) == [(0, "quiz_completed", "0"), (1, "quiz_completed", "1"), (2, "quiz_completed", "2")]
+    writer.close()
+
+
+def test_close_writes_pending_events(pool):
+    writer = ActivityLogWriter(batch_size=100, flush_interval=60)
+    writer.log(7, "logout")
+    writer.close()
+    assert logged(pool) == [(7, "logout", None)]
+
+
+def test_failed_flush_keeps_events_in_order(pool):
+    writer = ActivityLogWriter(batch_size=100, flush_interval=60)
+    writer.log(1, "first")
+    with pool.connection() as conn:
+        conn.execute("ALTER TABLE activity_logs RENAME TO activity_logs_moved")
+    assert writer.flush() == 0
+
+    writer.log(2, "second")
+    with pool.connection() as conn:
+        conn.execute("ALTER TABLE activity_logs_moved RENAME TO activity_logs")
+    assert writer.flush() == 2
+    assert logged(pool) == [(1, "first", None), (2, "second", None)]
+    writer.close()
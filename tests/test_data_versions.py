@@ -0,0 +1,34 @@
+# test_data_versions.py
+import pytest
+import db_pool
+from db_pool import db_connection
+from db_utils import VERSIONED_TABLES, init_data_versions, get_data_versions
+
+
+@pytest.fixture(autouse=True)
+def pool(tmp_path, monkeypatch):
+    pool = db_pool.ConnectionPool(str(tmp_path / "test.db"))
+    monkeypatch.setattr(db_pool, "_pool", pool)
+    with db_connection() as conn:
+        for table in VERSIONED_TABLES:
+            conn.execute(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, value TEXT)")
+        init_data_versions(conn.cursor())
+    yield pool
+    pool.close_all()
+
+
+def test_writes_bump_the_table_version():
+    before = get_data_versions(*VERSIONED_TABLES)
+    with db_connection() as conn:
+        conn.execute("INSERT INTO quiz_attempts (value) VALUES ('a')")
+        conn.execute("UPDATE quiz_attempts SET value = 'b'")
+    after = get_data_versions(*VERSIONED_TABLES)
+
+    index = VERSIONED_TABLES.index("quiz_attempts")
+    assert after[index] == before[index] + 2
+    assert after[:index] + after[index + 1:] == before[:index] + before[index + 1:]
+
+
+def test_unversioned_tables_are_rejected():
+    with pytest.raises(ValueError, match="forum_posts"):
+        get_data_versions("users", "forum_posts")
@@ -0,0 +1,92 @@
+# test_db_pool.py
+import sqlite3
+import pytest
+import db_pool
+from db_pool import db_connection
+from db_utils import get_db_connection
+
+
+@pytest.fixture(autouse=True)
+def pool(tmp_path, monkeypatch):
+    pool = db_pool.ConnectionPool(str(tmp_path / "test.db"))
+    monkeypatch.setattr(db_pool, "_pool", pool)
+    with db_connection() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+    yield pool
+    pool.close_all()
+
+
+def committed(pool):
+    """Rows visible to another connection, i.e. committed"""
+    conn = sqlite3.connect(pool.path)
+    try:
+        return sorted(row[0] for row in conn.execute("SELECT x FROM t"))
+    finally:
+        conn.close()
+
+
+def test_block_commits_on_success_and_rolls_back_on_error(pool):
+    with db_connection() as conn:
+        conn.execute("INSERT INTO t VALUES (1)")
+    with pytest.raises(RuntimeError):
+        with db_connection() as conn:
+            conn.execute("INSERT INTO t VALUES (2)")
+            raise RuntimeError
+    assert committed(pool) == [1]
+
+
+def test_nested_block_does_not_commit_outer_transaction(pool):
+    with pytest.raises(RuntimeError):
+        with db_connection() as outer:
+            outer.execute("INSERT INTO t VALUES (1)")
+            with db_connection() as inner:
+                inner.execute("INSERT INTO t VALUES (2)")
+            assert committed(pool) == []
+            raise RuntimeError
+    assert committed(pool) == []
+
+
+def test_failed_nested_block_undoes_only_its_own_work(pool):
+    with db_connection() as outer:
+        outer.execute("INSERT INTO t VALUES (1)")
+        with pytest.raises(ValueError):
+            with db_connection() as inner:
+                inner.execute("INSERT INTO t VALUES (2)")
+                raise ValueError
+        outer.execute("INSERT INTO t VALUES (3)")
+    assert committed(pool) == [1, 3]
+
+
+def test_handle_used_as_context_manager_joins_enclosing_block(pool):
+    with db_connection() as outer:
+        outer.execute("INSERT INTO t VALUES (1)")
+        with get_db_connection() as handle:
+            handle.execute("INSERT INTO t VALUES (2)")
+        assert committed(pool) == []
+        outer.execute("INSERT INTO t VALUES (3)")
+    assert committed(pool) == [1, 2, 3]
+
+
+def test_handle_used_as_context_manager_commits_on_its_own(pool):
+    with get_db_connection() as handle:
+        handle.execute("INSERT INTO t VALUES (1)")
+    assert committed(pool) == [1]
+    with pytest.raises(KeyError):
+        with get_db_connection() as handle:
+            handle.execute("INSERT INTO t VALUES (2)")
+            raise KeyError
+    assert committed(pool) == [1]
+
+
+def test_leaked_handle_does_not_leak_its_transaction(pool):
+    def leaky():
+        conn = get_db_connection()
+        conn.execute("INSERT INTO t VALUES (9)")
+        raise KeyError
+
+    with pytest.raises(KeyError):
+        leaky()
+    with db_connection() as conn:
+        conn.execute("INSERT INTO t VALUES (1)")
+    assert committed(pool) == [1]
+    assert pool._local.depth == 0
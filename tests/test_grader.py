@@ -0,0 +1,138 @@
+# test_grader.py
+import pytest
+from grader import (GraderPool, challenge_function_name, GRADED, MISSING_FUNCTION, LOAD_ERROR,
+                    LOAD_TIMEOUT, CRASHED, PASSED, FAILED, ERROR, TIMEOUT, OUT_OF_MEMORY, SKIPPED)
+
+TESTS = [
+    {"input": 2, "expected": 4},
+    {"input": 3, "expected": 9},
+]
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = GraderPool(num_workers=1)
+    yield pool
+    pool.close()
+
+
+def grade(pool, code, test_cases=TESTS, **budgets):
+    budgets.setdefault("cpu_seconds", 1)
+    budgets.setdefault("wall_seconds", 3.0)
+    return pool.grade(code, "square", test_cases, **budgets)
+
+
+def statuses(result):
+    return [test["status"] for test in result["tests"]]
+
+
+def test_passing_and_failing_tests(pool):
+    result = grade(pool, "def square(x):\n    print('hi')\n    return x * 2\n")
+    assert result["status"] == GRADED
+    assert statuses(result) == [PASSED, FAILED]
+    assert result["tests"][1]["output"] == "6"
+    assert "hi" in result["output"]
+
+
+def test_tuple_inputs_are_unpacked(pool):
+    result = pool.grade("def add(a, b):\n    return a + b\n", "add", [{"input": (1, 2), "expected": 3}])
+    assert statuses(result) == [PASSED]
+
+
+def test_exception_in_test_is_an_error(pool):
+    result = grade(pool, "def square(x):\n    raise ValueError('bad input')\n")
+    assert statuses(result) == [ERROR, ERROR]
+    assert result["tests"][0]["error"] == "bad input"
+
+
+def test_missing_function(pool):
+    result = grade(pool, "def cube(x):\n    return x ** 3\n")
+    assert result["status"] == MISSING_FUNCTION
+    assert result["tests"] == []
+
+
+def test_syntax_error_is_a_load_error(pool):
+    result = grade(pool, "def square(x)\n    return x\n")
+    assert result["status"] == LOAD_ERROR
+    assert result["error"]
+
+
+def test_exit_during_load_does_not_kill_the_worker(pool):
+    result = grade(pool, "import sys\nsys.exit(3)\n")
+    assert result["status"] == LOAD_ERROR
+    assert statuses(grade(pool, "def square(x):\n    return x * x\n")) == [PASSED, PASSED]
+
+
+def test_cpu_bound_test_times_out(pool):
+    code = ("def square(x):\n"
+            "    if x == 2:\n"
+            "        while True:\n"
+            "            pass\n"
+            "    return x * x\n")
+    result = grade(pool, code)
+    assert result["status"] == GRADED
+    assert statuses(result) == [TIMEOUT, PASSED]
+
+
+def test_cpu_timeout_cannot_be_swallowed(pool):
+    code = ("def square(x):\n"
+            "    try:\n"
+            "        while True:\n"
+            "            pass\n"
+            "    except Exception:\n"
+            "        return x * x\n")
+    assert statuses(grade(pool, code)) == [TIMEOUT, TIMEOUT]
+
+
+def test_sleeping_test_hits_wall_clock_timeout(pool):
+    code = "import time\ndef square(x):\n    time.sleep(60)\n"
+    result = grade(pool, code, wall_seconds=0.5)
+    assert result["status"] == GRADED
+    assert statuses(result) == [TIMEOUT, SKIPPED]
+
+
+def test_endless_module_code_is_a_load_timeout(pool):
+    result = grade(pool, "while True:\n    pass\n")
+    assert result["status"] == LOAD_TIMEOUT
+    assert result["tests"] == []
+
+
+def test_large_allocation_is_out_of_memory(pool):
+    code = "def square(x):\n    data = bytearray(10 ** 10)\n    return len(data)\n"
+    result = grade(pool, code)
+    assert statuses(result) == [OUT_OF_MEMORY, OUT_OF_MEMORY]
+
+
+def test_crashed_worker_is_reported_and_replaced(pool):
+    code = "import os\ndef square(x):\n    os._exit(1)\n"
+    result = grade(pool, code)
+    assert result["status"] == GRADED
+    assert statuses(result) == [CRASHED, SKIPPED]
+
+    assert statuses(grade(pool, "def square(x):\n    return x * x\n")) == [PASSED, PASSED]
+
+
+def test_file_writes_are_blocked(pool, tmp_path):
+    target = tmp_path / "out.txt"
+    code = (f"def square(x):\n"
+            f"    with open({str(target)!r}, 'w') as f:\n"
+            f"        f.write('x')\n"
+            f"    return x * x\n")
+    result = grade(pool, code)
+    assert statuses(result) == [ERROR, ERROR]
+    assert not target.exists() or target.stat().st_size == 0
+
+
+def test_workers_are_recycled():
+    pool = GraderPool(num_workers=1, submissions_per_worker=2)
+    try:
+        for _ in range(5):
+            assert statuses(grade(pool, "def square(x):\n    return x * x\n")) == [PASSED, PASSED]
+    finally:
+        pool.close()
+
+
+def test_challenge_function_name():
+    assert challenge_function_name("Write a function called `decode_map` that...", "") == "decode_map"
+    assert challenge_function_name("Decode the map.", "def decode(grid):\n    pass\n") == "decode"
+    assert challenge_function_name("", "") is None
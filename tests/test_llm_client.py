@@ -0,0 +1,132 @@
+# test_llm_client.py
+import time
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from llm_client import LLMClient, ResponseCache, StubBackend
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(root=str(tmp_path / "llm"))
+
+
+def test_stub_backend_matches_prompt_fragments():
+    backend = StubBackend({"quiz": "Q1"})
+    assert backend.generate("m", "make a quiz") == "Q1"
+    assert backend.generate("m", "explain lists") == "[m] explain lists"
+    assert len(backend.calls) == 2
+
+
+def test_identical_requests_are_served_from_cache(cache):
+    backend = StubBackend()
+    client = LLMClient(backend=backend, cache=cache)
+
+    first = client.generate("Explain decorators", "gemini-pro")
+    second = client.generate("Explain decorators", "gemini-pro")
+    assert first == second
+    assert len(backend.calls) == 1
+
+    stats = client.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_cache_key_includes_model_and_config(cache):
+    backend = StubBackend()
+    client = LLMClient(backend=backend, cache=cache)
+
+    client.generate("Explain decorators", "gemini-pro")
+    client.generate("Explain decorators", "gemini-1.5-flash")
+    client.generate("Explain decorators", "gemini-pro", generation_config={"temperature": 0.2})
+    assert len(backend.calls) == 3
+
+
+def test_cache_is_shared_between_clients(cache):
+    LLMClient(backend=StubBackend({"": "cached text"}), cache=cache).generate("p", "m")
+
+    backend = StubBackend({"": "fresh text"})
+    assert LLMClient(backend=backend, cache=cache).generate("p", "m") == "cached text"
+    assert backend.calls == []
+
+
+def test_use_cache_false_always_calls_backend(cache):
+    backend = StubBackend()
+    client = LLMClient(backend=backend, cache=cache)
+    client.generate("p", "m", use_cache=False)
+    client.generate("p", "m", use_cache=False)
+    assert len(backend.calls) == 2
+
+
+def test_expired_responses_are_regenerated(cache):
+    backend = StubBackend()
+    client = LLMClient(backend=backend, cache=cache)
+    client.generate("p", "m", ttl=-1)
+    client.generate("p", "m")
+    assert len(backend.calls) == 2
+
+
+def test_concurrent_identical_requests_call_backend_once(cache):
+    release = threading.Event()
+
+    def slow(model, prompt, generation_config):
+        release.wait(5)
+        return "answer"
+
+    backend = StubBackend(slow)
+    client = LLMClient(backend=backend, cache=cache)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(client.generate, "Explain generators", "m") for _ in range(8)]
+        deadline = time.time() + 5
+        while client.stats()["coalesced"] < 7 and time.time() < deadline:
+            time.sleep(0.01)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert results == ["answer"] * 8
+    assert len(backend.calls) == 1
+    assert client.stats()["coalesced"] == 7
+
+
+def test_failures_reach_waiters_and_are_not_cached(cache):
+    release = threading.Event()
+    fail = [True]
+
+    def flaky(model, prompt, generation_config):
+        release.wait(5)
+        if fail[0]:
+            raise RuntimeError("quota exceeded")
+        return "answer"
+
+    backend = StubBackend(flaky)
+    client = LLMClient(backend=backend, cache=cache)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(client.generate, "p", "m") for _ in range(4)]
+        deadline = time.time() + 5
+        while client.stats()["coalesced"] < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        release.set()
+        for future in futures:
+            with pytest.raises(RuntimeError, match="quota exceeded"):
+                future.result()
+
+    assert len(backend.calls) == 1
+    assert client.stats()["errors"] == 1
+
+    fail[0] = False
+    assert client.generate("p", "m") == "answer"
+    assert len(backend.calls) == 2
+
+
+def test_eviction_keeps_cache_under_max_bytes(tmp_path):
+    cache = ResponseCache(root=str(tmp_path / "llm"), max_bytes=25)
+    cache.put("a", "m", "x" * 10, ttl=60)
+    cache.put("b", "m", "y" * 10, ttl=60)
+    cache.get("a")
+    cache.put("c", "m", "z" * 10, ttl=60)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 10
+    assert cache.get("c") == "z" * 10
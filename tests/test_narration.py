@@ -0,0 +1,73 @@
+# test_narration.py
+import os
+import pytest
+import artifact_cache
+from narration import SilentTTSBackend, get_tts_backend, synthesize_sections, concatenate_mp3
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = artifact_cache.ArtifactCache(root=str(tmp_path / "cache"))
+    monkeypatch.setattr(artifact_cache, "_cache", cache)
+    return cache
+
+
+class CountingBackend(SilentTTSBackend):
+    def __init__(self):
+        super().__init__()
+        self.synthesized = []
+
+    def synthesize(self, text, path):
+        self.synthesized.append(text)
+        super().synthesize(text, path)
+
+
+def test_get_tts_backend_rejects_unknown_names():
+    assert isinstance(get_tts_backend("silent"), SilentTTSBackend)
+    with pytest.raises(ValueError):
+        get_tts_backend("nope")
+
+
+def test_silent_backend_writes_frames_for_the_reading_time(tmp_path):
+    backend = SilentTTSBackend(words_per_minute=60)
+    path = tmp_path / "section.mp3"
+    backend.synthesize("one two three", str(path))
+
+    data = path.read_bytes()
+    frames = len(data) // backend.FRAME_SIZE
+    assert len(data) % backend.FRAME_SIZE == 0
+    assert data[:4] == backend.FRAME_HEADER
+    assert frames * backend.FRAME_SECONDS == pytest.approx(3.0, abs=backend.FRAME_SECONDS)
+
+
+def test_synthesize_sections_reuses_cached_sections(cache):
+    backend = CountingBackend()
+    first = synthesize_sections(["Intro.", "Lists."], backend)
+    assert sorted(backend.synthesized) == ["Intro.", "Lists."]
+
+    progress = []
+    second = synthesize_sections(["Intro.", "Tuples."], backend,
+                                 on_section_done=lambda done, total: progress.append((done, total)))
+    assert backend.synthesized[2:] == ["Tuples."]
+    assert second[0] == first[0]
+    assert progress == [(1, 2), (2, 2)]
+
+
+def test_concatenate_mp3_keeps_only_the_first_id3_tag(tmp_path):
+    tag = b"ID3\x04\x00\x00\x00\x00\x00\x02ab"
+    first, second = tmp_path / "a.mp3", tmp_path / "b.mp3"
+    first.write_bytes(tag + b"frame-a")
+    second.write_bytes(tag + b"frame-b")
+
+    output = tmp_path / "out.mp3"
+    concatenate_mp3([str(first), str(second)], str(output))
+    assert output.read_bytes() == tag + b"frame-a" + b"frame-b"
+
+
+def test_concatenate_mp3_leaves_nothing_behind_on_failure(tmp_path):
+    first = tmp_path / "a.mp3"
+    first.write_bytes(b"frame-a")
+
+    with pytest.raises(FileNotFoundError):
+        concatenate_mp3([str(first), str(tmp_path / "missing.mp3")], str(tmp_path / "out.mp3"))
+    assert sorted(os.listdir(tmp_path)) == ["a.mp3"]
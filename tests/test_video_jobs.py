@@ -0,0 +1,94 @@
+# test_video_jobs.py
+import time
+import pytest
+import db_pool
+import video_jobs
+from video_jobs import (init_video_jobs_db, enqueue_video_job, claim_next_job, get_video_job,
+                        complete_job, fail_job, requeue_stale_jobs, update_job_progress)
+
+
+@pytest.fixture(autouse=True)
+def pool(tmp_path, monkeypatch):
+    pool = db_pool.ConnectionPool(str(tmp_path / "test.db"))
+    monkeypatch.setattr(db_pool, "_pool", pool)
+    init_video_jobs_db()
+    yield pool
+    pool.close_all()
+
+
+def make_stale(job_id):
+    with db_pool.db_connection() as conn:
+        conn.execute("UPDATE video_jobs SET heartbeat = ? WHERE id = ?",
+                     (time.time() - video_jobs.JOB_LEASE - 1, job_id))
+
+
+def test_complete_job(pool):
+    job_id = enqueue_video_job("Python lists")
+    job = claim_next_job("w1")
+    assert job["id"] == job_id and job["status"] == "running"
+
+    assert complete_job(job_id, "w1", {"video": "out.mp4"})
+    job = get_video_job(job_id)
+    assert (job["status"], job["result"]) == ("succeeded", {"video": "out.mp4"})
+
+
+def test_failed_job_is_retried_with_backoff_then_failed(pool):
+    job_id = enqueue_video_job("Python lists", max_attempts=2)
+    claim_next_job("w1")
+    assert fail_job(job_id, "w1", "boom")
+    job = get_video_job(job_id)
+    assert (job["status"], job["error"]) == ("queued", "boom")
+    assert job["run_after"] >= time.time() + video_jobs.RETRY_BASE_DELAY - 1
+    assert claim_next_job("w1") is None
+
+    with db_pool.db_connection() as conn:
+        conn.execute("UPDATE video_jobs SET run_after = 0 WHERE id = ?", (job_id,))
+    claim_next_job("w1")
+    assert fail_job(job_id, "w1", "boom again")
+    job = get_video_job(job_id)
+    assert (job["status"], job["error"], job["attempts"]) == ("failed", "boom again", 2)
+    assert job["finished_at"]
+
+
+def test_finished_job_is_not_requeued(pool):
+    job_id = enqueue_video_job("Python lists")
+    claim_next_job("w1")
+    complete_job(job_id, "w1", {"video": "out.mp4"})
+
+    assert not fail_job(job_id, "w1", "late failure")
+    make_stale(job_id)
+    assert requeue_stale_jobs() == 0
+    assert get_video_job(job_id)["status"] == "succeeded"
+
+
+def test_stale_job_is_requeued_and_old_worker_loses_it(pool):
+    job_id = enqueue_video_job("Python lists")
+    claim_next_job("w1")
+    make_stale(job_id)
+
+    assert requeue_stale_jobs() == 1
+    job = get_video_job(job_id)
+    assert (job["status"], job["result"], job["error"]) == ("queued", None, "Worker stopped responding")
+
+    with db_pool.db_connection() as conn:
+        conn.execute("UPDATE video_jobs SET run_after = 0 WHERE id = ?", (job_id,))
+    assert claim_next_job("w2")["id"] == job_id
+
+    # The original worker wakes up and reports back; the new owner is unaffected
+    update_job_progress(job_id, "w1", "render", 0.9)
+    assert not complete_job(job_id, "w1", {"video": "stale.mp4"})
+    assert not fail_job(job_id, "w1", "stale failure")
+    job = get_video_job(job_id)
+    assert (job["status"], job["worker"], job["stage"], job["result"]) == ("running", "w2", None, None)
+
+    assert complete_job(job_id, "w2", {"video": "out.mp4"})
+    assert get_video_job(job_id)["result"] == {"video": "out.mp4"}
+
+
+def test_stale_job_out_of_attempts_is_failed(pool):
+    job_id = enqueue_video_job("Python lists", max_attempts=1)
+    claim_next_job("w1")
+    make_stale(job_id)
+
+    assert requeue_stale_jobs() == 1
+    assert get_video_job(job_id)["status"] == "failed"
@@ -0,0 +1,266 @@
+# user_stats.py
+"""Per-user rollup of XP, level, streak and badge inputs.
+
+The user_stats table holds one row per user. SQLite triggers on
+activity_logs, quiz_attempts and videos_watched update it in the same
+transaction as the write that changed it, so reading a user's stats is a
+single primary-key lookup. Deletes are not reflected in the counters, nor
+activities backdated to before a user's latest active day in the streak;
+run
+
+    python user_stats.py --rebuild
+
+to recompute every row from the raw tables (for backfills or repairs).
+"""
+import sys
+import json
+import argparse
+import datetime
+from collections import defaultdict
+from db_pool import db_connection
+
+# Percentage a quiz attempt needs for its topic to count as mastered
+MASTERY_SCORE = 70
+
+# Activity types whose details carry an xp_reward
+XP_ACTIVITY_TYPES = ("challenge_completed", "daily_challenge_completed")
+
+# Longest streak reported, in days
+MAX_STREAK_DAYS = 30
+
+USER_STATS_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id INTEGER PRIMARY KEY,
+    total_activities INTEGER NOT NULL DEFAULT 0,
+    challenge_xp INTEGER NOT NULL DEFAULT 0,
+    goals_set INTEGER NOT NULL DEFAULT 0,
+    badge_ids TEXT NOT NULL DEFAULT '[]',
+    quiz_count INTEGER NOT NULL DEFAULT 0,
+    quiz_scored INTEGER NOT NULL DEFAULT 0,
+    quiz_score_total REAL NOT NULL DEFAULT 0,
+    mastered_topics TEXT NOT NULL DEFAULT '[]',
+    video_count INTEGER NOT NULL DEFAULT 0,
+    last_active_date TEXT,
+    streak_days INTEGER NOT NULL DEFAULT 0
+)
+'''
+
+_XP_TYPES_SQL = ", ".join(f"'{activity_type}'" for activity_type in XP_ACTIVITY_TYPES)
+
+USER_STATS_TRIGGERS = {
+    "trg_user_stats_activity": f'''
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_activity
+    AFTER INSERT ON activity_logs
+    BEGIN
+        INSERT OR IGNORE INTO user_stats (user_id) VALUES (NEW.user_id);
+        UPDATE user_stats SET
+            total_activities = total_activities + 1,
+            challenge_xp = challenge_xp + CASE
+                WHEN NEW.activity_type IN ({_XP_TYPES_SQL}) AND json_valid(NEW.activity_details)
+                THEN COALESCE(json_extract(NEW.activity_details, '$.xp_reward'), 0)
+                ELSE 0 END,
+            goals_set = goals_set + (NEW.activity_type = 'goal_set'),
+            badge_ids = CASE
+                WHEN NEW.activity_type = 'badge_earned' AND json_valid(NEW.activity_details)
+                     AND json_extract(NEW.activity_details, '$.badge_id') IS NOT NULL
+                THEN json_insert(badge_ids, '$[#]', json_extract(NEW.activity_details, '$.badge_id'))
+                ELSE badge_ids END,
+            streak_days = CASE
+                WHEN date(NEW.timestamp) IS NULL THEN streak_days
+                WHEN last_active_date IS NULL OR date(NEW.timestamp) > date(last_active_date, '+1 day') THEN 1
+                WHEN date(NEW.timestamp) = date(last_active_date, '+1 day') THEN streak_days + 1
+                ELSE streak_days END,
+            last_active_date = CASE
+                WHEN last_active_date IS NULL OR date(NEW.timestamp) > last_active_date THEN date(NEW.timestamp)
+                ELSE last_active_date END
+        WHERE user_id = NEW.user_id;
+    END
+    ''',
+    "trg_user_stats_quiz": f'''
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_quiz
+    AFTER INSERT ON quiz_attempts
+    BEGIN
+        INSERT OR IGNORE INTO user_stats (user_id) VALUES (NEW.user_id);
+        UPDATE user_stats SET
+            quiz_count = quiz_count + 1,
+            quiz_scored = quiz_scored + (NEW.max_score != 0),
+            quiz_score_total = quiz_score_total + COALESCE(NEW.score * 100.0 / NEW.max_score, 0),
+            mastered_topics = CASE
+                WHEN NEW.score * 100.0 / NEW.max_score >= {MASTERY_SCORE}
+                     AND NOT EXISTS (SELECT 1 FROM json_each(mastered_topics) WHERE value = NEW.topic)
+                THEN json_insert(mastered_topics, '$[#]', NEW.topic)
+                ELSE mastered_topics END
+        WHERE user_id = NEW.user_id;
+    END
+    ''',
+    "trg_user_stats_video_insert": '''
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_video_insert
+    AFTER INSERT ON videos_watched
+    BEGIN
+        INSERT OR IGNORE INTO user_stats (user_id) VALUES (NEW.user_id);
+        UPDATE user_stats SET video_count = video_count + COALESCE(NEW.watch_count, 0)
+        WHERE user_id = NEW.user_id;
+    END
+    ''',
+    "trg_user_stats_video_update": '''
+    CREATE TRIGGER IF NOT EXISTS trg_user_stats_video_update
+    AFTER UPDATE OF watch_count ON videos_watched
+    BEGIN
+        INSERT OR IGNORE INTO user_stats (user_id) VALUES (NEW.user_id);
+        UPDATE user_stats SET video_count = video_count + COALESCE(NEW.watch_count, 0) - COALESCE(OLD.watch_count, 0)
+        WHERE user_id = NEW.user_id;
+    END
+    '''
+}
+
+
+def init_user_stats(cursor):
+    """Create the rollup table and its triggers, backfilling it when new"""
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_stats'"
+    ).fetchone()
+    cursor.execute(USER_STATS_SCHEMA)
+    for trigger_sql in USER_STATS_TRIGGERS.values():
+        cursor.execute(trigger_sql)
+    if not exists:
+        rebuild_user_stats(cursor.connection)
+
+
+def _compact(values):
+    # Same spacing as the arrays json_insert() builds in the triggers
+    return json.dumps(values, separators=(",", ":"))
+
+
+def _current_run(dates):
+    """(last date, consecutive days ending on it) for sorted 'YYYY-MM-DD' strings"""
+    run, previous = 0, None
+    for value in dates:
+        day = datetime.date.fromisoformat(value)
+        run = run + 1 if previous is not None and day == previous + datetime.timedelta(days=1) else 1
+        previous = day
+    return (previous.isoformat() if previous else None), run
+
+
+def rebuild_user_stats(conn=None):
+    """Recompute every user_stats row from the raw tables; returns the row count"""
+    if conn is None:
+        with db_connection() as pooled:
+            return rebuild_user_stats(pooled)
+
+    rows = defaultdict(lambda: {
+        "total_activities": 0, "challenge_xp": 0, "goals_set": 0, "badge_ids": [],
+        "quiz_count": 0, "quiz_scored": 0, "quiz_score_total": 0.0, "mastered_topics": [],
+        "video_count": 0, "last_active_date": None, "streak_days": 0
+    })
+
+    for user_id, total, xp, goals in conn.execute(f'''
+        SELECT user_id, COUNT(*),
+               SUM(CASE WHEN activity_type IN ({_XP_TYPES_SQL}) AND json_valid(activity_details)
+                        THEN COALESCE(json_extract(activity_details, '$.xp_reward'), 0) ELSE 0 END),
+               SUM(activity_type = 'goal_set')
+        FROM activity_logs
+        GROUP BY user_id
+    '''):
+        rows[user_id].update(total_activities=total, challenge_xp=xp or 0, goals_set=goals or 0)
+
+    for user_id, badge_id in conn.execute('''
+        SELECT user_id, json_extract(activity_details, '$.badge_id')
+        FROM activity_logs
+        WHERE activity_type = 'badge_earned' AND json_valid(activity_details)
+              AND json_extract(activity_details, '$.badge_id') IS NOT NULL
+        ORDER BY id
+    '''):
+        rows[user_id]["badge_ids"].append(badge_id)
+
+    dates_by_user = defaultdict(list)
+    for user_id, day in conn.execute('''
+        SELECT user_id, date(timestamp) AS day
+        FROM activity_logs
+        WHERE day IS NOT NULL
+        GROUP BY user_id, day
+        ORDER BY user_id, day
+    '''):
+        dates_by_user[user_id].append(day)
+    for user_id, dates in dates_by_user.items():
+        last_date, run = _current_run(dates)
+        rows[user_id].update(last_active_date=last_date, streak_days=run)
+
+    for user_id, count, scored, total in conn.execute('''
+        SELECT user_id, COUNT(*), COUNT(score * 100.0 / max_score), COALESCE(SUM(score * 100.0 / max_score), 0)
+        FROM quiz_attempts
+        GROUP BY user_id
+    '''):
+        rows[user_id].update(quiz_count=count, quiz_scored=scored, quiz_score_total=total)
+
+    for user_id, topic in conn.execute(f'''
+        SELECT user_id, topic
+        FROM quiz_attempts
+        WHERE score * 100.0 / max_score >= {MASTERY_SCORE}
+        GROUP BY user_id, topic
+        ORDER BY user_id, MIN(id)
+    '''):
+        rows[user_id]["mastered_topics"].append(topic)
+
+    for user_id, watches in conn.execute(
+            "SELECT user_id, COALESCE(SUM(watch_count), 0) FROM videos_watched GROUP BY user_id"):
+        rows[user_id]["video_count"] = watches
+
+    conn.execute("DELETE FROM user_stats")
+    conn.executemany('''
+        INSERT INTO user_stats (user_id, total_activities, challenge_xp, goals_set, badge_ids,
+                                quiz_count, quiz_scored, quiz_score_total, mastered_topics,
+                                video_count, last_active_date, streak_days)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (user_id, row["total_activities"], row["challenge_xp"], row["goals_set"], _compact(row["badge_ids"]),
+         row["quiz_count"], row["quiz_scored"], row["quiz_score_total"], _compact(row["mastered_topics"]),
+         row["video_count"], row["last_active_date"], row["streak_days"])
+        for user_id, row in rows.items()
+    ])
+    return len(rows)
+
+
+def current_streak(last_active_date, streak_days, today=None):
+    """Streak as shown to the user: the run of active days ending today"""
+    today = today or datetime.date.today()
+    if last_active_date != today.isoformat():
+        return 0
+    return min(streak_days, MAX_STREAK_DAYS)
+
+
+def read_user_stats(user_id, conn=None):
+    """Return the user's rollup row as a dict (all zeros for a new user)"""
+    if conn is None:
+        with db_connection() as pooled:
+            return read_user_stats(user_id, pooled)
+
+    row = conn.execute("SELECT * FROM user_stats WHERE user_id = ?", (user_id,)).fetchone()
+    if row is None:
+        stats = {"total_activities": 0, "challenge_xp": 0, "goals_set": 0, "badge_ids": [],
+                 "quiz_count": 0, "quiz_scored": 0, "quiz_score_total": 0.0, "mastered_topics": [],
+                 "video_count": 0, "last_active_date": None, "streak_days": 0}
+    else:
+        stats = dict(row)
+        stats.pop("user_id")
+        stats["badge_ids"] = json.loads(stats["badge_ids"])
+        stats["mastered_topics"] = sorted(json.loads(stats["mastered_topics"]))
+
+    stats["avg_score"] = stats["quiz_score_total"] / stats["quiz_scored"] if stats["quiz_scored"] else 0
+    stats["streak"] = current_streak(stats["last_active_date"], stats["streak_days"])
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the user_stats rollup table")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every row from the raw tables")
+    args = parser.parse_args()
+
+    if not args.rebuild:
+        parser.print_help()
+        sys.exit(1)
+
+    from db_utils import init_db
+    from activity_log import flush_activity_log
+    init_db()
+    flush_activity_log()
+    print(f"Rebuilt user_stats for {rebuild_user_stats()} user(s)")
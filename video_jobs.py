@@ -0,0 +1,373 @@
+# video_jobs.py
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import datetime
+import threading
+import multiprocessing
+from db_pool import db_connection
+from artifact_cache import normalize_topic
+
+# Number of worker processes rendering videos at once (override with VIDEDU_VIDEO_WORKERS)
+MAX_WORKERS = int(os.getenv("VIDEDU_VIDEO_WORKERS", 2))
+
+# Attempts per job before it is marked failed, and the retry backoff
+MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 30.0
+RETRY_MAX_DELAY = 600.0
+
+# Seconds between queue polls when idle, and between heartbeats of a running job
+POLL_INTERVAL = 2.0
+HEARTBEAT_INTERVAL = 15.0
+# A running job without a heartbeat for this long is assumed to be orphaned
+JOB_LEASE = 120.0
+
+# Jobs a worker process runs before it is replaced, bounding leaked memory
+JOBS_PER_WORKER = 20
+
+# Workers run at lower CPU priority so renders never starve the web process
+WORKER_NICENESS = 5
+
+# Render qualities (see g_video_gen.RENDER_QUALITIES) and their queue
+# priority; lower runs first so previews are never stuck behind full renders
+QUALITY_PRIORITY = {"preview": 0, "standard": 1, "high": 2}
+DEFAULT_QUALITY = "standard"
+
+
+def init_video_jobs_db():
+    """Create the video job queue table"""
+    with db_connection() as conn:
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS video_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            topic TEXT NOT NULL,
+            topic_key TEXT NOT NULL,
+            quality TEXT NOT NULL DEFAULT 'standard',
+            priority INTEGER NOT NULL DEFAULT 1,
+            depends_on INTEGER,
+            status TEXT NOT NULL DEFAULT 'queued',
+            stage TEXT,
+            progress REAL NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            run_after REAL NOT NULL,
+            heartbeat REAL,
+            worker TEXT,
+            result TEXT,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+        ''')
+
+        # At most one queued or running job per topic and quality; identical
+        # requests share it
+        conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_video_jobs_active_topic_quality
+        ON video_jobs (topic_key, quality) WHERE status IN ('queued', 'running')
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_video_jobs_claim ON video_jobs (status, priority, run_after)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_video_jobs_user ON video_jobs (user_id, id)')
+
+
+def _job_from_row(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+
+def enqueue_video_job(topic, user_id=None, quality=DEFAULT_QUALITY, depends_on=None, max_attempts=MAX_ATTEMPTS):
+    """Queue a tutorial for topic at the given render quality and return the job id.
+
+    If the same topic and quality is already queued or running, that
+    job's id is returned instead of creating a duplicate. A job with
+    depends_on is not started while that job is still queued or running.
+    """
+    if quality not in QUALITY_PRIORITY:
+        raise ValueError(f"Unknown render quality: {quality}")
+
+    topic_key = normalize_topic(topic)
+    with db_connection() as conn:
+        for _ in range(3):
+            row = conn.execute('''
+            INSERT INTO video_jobs (user_id, topic, topic_key, quality, priority, depends_on, max_attempts, run_after)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT DO NOTHING
+            RETURNING id
+            ''', (user_id, topic, topic_key, quality, QUALITY_PRIORITY[quality], depends_on,
+                  max_attempts, time.time())).fetchone()
+            if row:
+                return row['id']
+
+            row = conn.execute('''
+            SELECT id FROM video_jobs
+            WHERE topic_key = ? AND quality = ? AND status IN ('queued', 'running')
+            ''', (topic_key, quality)).fetchone()
+            if row:
+                return row['id']
+            # The active job finished between the two statements; try again
+
+    raise RuntimeError(f"Could not enqueue video job for {topic}")
+
+
+def enqueue_tutorial(topic, user_id=None, quality=DEFAULT_QUALITY, preview=True):
+    """Queue a tutorial, preceded by a fast low-quality preview.
+
+    Returns (preview_job_id, job_id); preview_job_id is None when no
+    preview was requested. The full-quality job waits for the preview so
+    it reuses the script, code and narration the preview produced.
+    """
+    preview_id = None
+    if preview and quality != "preview":
+        preview_id = enqueue_video_job(topic, user_id, quality="preview")
+    job_id = enqueue_video_job(topic, user_id, quality=quality, depends_on=preview_id)
+    return preview_id, job_id
+
+
+def get_video_job(job_id):
+    """Return a job as a dict (result decoded), or None"""
+    with db_connection() as conn:
+        row = conn.execute('SELECT * FROM video_jobs WHERE id = ?', (job_id,)).fetchone()
+        return _job_from_row(row)
+
+
+def get_user_video_jobs(user_id, limit=10):
+    """Most recent jobs requested by a user"""
+    with db_connection() as conn:
+        rows = conn.execute('''
+        SELECT * FROM video_jobs WHERE user_id = ?
+        ORDER BY id DESC LIMIT ?
+        ''', (user_id, limit)).fetchall()
+        return [_job_from_row(row) for row in rows]
+
+
+def claim_next_job(worker):
+    """Atomically move the oldest runnable job to running and return it"""
+    now = time.time()
+    with db_connection() as conn:
+        row = conn.execute('''
+        UPDATE video_jobs
+        SET status = 'running', attempts = attempts + 1, heartbeat = ?, worker = ?,
+            stage = NULL, progress = 0, error = NULL
+        WHERE id = (
+            SELECT id FROM video_jobs AS job
+            WHERE status = 'queued' AND run_after <= ?
+              AND NOT EXISTS (
+                  SELECT 1 FROM video_jobs AS dep
+                  WHERE dep.id = job.depends_on AND dep.status IN ('queued', 'running')
+              )
+            ORDER BY priority, run_after, id
+            LIMIT 1
+        )
+        RETURNING *
+        ''', (now, worker, now)).fetchone()
+        return _job_from_row(row)
+
+
+def update_job_progress(job_id, worker, stage=None, progress=None):
+    """Record the current stage of a running job and refresh its heartbeat"""
+    with db_connection() as conn:
+        conn.execute('''
+        UPDATE video_jobs
+        SET stage = COALESCE(?, stage), progress = COALESCE(?, progress), heartbeat = ?
+        WHERE id = ? AND status = 'running' AND worker = ?
+        ''', (stage, progress, time.time(), job_id, worker))
+
+
+def complete_job(job_id, worker, result):
+    """Store the result of a job; False if worker no longer holds it"""
+    with db_connection() as conn:
+        cursor = conn.execute('''
+        UPDATE video_jobs
+        SET status = 'succeeded', progress = 1, result = ?, error = NULL, finished_at = ?
+        WHERE id = ? AND status = 'running' AND worker = ?
+        ''', (json.dumps(result), datetime.datetime.now().isoformat(), job_id, worker))
+        return cursor.rowcount > 0
+
+
+def _release_sql(condition):
+    """UPDATE that requeues matching running jobs with backoff, or fails those out of attempts"""
+    return f'''
+    UPDATE video_jobs
+    SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+        run_after = CASE WHEN attempts < max_attempts
+                         THEN :now + MIN(:base_delay * (1 << MAX(0, attempts - 1)), :max_delay)
+                         ELSE run_after END,
+        finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE :finished_at END,
+        error = :error, result = NULL
+    WHERE status = 'running' AND {condition}
+    '''
+
+
+def _release_params(error, **params):
+    return dict(params, now=time.time(), base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY,
+                finished_at=datetime.datetime.now().isoformat(), error=error)
+
+
+def fail_job(job_id, worker, error):
+    """Requeue a failed job with backoff, or mark it failed when out of attempts.
+
+    Does nothing (and returns False) if worker no longer holds the job,
+    e.g. because it was recovered as stale and claimed again.
+    """
+    with db_connection() as conn:
+        cursor = conn.execute(_release_sql("id = :job_id AND worker = :worker"),
+                              _release_params(error, job_id=job_id, worker=worker))
+        return cursor.rowcount > 0
+
+
+def requeue_stale_jobs(lease=JOB_LEASE):
+    """Recover running jobs whose worker stopped sending heartbeats"""
+    with db_connection() as conn:
+        cursor = conn.execute(_release_sql("heartbeat < :cutoff"),
+                              _release_params("Worker stopped responding", cutoff=time.time() - lease))
+        return cursor.rowcount
+
+
+class _Heartbeat:
+    """Keeps a running job's lease alive during long stages such as renders"""
+
+    def __init__(self, job_id, worker, interval=HEARTBEAT_INTERVAL):
+        self.job_id = job_id
+        self.worker = worker
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                update_job_progress(self.job_id, self.worker)
+            except Exception as e:
+                print(f"Heartbeat for job {self.job_id} failed: {e}")
+
+
+def run_job(job):
+    """Run the tutorial pipeline for one claimed job"""
+    from g_video_gen import generate_tutorial, PIPELINE_STAGES
+
+    def on_progress(running, completed):
+        # Stages may run in parallel, so stage holds a comma-separated list
+        update_job_progress(job['id'], job['worker'], ",".join(running), completed / len(PIPELINE_STAGES))
+
+    try:
+        with _Heartbeat(job['id'], job['worker']):
+            result = generate_tutorial(job['topic'], on_progress=on_progress, quality=job['quality'])
+    except Exception as e:
+        print(f"Video job {job['id']} ({job['topic']}) failed: {e}")
+        fail_job(job['id'], job['worker'], str(e))
+        return False
+
+    if not complete_job(job['id'], job['worker'], result):
+        print(f"Video job {job['id']} ({job['topic']}) was taken over by another worker; result discarded")
+        return False
+    return True
+
+
+def worker_loop(worker=None, max_jobs=JOBS_PER_WORKER, poll_interval=POLL_INTERVAL):
+    """Claim and run jobs until max_jobs have been processed"""
+    from g_video_gen import setup_gemini_api
+
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    if hasattr(os, "nice"):
+        try:
+            os.nice(WORKER_NICENESS)
+        except OSError:
+            pass
+
+    init_video_jobs_db()
+    setup_gemini_api()
+
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        requeue_stale_jobs()
+        job = claim_next_job(worker)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
+        processed += 1
+
+
+class VideoWorkerPool:
+    """Bounded set of worker processes, replaced as they exit.
+
+    Workers are spawned rather than forked so they do not inherit the
+    threads and open connections of the Streamlit server.
+    """
+
+    def __init__(self, num_workers=MAX_WORKERS, jobs_per_worker=JOBS_PER_WORKER):
+        self.num_workers = num_workers
+        self.jobs_per_worker = jobs_per_worker
+        self._context = multiprocessing.get_context("spawn")
+        self._processes = []
+        self._stop = threading.Event()
+        self._supervisor = None
+
+    def _spawn(self, index):
+        process = self._context.Process(
+            target=worker_loop,
+            kwargs={"worker": f"{socket.gethostname()}:video-worker-{index}", "max_jobs": self.jobs_per_worker},
+            name=f"video-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        return process
+
+    def start(self):
+        self._processes = [self._spawn(i) for i in range(self.num_workers)]
+        self._supervisor = threading.Thread(target=self._supervise, name="video-worker-supervisor", daemon=True)
+        self._supervisor.start()
+        return self
+
+    def _supervise(self):
+        while not self._stop.wait(POLL_INTERVAL):
+            for i, process in enumerate(self._processes):
+                if not process.is_alive():
+                    # Recycled after jobs_per_worker jobs, or crashed
+                    process.join()
+                    self._processes[i] = self._spawn(i)
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        if self._supervisor is not None:
+            self._supervisor.join()
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            process.join(timeout)
+
+
+def start_worker_pool(num_workers=MAX_WORKERS):
+    """Start a pool of video workers in the background"""
+    init_video_jobs_db()
+    return VideoWorkerPool(num_workers).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run tutorial video workers")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="number of worker processes")
+    args = parser.parse_args()
+
+    pool = start_worker_pool(args.workers)
+    print(f"Started {args.workers} video worker(s); press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        pool.stop()
+        sys.exit(0)